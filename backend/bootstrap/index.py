@@ -0,0 +1,178 @@
+'''
+Business: Стартовые данные дашборда одним запросом: профиль, счётчики, последние уведомления и активные новости
+Args: event с httpMethod, headers (X-User-Id), queryStringParameters (parts, known); context с request_id
+Returns: HTTP response с частями дашборда и их ETag
+'''
+
+import json
+import os
+import time
+import hashlib
+from typing import Dict, Any, List
+import psycopg2
+
+SCHEMA = 't_p35759334_music_label_portal'
+
+ALL_PARTS = ['profile', 'counts', 'notifications', 'news']
+
+NOTIFICATIONS_LIMIT = 50
+
+# Новости одинаковы для всех пользователей: тёплый экземпляр функции держит их в памяти
+NEWS_CACHE_TTL = 60
+_news_cache: Dict[str, Any] = {'expires_at': 0.0, 'data': None}
+
+# Каждая часть — подзапрос, возвращающий json; все выбранные части читаются одним SELECT
+PART_QUERIES = {
+    'profile': f"""(
+        SELECT row_to_json(u) FROM (
+            SELECT id, username, role, full_name, vk_photo
+            FROM {SCHEMA}.users WHERE id = %(user_id)s
+        ) u
+    )""",
+    'counts': f"""(
+        SELECT row_to_json(c) FROM (
+            SELECT tickets, tasks, messages, submissions, notifications
+            FROM {SCHEMA}.user_counters WHERE user_id = %(user_id)s
+        ) c
+    )""",
+    'notifications': f"""(
+        SELECT json_build_object(
+            'notifications', COALESCE(json_agg(n ORDER BY n.created_at DESC, n.id DESC), '[]'::json),
+            'unread_count', (
+                SELECT notifications FROM {SCHEMA}.user_counters
+                WHERE user_id = %(user_id)s
+            )
+        )
+        FROM (
+            SELECT id, title, message, type, read, related_entity_type, related_entity_id, created_at
+            FROM {SCHEMA}.notifications
+            WHERE user_id = %(user_id)s
+            ORDER BY created_at DESC, id DESC
+            LIMIT {NOTIFICATIONS_LIMIT}
+        ) n
+    )""",
+    'news': f"""(
+        SELECT COALESCE(json_agg(n ORDER BY n.priority DESC, n.created_at DESC), '[]'::json)
+        FROM (
+            SELECT id, title, content, type, is_active, priority, created_at, updated_at, created_by
+            FROM {SCHEMA}.news
+            WHERE is_active = true
+        ) n
+    )""",
+}
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
+
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+
+    if method != 'GET':
+        return {
+            'statusCode': 405,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+
+    headers = event.get('headers', {}) or {}
+    user_id_header = headers.get('X-User-Id') or headers.get('x-user-id')
+
+    if not user_id_header:
+        return {
+            'statusCode': 401,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Unauthorized'}),
+            'isBase64Encoded': False
+        }
+
+    try:
+        user_id = int(user_id_header)
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Invalid X-User-Id'}),
+            'isBase64Encoded': False
+        }
+
+    params = event.get('queryStringParameters', {}) or {}
+    requested = [p for p in (params.get('parts') or ','.join(ALL_PARTS)).split(',') if p in PART_QUERIES]
+    # Профиль нужен всегда: по нему проверяется, что пользователь существует
+    if 'profile' not in requested:
+        requested.insert(0, 'profile')
+
+    # known=counts:<etag>,news:<etag> — части, которые уже есть у клиента
+    known = dict(item.split(':', 1) for item in (params.get('known') or '').split(',') if ':' in item)
+
+    parts: Dict[str, Any] = {}
+    query_parts: List[str] = []
+    for part in requested:
+        if part == 'news' and _news_cache['data'] is not None and _news_cache['expires_at'] > time.time():
+            parts['news'] = _news_cache['data']
+        else:
+            query_parts.append(part)
+
+    dsn = os.environ.get('DATABASE_URL')
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+
+    try:
+        cur.execute(
+            'SELECT ' + ', '.join(PART_QUERIES[p] for p in query_parts),
+            {'user_id': user_id}
+        )
+        parts.update(zip(query_parts, cur.fetchone()))
+
+        if parts['profile'] is None:
+            return {
+                'statusCode': 404,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'User not found'}),
+                'isBase64Encoded': False
+            }
+
+        if 'counts' in parts and parts['counts'] is None:
+            cur.execute(f"SELECT {SCHEMA}.refresh_user_counters(%(user_id)s)", {'user_id': user_id})
+            conn.commit()
+            cur.execute('SELECT ' + PART_QUERIES['counts'], {'user_id': user_id})
+            parts['counts'] = cur.fetchone()[0]
+            if parts.get('notifications') and parts['counts']:
+                parts['notifications']['unread_count'] = parts['counts']['notifications']
+    finally:
+        cur.close()
+        conn.close()
+
+    if 'news' in query_parts:
+        _news_cache['data'] = parts['news']
+        _news_cache['expires_at'] = time.time() + NEWS_CACHE_TTL
+
+    etags = {part: part_etag(value) for part, value in parts.items()}
+    not_modified = [part for part, etag in etags.items() if known.get(part) == etag]
+    for part in not_modified:
+        parts[part] = None
+
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            **parts,
+            'etags': etags,
+            'not_modified': not_modified
+        }, default=str),
+        'isBase64Encoded': False
+    }
+
+def part_etag(value: Any) -> str:
+    payload = json.dumps(value, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()[:16]
@@ -1,16 +1,29 @@
 import json
 import os
 import psycopg2
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+SCHEMA = 't_p35759334_music_label_portal'
+
+# Вся рассылка — один INSERT ... SELECT: получатели из user_ids и ролей разрешаются в SQL.
+# Заблокированные пользователи исключаются только при выборе по роли, явные user_ids получают уведомление всегда.
+FAN_OUT_SQL = f"""
+    INSERT INTO {SCHEMA}.notifications
+    (user_id, title, message, type, related_entity_type, related_entity_id)
+    SELECT u.id, %(title)s, %(message)s, %(type)s, %(related_entity_type)s, %(related_entity_id)s
+    FROM {SCHEMA}.users u
+    WHERE u.id = ANY(%(user_ids)s::INTEGER[])
+       OR (u.role = ANY(%(roles)s::VARCHAR[]) AND COALESCE(u.is_blocked, FALSE) = FALSE)
+"""
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Create system notification for users
-    Args: event with POST body containing notification data and optional user_ids
+    Business: Create system notification for users (single-statement fan-out)
+    Args: event with POST body containing notification data, optional user_ids and roles
     Returns: Created notification confirmation
     '''
     method: str = event.get('httpMethod', 'POST')
-    
+
     if method == 'OPTIONS':
         return {
             'statusCode': 200,
@@ -22,7 +35,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             },
             'body': ''
         }
-    
+
     if method != 'POST':
         return {
             'statusCode': 405,
@@ -30,7 +43,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False,
             'body': json.dumps({'error': 'Method not allowed'})
         }
-    
+
     try:
         body_data = json.loads(event.get('body', '{}'))
         title = body_data.get('title')
@@ -39,8 +52,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         related_entity_type = body_data.get('related_entity_type')
         related_entity_id = body_data.get('related_entity_id')
         user_ids = body_data.get('user_ids', [])  # Optional: specific user IDs
+        roles = body_data.get('roles', [])  # Optional: whole roles, e.g. ["artist"]
         notify_directors = body_data.get('notify_directors', True)  # Default: notify directors
-        
+
         if not title or not message:
             return {
                 'statusCode': 400,
@@ -48,54 +62,72 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False,
                 'body': json.dumps({'error': 'Title and message are required'})
             }
-        
+
+        recipient_user_ids = parse_user_ids(user_ids)
+        if recipient_user_ids is None or not isinstance(roles, list) or not all(isinstance(r, str) for r in roles):
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'isBase64Encoded': False,
+                'body': json.dumps({'error': 'user_ids must be a list of user ids and roles a list of role names'})
+            }
+
+        recipient_roles: List[str] = list(roles)
+        if notify_directors and 'director' not in recipient_roles:
+            recipient_roles.append('director')
+
+        params = {
+            'title': title,
+            'message': message,
+            'type': notification_type,
+            'related_entity_type': related_entity_type,
+            'related_entity_id': related_entity_id,
+            'user_ids': recipient_user_ids,
+            'roles': recipient_roles
+        }
+
         dsn = os.environ.get('DATABASE_URL')
-        schema = 't_p35759334_music_label_portal'
-        
+
         with psycopg2.connect(dsn) as conn:
-            conn.autocommit = True
             with conn.cursor() as cur:
-                recipient_ids = set(user_ids) if user_ids else set()
-                
-                # Add directors if requested
-                if notify_directors:
-                    cur.execute(f"""
-                        SELECT id FROM {schema}.users
-                        WHERE role = 'director'
-                    """)
-                    directors = cur.fetchall()
-                    recipient_ids.update(d[0] for d in directors)
-                
-                if not recipient_ids:
+                cur.execute(FAN_OUT_SQL, params)
+                count = cur.rowcount
+
+                if count == 0:
                     return {
                         'statusCode': 404,
                         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                         'isBase64Encoded': False,
                         'body': json.dumps({'error': 'No recipients found'})
                     }
-                
-                # Create notification for each recipient
-                for user_id in recipient_ids:
-                    cur.execute(f"""
-                        INSERT INTO {schema}.notifications 
-                        (user_id, title, message, type, related_entity_type, related_entity_id)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (user_id, title, message, notification_type, related_entity_type, related_entity_id))
-                
+
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                     'isBase64Encoded': False,
                     'body': json.dumps({
                         'message': 'Notifications created',
-                        'count': len(recipient_ids)
+                        'count': count
                     })
                 }
-        
+
     except Exception as e:
         return {
             'statusCode': 500,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
             'isBase64Encoded': False,
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+def parse_user_ids(user_ids: Any) -> Optional[List[int]]:
+    '''Список id получателей (числа или строки из цифр); None, если передано что-то другое'''
+    if user_ids is None:
+        return []
+    if not isinstance(user_ids, list):
+        return None
+    parsed = []
+    for uid in user_ids:
+        if isinstance(uid, bool) or not isinstance(uid, (int, str)) or not str(uid).strip().isdigit():
+            return None
+        parsed.append(int(uid))
+    return parsed
@@ -0,0 +1,268 @@
+'''
+Business: Обслуживание секционированных таблиц: создание будущих помесячных секций, свёртка старых уведомлений в сводки и выгрузка старых секций в архив S3
+Args: event триггера-таймера (messages) или HTTP event с заголовком X-Cron-Token и queryStringParameters (dry_run); context с request_id
+Returns: HTTP response со списком созданных и архивированных секций
+'''
+
+import json
+import os
+import hmac
+import re
+import gzip
+import tempfile
+from datetime import date, timedelta
+from typing import Dict, Any, List, Tuple
+import boto3
+import psycopg2
+
+SCHEMA = 't_p35759334_music_label_portal'
+
+# Секционированные таблицы и срок хранения в БД (в месяцах)
+RETENTION_MONTHS = {
+    'messages': int(os.environ.get('MESSAGES_RETENTION_MONTHS', '12')),
+    'notifications': int(os.environ.get('NOTIFICATIONS_RETENTION_MONTHS', '6')),
+}
+
+# Прочитанные уведомления старше этого срока сворачиваются в notification_digests
+NOTIFICATIONS_DIGEST_DAYS = int(os.environ.get('NOTIFICATIONS_DIGEST_DAYS', '30'))
+
+MONTHS_AHEAD = 3
+
+# Общий секрет для ручного запуска по HTTP; без него функцию запускает только триггер-таймер
+DATA_RETENTION_TOKEN = os.environ.get('DATA_RETENTION_TOKEN', '')
+
+PARTITION_NAME_RE = re.compile(r'^(?P<table>[a-z_]+)_p(?P<year>\d{4})_(?P<month>\d{2})$')
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
+
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Cron-Token',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': ''
+        }
+
+    # DETACH/DROP секций — только по таймеру или с общим секретом
+    if not is_authorized_run(event):
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Timer trigger or X-Cron-Token required'})
+        }
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'DATABASE_URL not configured'})
+        }
+
+    params = event.get('queryStringParameters', {}) or {}
+    dry_run = params.get('dry_run') in ('1', 'true')
+
+    today = date.today()
+    created: Dict[str, int] = {}
+    archived: List[Dict[str, Any]] = []
+    digests_updated = 0
+
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+
+    try:
+        if not dry_run:
+            digest_cutoff = today - timedelta(days=NOTIFICATIONS_DIGEST_DAYS)
+            for partition_name, range_start, range_end in list_partitions(cur, 'notifications'):
+                if range_start >= digest_cutoff:
+                    break
+                digests_updated += collapse_notifications(conn, range_start, min(range_end, digest_cutoff))
+
+        for table, retention_months in RETENTION_MONTHS.items():
+            # Секции на MONTHS_AHEAD месяцев вперёд, чтобы вставки никогда не падали
+            if not dry_run:
+                cur.execute(
+                    f"SELECT {SCHEMA}.create_monthly_partitions(%s, %s, %s)",
+                    (table, today, add_months(today, MONTHS_AHEAD))
+                )
+                created[table] = cur.fetchone()[0]
+                conn.commit()
+
+            cutoff = add_months(today.replace(day=1), -retention_months)
+            table_archived = 0
+
+            for partition_name, range_start, range_end in list_partitions(cur, table):
+                if range_end > cutoff:
+                    continue
+
+                if dry_run:
+                    archived.append({'partition': partition_name, 'range_start': range_start.isoformat(), 'dry_run': True})
+                    continue
+
+                row_count, s3_key = archive_partition(conn, table, partition_name, range_start, range_end)
+                archived.append({
+                    'partition': partition_name,
+                    'range_start': range_start.isoformat(),
+                    'rows': row_count,
+                    's3_key': s3_key
+                })
+                table_archived += 1
+                print(f"Archived {partition_name}: {row_count} rows -> {s3_key}")
+
+            # DETACH обходит триггеры: непрочитанное из архивных секций этой таблицы пересчитывается в user_counters
+            if table_archived:
+                refresh_counters(conn, table)
+    finally:
+        cur.close()
+        conn.close()
+
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'status': 'ok',
+            'created_partitions': created,
+            'digests_updated': digests_updated,
+            'archived_partitions': archived
+        })
+    }
+
+def is_authorized_run(event: Dict[str, Any]) -> bool:
+    '''Запуск от триггера-таймера (event.messages) или HTTP-запрос с верным X-Cron-Token'''
+    if event.get('messages'):
+        return True
+    if not DATA_RETENTION_TOKEN:
+        return False
+    headers = event.get('headers', {}) or {}
+    token = headers.get('X-Cron-Token') or headers.get('x-cron-token') or ''
+    return hmac.compare_digest(token.encode('utf-8'), DATA_RETENTION_TOKEN.encode('utf-8'))
+
+def add_months(d: date, months: int) -> date:
+    month_index = d.year * 12 + d.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def list_partitions(cur, table: str) -> List[Tuple[str, date, date]]:
+    '''Секции таблицы, отсортированные по месяцу; границы берутся из имени _pYYYY_MM'''
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (f'{SCHEMA}.{table}',))
+
+    partitions = []
+    for (relname,) in cur.fetchall():
+        match = PARTITION_NAME_RE.match(relname)
+        if not match or match.group('table') != table:
+            continue
+        range_start = date(int(match.group('year')), int(match.group('month')), 1)
+        partitions.append((relname, range_start, add_months(range_start, 1)))
+
+    return sorted(partitions, key=lambda p: p[1])
+
+def refresh_counters(conn, table: str) -> None:
+    '''Пересчитывает user_counters у пользователей с ненулевым счётчиком таблицы (столбец назван так же, как таблица)'''
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT {SCHEMA}.refresh_user_counters(user_id)
+            FROM {SCHEMA}.user_counters
+            WHERE {table} > 0
+            ORDER BY user_id
+        """)
+        conn.commit()
+    finally:
+        cur.close()
+
+def archive_partition(conn, table: str, partition_name: str, range_start: date, range_end: date) -> Tuple[int, str]:
+    '''
+    Отсоединяет секцию, потоково выгружает её в gzip CSV в S3 и удаляет из БД.
+    Всё в одной транзакции: при ошибке выгрузки секция остаётся на месте.
+    '''
+    bucket_name = os.environ.get('YC_S3_BUCKET_NAME')
+    s3_client = boto3.client(
+        's3',
+        endpoint_url='https://storage.yandexcloud.net',
+        aws_access_key_id=os.environ.get('YC_S3_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.environ.get('YC_S3_SECRET_ACCESS_KEY'),
+        region_name='ru-central1'
+    )
+    s3_key = f"archive/{table}/{partition_name}.csv.gz"
+
+    cur = conn.cursor()
+    try:
+        cur.execute(f"ALTER TABLE {SCHEMA}.{table} DETACH PARTITION {SCHEMA}.{partition_name}")
+        cur.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{partition_name}")
+        row_count = cur.fetchone()[0]
+
+        with tempfile.TemporaryFile() as tmp:
+            with gzip.GzipFile(fileobj=tmp, mode='wb') as gz:
+                cur.copy_expert(f"COPY {SCHEMA}.{partition_name} TO STDOUT WITH CSV HEADER", gz)
+            tmp.seek(0)
+            s3_client.upload_fileobj(tmp, bucket_name, s3_key, ExtraArgs={'ContentType': 'application/gzip'})
+
+        cur.execute(f"""
+            INSERT INTO {SCHEMA}.partition_archives
+            (parent_table, partition_name, range_start, range_end, row_count, s3_key)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (table, partition_name, range_start, range_end, row_count, s3_key))
+        cur.execute(f"DROP TABLE {SCHEMA}.{partition_name}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return row_count, s3_key
+
+def collapse_notifications(conn, range_start: date, range_end: date) -> int:
+    '''
+    Сворачивает прочитанные уведомления из [range_start, range_end) в сводки по пользователю и месяцу.
+    Диапазон не выходит за одну секцию, поэтому каждый запуск трогает ограниченный объём строк.
+    '''
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            WITH collapsed AS (
+                DELETE FROM {SCHEMA}.notifications
+                WHERE read = TRUE AND created_at >= %s AND created_at < %s
+                RETURNING user_id, COALESCE(type, 'info') AS type, created_at
+            ), by_type AS (
+                SELECT user_id, date_trunc('month', created_at)::DATE AS month, type,
+                       COUNT(*) AS cnt, MAX(created_at) AS last_at
+                FROM collapsed
+                GROUP BY 1, 2, 3
+            )
+            INSERT INTO {SCHEMA}.notification_digests AS d
+                (user_id, month, total, counts_by_type, last_notification_at)
+            SELECT user_id, month, SUM(cnt), jsonb_object_agg(type, cnt), MAX(last_at)
+            FROM by_type
+            GROUP BY user_id, month
+            ON CONFLICT (user_id, month) DO UPDATE SET
+                total = d.total + EXCLUDED.total,
+                counts_by_type = (
+                    SELECT jsonb_object_agg(
+                        k,
+                        COALESCE((d.counts_by_type ->> k)::INTEGER, 0) + COALESCE((EXCLUDED.counts_by_type ->> k)::INTEGER, 0)
+                    )
+                    FROM jsonb_object_keys(d.counts_by_type || EXCLUDED.counts_by_type) AS k
+                ),
+                last_notification_at = GREATEST(d.last_notification_at, EXCLUDED.last_notification_at),
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING total
+        """, (range_start, range_end))
+        digests = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return digests
@@ -1,10 +1,15 @@
 import json
 import os
 from typing import Dict, Any
-from datetime import datetime
+from datetime import datetime, timedelta
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+# history_months ограничивает чтение последними помесячными секциями messages; без него история полная.
+# Больше MAX_HISTORY_MONTHS — то же, что полная история; заодно граница не уходит за пределы datetime
+MAX_HISTORY_MONTHS = 1200
+FULL_HISTORY_SINCE = datetime(1970, 1, 1)
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: API для двусторонних диалогов между пользователями и руководителем
@@ -75,6 +80,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             dialog_with = params.get('dialog_with')
             list_dialogs = params.get('list_dialogs')
             
+            # Граница передаётся литералом, чтобы планировщик отсёк старые секции ещё на этапе планирования
+            if params.get('full_history') in ('1', 'true') or not params.get('history_months'):
+                since = FULL_HISTORY_SINCE
+            else:
+                try:
+                    history_months = int(params['history_months'])
+                except ValueError:
+                    history_months = 0
+                if history_months < 1:
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'history_months must be a positive integer'})
+                    }
+                since = datetime.now() - timedelta(days=31 * min(history_months, MAX_HISTORY_MONTHS))
+            
             if list_dialogs:
                 # Get all managers and directors (except current user) for dialog list
                 cursor.execute('''
@@ -102,10 +123,11 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     cursor.execute('''
                         SELECT message, created_at
                         FROM t_p35759334_music_label_portal.messages
-                        WHERE (sender_id = %s AND receiver_id = %s) 
-                           OR (sender_id = %s AND receiver_id = %s)
+                        WHERE ((sender_id = %s AND receiver_id = %s) 
+                           OR (sender_id = %s AND receiver_id = %s))
+                          AND created_at >= %s
                         ORDER BY created_at DESC LIMIT 1
-                    ''', (other_user_id, user_id, user_id, other_user_id))
+                    ''', (other_user_id, user_id, user_id, other_user_id, since))
                     last_msg = cursor.fetchone()
                     
                     dialog_users.append({
@@ -127,13 +149,15 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 cursor.execute('''
                     SELECT m.id, m.sender_id, m.receiver_id, m.message, m.created_at, m.is_read, m.is_from_boss
                     FROM t_p35759334_music_label_portal.messages m
-                    WHERE (m.sender_id = %s AND m.receiver_id = %s) 
-                       OR (m.sender_id = %s AND m.receiver_id = %s)
+                    WHERE ((m.sender_id = %s AND m.receiver_id = %s) 
+                       OR (m.sender_id = %s AND m.receiver_id = %s))
+                      AND m.created_at >= %s
                     ORDER BY m.created_at ASC
-                ''', (user_id, dialog_with, dialog_with, user_id))
+                ''', (user_id, dialog_with, dialog_with, user_id, since))
             else:
                 cursor.execute(
-                    'SELECT m.id, m.sender_id, m.receiver_id, m.message, m.created_at, m.is_read, m.is_from_boss FROM t_p35759334_music_label_portal.messages m ORDER BY m.created_at DESC'
+                    'SELECT m.id, m.sender_id, m.receiver_id, m.message, m.created_at, m.is_read, m.is_from_boss FROM t_p35759334_music_label_portal.messages m WHERE m.created_at >= %s ORDER BY m.created_at DESC',
+                    (since,)
                 )
             
             messages = []
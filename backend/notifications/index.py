@@ -2,13 +2,18 @@ import json
 import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Manage user notifications
-    Args: event with httpMethod (GET/PUT), headers with X-User-Id
-    Returns: List of notifications or update confirmation
+    Business: Manage user notifications (paged feed with before-cursor, type/related_entity_type/unread_only filters)
+    Args: event with httpMethod (GET/PUT), headers with X-User-Id, queryStringParameters
+    Returns: Page of notifications with unread_count and next_cursor (the last page also carries monthly
+             digests of older read notifications collapsed by data-retention), or update confirmation
     '''
     method: str = event.get('httpMethod', 'GET')
     
@@ -34,7 +39,15 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'error': 'User ID required'})
             }
         
-        user_id = int(user_id_header)
+        try:
+            user_id = int(user_id_header)
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'isBase64Encoded': False,
+                'body': json.dumps({'error': 'Invalid X-User-Id'})
+            }
         dsn = os.environ.get('DATABASE_URL')
         schema = 't_p35759334_music_label_portal'
         
@@ -43,31 +56,81 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 
                 if method == 'GET':
-                    cur.execute(f"""
-                        SELECT id, title, message, type, read, 
-                               related_entity_type, related_entity_id, created_at
-                        FROM {schema}.notifications
-                        WHERE user_id = %s
-                        ORDER BY created_at DESC
-                        LIMIT 50
-                    """, (user_id,))
+                    params = event.get('queryStringParameters', {}) or {}
+                    try:
+                        limit = min(max(int(params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+                        before = decode_cursor(params['before']) if params.get('before') else None
+                    except ValueError:
+                        return {
+                            'statusCode': 400,
+                            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                            'isBase64Encoded': False,
+                            'body': json.dumps({'error': 'limit must be a number and before a next_cursor value'})
+                        }
+                    
+                    filters = ['user_id = %(user_id)s']
+                    query_params: Dict[str, Any] = {'user_id': user_id, 'limit': limit + 1}
                     
-                    notifications = cur.fetchall()
+                    if before:
+                        before_created_at, before_id = before
+                        filters.append('(created_at, id) < (%(before_created_at)s::TIMESTAMP, %(before_id)s)')
+                        query_params['before_created_at'] = before_created_at
+                        query_params['before_id'] = before_id
+                    if params.get('type'):
+                        filters.append('type = %(type)s')
+                        query_params['type'] = params['type']
+                    if params.get('related_entity_type'):
+                        filters.append('related_entity_type = %(related_entity_type)s')
+                        query_params['related_entity_type'] = params['related_entity_type']
+                    if params.get('unread_only') in ('1', 'true'):
+                        filters.append('read = FALSE')
                     
+                    # Страница и счётчик непрочитанных (поддерживается триггером в user_counters) — один запрос
                     cur.execute(f"""
-                        SELECT COUNT(*) as count FROM {schema}.notifications
-                        WHERE user_id = %s AND read = FALSE
-                    """, (user_id,))
+                        SELECT
+                            COALESCE((
+                                SELECT json_agg(n ORDER BY n.created_at DESC, n.id DESC)
+                                FROM (
+                                    SELECT id, title, message, type, read,
+                                           related_entity_type, related_entity_id, created_at
+                                    FROM {schema}.notifications
+                                    WHERE {' AND '.join(filters)}
+                                    ORDER BY created_at DESC, id DESC
+                                    LIMIT %(limit)s
+                                ) n
+                            ), '[]'::json) AS notifications,
+                            (SELECT notifications FROM {schema}.user_counters WHERE user_id = %(user_id)s) AS unread_count
+                    """, query_params)
                     
-                    unread_count = cur.fetchone()['count']
+                    row = cur.fetchone()
+                    notifications = row['notifications']
+                    unread_count = row['unread_count']
+                    
+                    if unread_count is None:
+                        cur.execute(f"SELECT {schema}.refresh_user_counters(%s)", (user_id,))
+                        cur.execute(f"SELECT notifications FROM {schema}.user_counters WHERE user_id = %s", (user_id,))
+                        counters_row = cur.fetchone()
+                        unread_count = counters_row['notifications'] if counters_row else 0
+                    
+                    has_more = len(notifications) > limit
+                    notifications = notifications[:limit]
+                    next_cursor = encode_cursor(notifications[-1]) if has_more else None
+                    
+                    # За концом ленты — свёрнутые data-retention прочитанные уведомления, по месяцам
+                    digests = []
+                    if not has_more and params.get('unread_only') not in ('1', 'true') and not params.get('related_entity_type'):
+                        digests = fetch_digests(cur, schema, user_id, params.get('type'))
                     
                     return {
                         'statusCode': 200,
                         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                         'isBase64Encoded': False,
                         'body': json.dumps({
-                            'notifications': [dict(n) for n in notifications],
-                            'unread_count': unread_count
+                            'notifications': notifications,
+                            'unread_count': unread_count,
+                            'has_more': has_more,
+                            'next_cursor': next_cursor,
+                            'digests': digests
                         }, default=str)
                     }
                 
@@ -109,4 +172,27 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
             'isBase64Encoded': False,
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+def fetch_digests(cur, schema: str, user_id: int, notification_type: Optional[str]) -> List[Dict[str, Any]]:
+    '''Сводки notification_digests пользователя от новых месяцев к старым; с type — только месяцы с этим типом'''
+    filters = ['user_id = %(user_id)s']
+    if notification_type:
+        filters.append('counts_by_type ? %(type)s')
+    cur.execute(f"""
+        SELECT month, total, counts_by_type, last_notification_at
+        FROM {schema}.notification_digests
+        WHERE {' AND '.join(filters)}
+        ORDER BY month DESC
+    """, {'user_id': user_id, 'type': notification_type})
+    return [dict(row) for row in cur.fetchall()]
+
+def encode_cursor(notification: Dict[str, Any]) -> str:
+    '''Курсор ленты: created_at и id последнего уведомления на странице'''
+    return f"{notification['created_at']}_{notification['id']}"
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    '''Обратно к created_at и id; ValueError, если курсор не из next_cursor'''
+    created_at, _, notification_id = cursor.rpartition('_')
+    datetime.fromisoformat(created_at)
+    return created_at, int(notification_id)
@@ -43,11 +43,26 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         schema = 't_p35759334_music_label_portal'
         
-        # Получаем роль пользователя
-        cur.execute(f"SELECT role FROM {schema}.users WHERE id = %s", (user_id,))
-        user_role_row = cur.fetchone()
+        # Счётчики поддерживаются триггерами (V0046), здесь только чтение по первичному ключу
+        cur.execute(f"""
+            SELECT tickets, tasks, messages, submissions
+            FROM {schema}.user_counters
+            WHERE user_id = %s
+        """, (user_id,))
+        counters_row = cur.fetchone()
         
-        if not user_role_row:
+        if not counters_row:
+            # Строки ещё нет (например, пользователь создан до появления триггеров) — считаем один раз
+            cur.execute(f"SELECT {schema}.refresh_user_counters(%s)", (user_id,))
+            conn.commit()
+            cur.execute(f"""
+                SELECT tickets, tasks, messages, submissions
+                FROM {schema}.user_counters
+                WHERE user_id = %s
+            """, (user_id,))
+            counters_row = cur.fetchone()
+        
+        if not counters_row:
             cur.close()
             conn.close()
             return {
@@ -57,53 +72,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
-        user_role = user_role_row[0]
-        
         counts = {
-            'tickets': 0,
-            'tasks': 0,
-            'messages': 0,
-            'submissions': 0
+            'tickets': counters_row[0],
+            'tasks': counters_row[1],
+            'messages': counters_row[2],
+            'submissions': counters_row[3]
         }
         
-        if user_role == 'director':
-            # Непрочитанные тикеты (новые открытые)
-            cur.execute(f"SELECT COUNT(*) FROM {schema}.tickets WHERE status = 'open'")
-            counts['tickets'] = cur.fetchone()[0]
-            
-            # Непрочитанные задачи (новые pending)
-            cur.execute(f"SELECT COUNT(*) FROM {schema}.tasks WHERE status = 'pending'")
-            counts['tasks'] = cur.fetchone()[0]
-            
-            # Непрочитанные заявки артистов
-            cur.execute(f"SELECT COUNT(*) FROM {schema}.submissions WHERE status = 'pending'")
-            counts['submissions'] = cur.fetchone()[0]
-            
-        elif user_role == 'manager':
-            # Тикеты назначенные менеджеру
-            cur.execute(f"SELECT COUNT(*) FROM {schema}.tickets WHERE assigned_to = %s AND status != 'resolved' AND status != 'closed'", (user_id,))
-            counts['tickets'] = cur.fetchone()[0]
-            
-            # Задачи назначенные менеджеру (непрочитанные)
-            cur.execute(f"SELECT COUNT(*) FROM {schema}.tasks WHERE assigned_to = %s AND is_read = FALSE", (user_id,))
-            counts['tasks'] = cur.fetchone()[0]
-            
-        elif user_role == 'artist':
-            # Тикеты созданные артистом (ответы)
-            cur.execute(f"SELECT COUNT(*) FROM {schema}.tickets WHERE created_by = %s AND status != 'open'", (user_id,))
-            counts['tickets'] = cur.fetchone()[0]
-        
-        # Непрочитанные сообщения (для всех)
-        try:
-            cur.execute(f"""
-                SELECT COUNT(DISTINCT sender_id) 
-                FROM {schema}.messages 
-                WHERE receiver_id = %s AND is_read = FALSE
-            """, (user_id,))
-            counts['messages'] = cur.fetchone()[0]
-        except:
-            counts['messages'] = 0
-        
         cur.close()
         conn.close()
         
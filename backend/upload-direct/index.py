@@ -1,12 +1,59 @@
 import json
 import os
+import io
+import re
 import base64
 import uuid
-from typing import Dict, Any
+import hashlib
+import time
+from typing import Dict, Any, List, Tuple, Iterator, BinaryIO
 import boto3
+import psycopg2
+from botocore.config import Config
 from datetime import datetime
-import cgi
-from io import BytesIO
+from collections import defaultdict, OrderedDict
+
+# S3 multipart: part size (S3 minimum is 5 MB except the last part) and part URL lifetime
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+MULTIPART_URL_TTL = 3600
+MAX_PRESIGN_PARTS = 1000
+# S3 limit: part numbers of one multipart upload run from 1 to 10000
+MAX_PART_NUMBER = 10000
+
+# multipart/form-data: boundary from Content-Type and Content-Disposition parameters of a part
+MULTIPART_BOUNDARY_RE = re.compile(r'boundary=("[^"]+"|[^;\s]+)', re.IGNORECASE)
+MULTIPART_PARAM_RE = re.compile(r';\s*([\w*]+)=("(?:[^"\\]|\\.)*"|[^;]*)')
+
+# Content-addressed storage: blobs/<sha[:2]>/<sha256>.<ext>, one object per distinct content
+SCHEMA = 't_p35759334_music_label_portal'
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+VERIFY_CHUNK_BYTES = 1024 * 1024
+
+# Verifying a client-declared sha256 reads the whole object back through the function (transfer
+# and time grow with size); larger uploads stay under their uploads/ key and are not deduplicated
+VERIFY_MAX_BYTES = int(os.environ.get('UPLOAD_VERIFY_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+# Any S3-compatible endpoint (MinIO, moto_server) for local runs and tests
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', 'https://storage.yandexcloud.net')
+
+# One client per warm instance: building a botocore client costs far more than a presign
+S3_CLIENT_CONFIG = Config(
+    signature_version='s3v4',
+    max_pool_connections=int(os.environ.get('S3_MAX_POOL_CONNECTIONS', '20')),
+    connect_timeout=5,
+    read_timeout=60,
+    retries={'max_attempts': 3, 'mode': 'standard'},
+    tcp_keepalive=True
+)
+_s3_client = None
+
+# Presigned URLs are reused within a window: a URL minted in a window stays valid
+# for at least its TTL from any moment of that window
+PRESIGN_UPLOAD_TTL = 3600
+PRESIGN_DOWNLOAD_TTL = 600
+PRESIGN_WINDOW_SECONDS = 300
+PRESIGN_CACHE_SIZE = 512
+_presign_cache: 'OrderedDict[tuple, str]' = OrderedDict()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -36,33 +83,25 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             file_name = params.get('fileName', 'unnamed')
             content_type = params.get('contentType', 'application/octet-stream')
             
-            access_key = os.environ.get('YC_S3_ACCESS_KEY_ID')
-            secret_key = os.environ.get('YC_S3_SECRET_ACCESS_KEY')
             bucket_name = os.environ.get('YC_S3_BUCKET_NAME')
             
-            s3_client = boto3.client(
-                's3',
-                endpoint_url='https://storage.yandexcloud.net',
-                aws_access_key_id=access_key,
-                aws_secret_access_key=secret_key,
-                region_name='ru-central1'
-            )
+            # Download link for an uploaded object
+            if params.get('download') in ('1', 'true'):
+                s3_key = params.get('s3Key', '')
+                if not s3_key.startswith(('uploads/', 'blobs/')):
+                    return json_response(400, {'error': 's3Key of an uploaded file is required'})
+                download_url = presign_url('get_object', {'Bucket': bucket_name, 'Key': s3_key}, PRESIGN_DOWNLOAD_TTL)
+                return json_response(200, {'downloadUrl': download_url, 's3Key': s3_key})
             
-            file_ext = file_name.split('.')[-1] if '.' in file_name else ''
-            unique_filename = f"{uuid.uuid4()}.{file_ext}" if file_ext else str(uuid.uuid4())
-            s3_key = f"uploads/{datetime.now().strftime('%Y/%m/%d')}/{unique_filename}"
+            s3_key = new_upload_key(file_name)
             
-            presigned_url = s3_client.generate_presigned_url(
+            presigned_url = presign_url(
                 'put_object',
-                Params={
-                    'Bucket': bucket_name,
-                    'Key': s3_key,
-                    'ContentType': content_type
-                },
-                ExpiresIn=3600
+                {'Bucket': bucket_name, 'Key': s3_key, 'ContentType': content_type},
+                PRESIGN_UPLOAD_TTL
             )
             
-            file_url = f"https://storage.yandexcloud.net/{bucket_name}/{s3_key}"
+            file_url = public_url(bucket_name, s3_key)
             
             print(f"Presigned URL generated: {s3_key}")
             
@@ -113,30 +152,28 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             else:
                 body_bytes = body.encode('utf-8') if isinstance(body, str) else body
             
-            boundary = content_type.split('boundary=')[-1]
-            environ = {
-                'REQUEST_METHOD': 'POST',
-                'CONTENT_TYPE': content_type,
-                'CONTENT_LENGTH': str(len(body_bytes))
-            }
+            # Parts are memoryview slices of the request body: the file is never copied
+            fields, files = read_multipart_form(body_bytes, content_type)
             
-            fp = BytesIO(body_bytes)
-            form = cgi.FieldStorage(fp=fp, environ=environ, headers={'content-type': content_type})
-            
-            if 'file' not in form:
+            if not files.get('file'):
                 return {
                     'statusCode': 400,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                     'body': json.dumps({'error': 'No file provided'})
                 }
             
-            file_item = form['file']
-            file_data = file_item.file.read()
-            file_name = form.getvalue('fileName', file_item.filename)
+            file_item = files['file'][0]
+            file_data = file_item.data
+            file_name = fields.get('fileName') or file_item.filename
             
         else:
             # JSON with base64 (supports chunked upload)
             body_data = json.loads(event.get('body', '{}'))
+            
+            # Multipart upload actions: the client PUTs parts straight to S3, bytes never pass through here
+            if body_data.get('action'):
+                return handle_multipart_action(body_data)
+            
             file_b64 = body_data.get('file', '')
             
             if not file_b64:
@@ -158,25 +195,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             file_data = base64.b64decode(file_b64)
         
         # S3 setup
-        access_key = os.environ.get('YC_S3_ACCESS_KEY_ID')
-        secret_key = os.environ.get('YC_S3_SECRET_ACCESS_KEY')
         bucket_name = os.environ.get('YC_S3_BUCKET_NAME')
+        s3_client = get_s3_client()
         
-        s3_client = boto3.client(
-            's3',
-            endpoint_url='https://storage.yandexcloud.net',
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            region_name='ru-central1'
-        )
-        
-        # Handle chunked upload
+        # Legacy chunked upload (temp-chunks/ + assembly); new clients use multipart actions
         if chunk_index is not None and total_chunks is not None:
             # First chunk: create S3 key
             if chunk_index == 0:
-                file_ext = file_name.split('.')[-1] if '.' in file_name else ''
-                unique_filename = f"{uuid.uuid4()}.{file_ext}" if file_ext else str(uuid.uuid4())
-                s3_key = f"uploads/{datetime.now().strftime('%Y/%m/%d')}/{unique_filename}"
+                s3_key = new_upload_key(file_name)
             else:
                 s3_key = existing_s3_key
             
@@ -212,7 +238,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 for i in range(total_chunks):
                     s3_client.delete_object(Bucket=bucket_name, Key=f"temp-chunks/{s3_key}/chunk_{i}")
                 
-                file_url = f"https://storage.yandexcloud.net/{bucket_name}/{s3_key}"
+                file_url = public_url(bucket_name, s3_key)
                 print(f"Chunked upload complete: {file_url}, size: {len(assembled_data)} bytes")
                 
                 return {
@@ -237,10 +263,15 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     })
                 }
         
-        # Single file upload (no chunking)
+        # Single file upload (no chunking): hashed here, stored once per distinct content
         file_ext = file_name.split('.')[-1] if '.' in file_name else ''
-        unique_filename = f"{uuid.uuid4()}.{file_ext}" if file_ext else str(uuid.uuid4())
-        s3_key = f"uploads/{datetime.now().strftime('%Y/%m/%d')}/{unique_filename}"
+        content_sha256 = hashlib.sha256(file_data).hexdigest()
+        
+        blob = reference_blob(content_sha256, file_name)
+        if blob:
+            return duplicate_response(bucket_name, blob, file_name)
+        
+        s3_key = blob_key(content_sha256, file_name)
         
         # Detect content type if not provided (for multipart uploads)
         if upload_content_type is None:
@@ -257,14 +288,16 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         print(f"Uploading to S3: {s3_key}, size={len(file_data)} bytes, type={upload_content_type}")
         
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=s3_key,
-            Body=file_data,
-            ContentType=upload_content_type
+        # Streamed from the buffer in chunks (multipart in S3 for large files), no bytes() copy
+        s3_client.upload_fileobj(
+            io.BufferedReader(MemoryviewReader(memoryview(file_data))),
+            bucket_name,
+            s3_key,
+            ExtraArgs={'ContentType': upload_content_type}
         )
         
-        file_url = f"https://storage.yandexcloud.net/{bucket_name}/{s3_key}"
+        file_url = public_url(bucket_name, s3_key)
+        register_blob(content_sha256, s3_key, len(file_data), upload_content_type, file_name)
         
         print(f"Upload successful: {file_url}")
         
@@ -275,7 +308,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'url': file_url,
                 's3Key': s3_key,
                 'fileName': file_name,
-                'fileSize': len(file_data)
+                'fileSize': len(file_data),
+                'sha256': content_sha256,
+                'duplicate': False
             })
         }
         
@@ -287,4 +322,352 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'statusCode': 500,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
             'body': json.dumps({'error': f'Upload failed: {str(e)}'})
-        }
\ No newline at end of file
+        }
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client(
+            's3',
+            endpoint_url=S3_ENDPOINT_URL,
+            aws_access_key_id=os.environ.get('YC_S3_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.environ.get('YC_S3_SECRET_ACCESS_KEY'),
+            region_name='ru-central1',
+            config=S3_CLIENT_CONFIG
+        )
+    return _s3_client
+
+def presign_url(operation: str, params: Dict[str, Any], ttl: int) -> str:
+    '''
+    Presigned URL cached by operation, object parameters and expiry window (LRU, PRESIGN_CACHE_SIZE).
+    ExpiresIn runs to the end of the window plus ttl, so a cached URL always has at least ttl left.
+    '''
+    now = time.time()
+    window = int(now // PRESIGN_WINDOW_SECONDS)
+    cache_key = (operation, tuple(sorted(params.items())), ttl, window)
+    
+    url = _presign_cache.get(cache_key)
+    if url is not None:
+        _presign_cache.move_to_end(cache_key)
+        return url
+    
+    expires_in = int((window + 1) * PRESIGN_WINDOW_SECONDS - now) + ttl
+    url = get_s3_client().generate_presigned_url(operation, Params=params, ExpiresIn=expires_in)
+    
+    _presign_cache[cache_key] = url
+    while len(_presign_cache) > PRESIGN_CACHE_SIZE:
+        _presign_cache.popitem(last=False)
+    return url
+
+def public_url(bucket_name: str, s3_key: str) -> str:
+    return f"{S3_ENDPOINT_URL}/{bucket_name}/{s3_key}"
+
+def new_upload_key(file_name: str) -> str:
+    file_ext = file_name.split('.')[-1] if '.' in file_name else ''
+    unique_filename = f"{uuid.uuid4()}.{file_ext}" if file_ext else str(uuid.uuid4())
+    return f"uploads/{datetime.now().strftime('%Y/%m/%d')}/{unique_filename}"
+
+def blob_key(content_sha256: str, file_name: str) -> str:
+    file_ext = file_name.split('.')[-1].lower() if '.' in file_name else ''
+    return f"blobs/{content_sha256[:2]}/{content_sha256}.{file_ext}" if file_ext else f"blobs/{content_sha256[:2]}/{content_sha256}"
+
+def stream_sha256(s3_client, bucket_name: str, s3_key: str) -> str:
+    digest = hashlib.sha256()
+    body = s3_client.get_object(Bucket=bucket_name, Key=s3_key)['Body']
+    for chunk in body.iter_chunks(VERIFY_CHUNK_BYTES):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def reference_blob(content_sha256: str, file_name: str) -> Dict[str, Any]:
+    '''
+    Existing blob for this content plus a new file reference to it; empty dict if the content is new.
+    Only for a hash computed here over bytes already received: never for a hash the client declared.
+    '''
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        return {}
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                WITH ref AS (
+                    INSERT INTO {SCHEMA}.file_refs (sha256, file_name)
+                    SELECT sha256, %s FROM {SCHEMA}.file_blobs WHERE sha256 = %s
+                    RETURNING sha256
+                )
+                UPDATE {SCHEMA}.file_blobs b
+                SET refs_count = b.refs_count + 1, last_referenced_at = CURRENT_TIMESTAMP
+                FROM ref WHERE b.sha256 = ref.sha256
+                RETURNING b.sha256, b.s3_key, b.size
+            """, (file_name, content_sha256))
+            row = cur.fetchone()
+    conn.close()
+    return {'sha256': row[0], 's3_key': row[1], 'size': row[2]} if row else {}
+
+def register_blob(content_sha256: str, s3_key: str, size: int, content_type: str, file_name: str) -> None:
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        return
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                INSERT INTO {SCHEMA}.file_blobs (sha256, s3_key, size, content_type)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (sha256) DO UPDATE SET refs_count = {SCHEMA}.file_blobs.refs_count + 1,
+                                                   last_referenced_at = CURRENT_TIMESTAMP
+            """, (content_sha256, s3_key, size, content_type))
+            cur.execute(
+                f"INSERT INTO {SCHEMA}.file_refs (sha256, file_name) VALUES (%s, %s)",
+                (content_sha256, file_name)
+            )
+    conn.close()
+
+def duplicate_response(bucket_name: str, blob: Dict[str, Any], file_name: str) -> Dict[str, Any]:
+    print(f"Duplicate upload: {file_name} -> {blob['s3_key']}")
+    return json_response(200, {
+        'url': public_url(bucket_name, blob['s3_key']),
+        's3Key': blob['s3_key'],
+        'fileName': file_name,
+        'fileSize': blob['size'],
+        'sha256': blob['sha256'],
+        'duplicate': True
+    })
+
+def json_response(status: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps(payload)
+    }
+
+def handle_multipart_action(body_data: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    S3 multipart upload without passing bytes through the function:
+    multipart_create -> uploadId and s3Key; multipart_presign -> PUT URLs for partNumbers;
+    client PUTs parts directly to storage; multipart_complete assembles them in S3 (parts with ETags
+    from the client, or listed from S3 if omitted); multipart_abort drops uploaded parts.
+    '''
+    action = body_data.get('action')
+    bucket_name = os.environ.get('YC_S3_BUCKET_NAME')
+    s3_client = get_s3_client()
+    
+    if action == 'multipart_create':
+        file_name = body_data.get('fileName', 'unnamed')
+        content_type = body_data.get('contentType', 'application/octet-stream')
+        declared_sha256 = (body_data.get('sha256') or '').lower()
+        
+        # A declared hash proves nothing: the parts always go to a private uploads/ key, the hash rides along
+        # in object metadata and only content verified on completion is matched against existing blobs
+        metadata = {}
+        if SHA256_RE.match(declared_sha256):
+            metadata['sha256'] = declared_sha256
+        s3_key = new_upload_key(file_name)
+        
+        upload = s3_client.create_multipart_upload(
+            Bucket=bucket_name, Key=s3_key, ContentType=content_type, Metadata=metadata
+        )
+        print(f"Multipart upload created: {s3_key}")
+        
+        return json_response(200, {
+            'uploadId': upload['UploadId'],
+            's3Key': s3_key,
+            'fileName': file_name,
+            'partSize': MULTIPART_PART_SIZE
+        })
+    
+    s3_key = body_data.get('s3Key')
+    upload_id = body_data.get('uploadId')
+    if not s3_key or not upload_id:
+        return json_response(400, {'error': 's3Key and uploadId are required'})
+    
+    if action == 'multipart_presign':
+        part_numbers = body_data.get('partNumbers')
+        try:
+            part_numbers = [parse_part_number(n) for n in part_numbers] if isinstance(part_numbers, list) else []
+        except ValueError:
+            part_numbers = []
+        if not part_numbers or len(part_numbers) > MAX_PRESIGN_PARTS:
+            return json_response(400, {'error': f'partNumbers: 1..{MAX_PRESIGN_PARTS} part numbers from 1 to {MAX_PART_NUMBER}'})
+        
+        urls = {
+            str(n): presign_url(
+                'upload_part',
+                {'Bucket': bucket_name, 'Key': s3_key, 'UploadId': upload_id, 'PartNumber': n},
+                MULTIPART_URL_TTL
+            )
+            for n in part_numbers
+        }
+        return json_response(200, {'urls': urls})
+    
+    if action == 'multipart_complete':
+        parts = body_data.get('parts')
+        if parts:
+            try:
+                parts = [{'PartNumber': parse_part_number(p['partNumber']), 'ETag': str(p['etag'])} for p in parts]
+            except (KeyError, TypeError, ValueError):
+                return json_response(400, {'error': f'parts: partNumber from 1 to {MAX_PART_NUMBER} and etag are required'})
+        else:
+            # Browsers may not see the ETag header (CORS ExposeHeaders), so list parts from S3
+            parts = []
+            paginator = s3_client.get_paginator('list_parts')
+            for page in paginator.paginate(Bucket=bucket_name, Key=s3_key, UploadId=upload_id):
+                parts.extend({'PartNumber': p['PartNumber'], 'ETag': p['ETag']} for p in page.get('Parts', []))
+        
+        if not parts:
+            return json_response(400, {'error': 'No uploaded parts'})
+        
+        parts.sort(key=lambda p: p['PartNumber'])
+        s3_client.complete_multipart_upload(
+            Bucket=bucket_name, Key=s3_key, UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+        head = s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+        file_size = head['ContentLength']
+        file_name = body_data.get('fileName', s3_key.rsplit('/', 1)[-1])
+        file_url = public_url(bucket_name, s3_key)
+        print(f"Multipart upload complete: {file_url}, {len(parts)} parts, size: {file_size} bytes")
+        
+        # The declared hash came from the client: the upload is checked under its own key, and only
+        # verified content is copied (inside S3) to the shared content address
+        content_sha256 = head.get('Metadata', {}).get('sha256', '')
+        if content_sha256 and s3_key.startswith('uploads/') and file_size <= VERIFY_MAX_BYTES:
+            actual_sha256 = stream_sha256(s3_client, bucket_name, s3_key)
+            if actual_sha256 != content_sha256:
+                s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
+                return json_response(400, {'error': 'Uploaded content does not match sha256'})
+            
+            # Same content finished meanwhile by another upload: reuse its blob, drop this copy
+            blob = reference_blob(content_sha256, file_name)
+            if blob:
+                s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
+                return duplicate_response(bucket_name, blob, file_name)
+            
+            upload_key, s3_key = s3_key, blob_key(content_sha256, file_name)
+            s3_client.copy({'Bucket': bucket_name, 'Key': upload_key}, bucket_name, s3_key)
+            s3_client.delete_object(Bucket=bucket_name, Key=upload_key)
+            register_blob(content_sha256, s3_key, file_size, head.get('ContentType'), file_name)
+            file_url = public_url(bucket_name, s3_key)
+        elif content_sha256:
+            print(f"Skipping sha256 verification of {s3_key}: {file_size} bytes over {VERIFY_MAX_BYTES}")
+            content_sha256 = ''
+        
+        return json_response(200, {
+            'url': file_url,
+            's3Key': s3_key,
+            'fileName': file_name,
+            'fileSize': file_size,
+            'sha256': content_sha256,
+            'duplicate': False
+        })
+    
+    if action == 'multipart_abort':
+        s3_client.abort_multipart_upload(Bucket=bucket_name, Key=s3_key, UploadId=upload_id)
+        print(f"Multipart upload aborted: {s3_key}")
+        return json_response(200, {'s3Key': s3_key, 'status': 'aborted'})
+    
+    return json_response(400, {'error': f'Unknown action: {action}'})
+
+def parse_part_number(value: Any) -> int:
+    '''Part number from JSON (integer or digit string) within 1..MAX_PART_NUMBER; ValueError otherwise'''
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f'Invalid part number: {value!r}')
+    number = int(value)
+    if not 1 <= number <= MAX_PART_NUMBER:
+        raise ValueError(f'Part number out of range: {number}')
+    return number
+
+class MultipartPart:
+    '''A multipart/form-data part: headers plus data as a memoryview over the request body'''
+    
+    def __init__(self, headers: Dict[str, str], data: memoryview):
+        self.headers = headers
+        self.data = data
+        params = dict(MULTIPART_PARAM_RE.findall(headers.get('content-disposition', '')))
+        self.name = unquote_header_value(params.get('name', ''))
+        self.filename = unquote_header_value(params['filename']) if 'filename' in params else None
+        self.content_type = headers.get('content-type', 'application/octet-stream')
+    
+    def text(self) -> str:
+        return str(self.data, 'utf-8')
+    
+    def chunks(self, size: int) -> Iterator[memoryview]:
+        for offset in range(0, len(self.data), size):
+            yield self.data[offset:offset + size]
+    
+    def open(self) -> BinaryIO:
+        return io.BufferedReader(MemoryviewReader(self.data))
+
+class MemoryviewReader(io.RawIOBase):
+    '''Seekable read-only file over a memoryview (for boto3 upload_fileobj) without copying it'''
+    
+    def __init__(self, data: memoryview):
+        self._data = data
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._data) - self._pos)
+        buffer[:size] = self._data[self._pos:self._pos + size]
+        self._pos += size
+        return size
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._data)}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+    
+    def tell(self) -> int:
+        return self._pos
+
+def iter_multipart(body: bytes, content_type: str) -> Iterator[MultipartPart]:
+    '''Single pass over the body: boundaries found with bytes.find, part data yielded as memoryview slices'''
+    match = MULTIPART_BOUNDARY_RE.search(content_type)
+    if not match:
+        raise ValueError('No boundary in Content-Type')
+    delimiter = b'--' + unquote_header_value(match.group(1)).encode('latin-1')
+    view = memoryview(body)
+    
+    position = body.find(delimiter)
+    if position < 0:
+        return
+    position += len(delimiter)
+    
+    while not body.startswith(b'--', position):
+        if body.startswith(b'\r\n', position):
+            position += 2
+        headers_end = body.find(b'\r\n\r\n', position)
+        if headers_end < 0:
+            raise ValueError('Malformed multipart part: no end of headers')
+        
+        headers = {}
+        for line in body[position:headers_end].decode('utf-8', errors='replace').split('\r\n'):
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        data_start = headers_end + 4
+        data_end = body.find(b'\r\n' + delimiter, data_start)
+        if data_end < 0:
+            raise ValueError('Malformed multipart part: no closing boundary')
+        
+        yield MultipartPart(headers, view[data_start:data_end])
+        position = data_end + 2 + len(delimiter)
+
+def read_multipart_form(body: bytes, content_type: str) -> Tuple[Dict[str, str], Dict[str, List[MultipartPart]]]:
+    fields: Dict[str, str] = {}
+    files: Dict[str, List[MultipartPart]] = defaultdict(list)
+    for part in iter_multipart(body, content_type):
+        if part.filename is not None:
+            files[part.name].append(part)
+        else:
+            fields[part.name] = part.text()
+    return fields, files
+
+def unquote_header_value(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
\ No newline at end of file
@@ -0,0 +1,130 @@
+'''
+Multipart round trip against a local S3 (moto_server): create -> presign -> PUT part -> complete, and
+create -> presign -> PUT part -> abort. Parts are PUT to the presigned URLs over HTTP, as the browser does.
+
+Run: pip install "moto[server]" boto3 psycopg2-binary && python -m unittest discover backend/upload-direct
+'''
+
+import hashlib
+import json
+import os
+import unittest
+import urllib.request
+
+from moto.server import ThreadedMotoServer
+
+BUCKET = 'upload-direct-test'
+PART_BYTES = b'0123456789abcdef' * 64
+
+server = ThreadedMotoServer(ip_address='127.0.0.1', port=0)
+server.start()
+host, port = server.get_host_and_port()
+os.environ.update({
+    'S3_ENDPOINT_URL': f'http://{host}:{port}',
+    'YC_S3_BUCKET_NAME': BUCKET,
+    'YC_S3_ACCESS_KEY_ID': 'test',
+    'YC_S3_SECRET_ACCESS_KEY': 'test',
+})
+os.environ.pop('DATABASE_URL', None)
+
+import index
+
+def tearDownModule():
+    server.stop()
+
+class MultipartRoundTripTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.s3 = index.get_s3_client()
+        cls.s3.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'ru-central1'})
+
+    def action(self, payload):
+        response = index.handler({'httpMethod': 'POST', 'headers': {}, 'body': json.dumps(payload)}, None)
+        return response['statusCode'], json.loads(response['body'])
+
+    def create(self, **extra):
+        status, body = self.action({'action': 'multipart_create', 'fileName': 'track.wav', 'contentType': 'audio/wav', **extra})
+        self.assertEqual(status, 200, body)
+        return body['uploadId'], body['s3Key']
+
+    def put_part(self, upload_id, s3_key, part_number, data):
+        status, body = self.action({
+            'action': 'multipart_presign', 'uploadId': upload_id, 's3Key': s3_key, 'partNumbers': [part_number]
+        })
+        self.assertEqual(status, 200, body)
+        # urllib would send data as a form by default; the browser sends the part as raw bytes
+        request = urllib.request.Request(
+            body['urls'][str(part_number)], data=data, method='PUT',
+            headers={'Content-Type': 'application/octet-stream'}
+        )
+        with urllib.request.urlopen(request) as response:
+            self.assertEqual(response.status, 200)
+            return response.headers['ETag']
+
+    def test_create_presign_put_complete(self):
+        upload_id, s3_key = self.create()
+        etag = self.put_part(upload_id, s3_key, 1, PART_BYTES)
+
+        status, body = self.action({
+            'action': 'multipart_complete', 'uploadId': upload_id, 's3Key': s3_key, 'fileName': 'track.wav',
+            'parts': [{'partNumber': 1, 'etag': etag}]
+        })
+        self.assertEqual(status, 200, body)
+        self.assertEqual(body['s3Key'], s3_key)
+        self.assertEqual(body['fileSize'], len(PART_BYTES))
+        self.assertEqual(self.s3.get_object(Bucket=BUCKET, Key=s3_key)['Body'].read(), PART_BYTES)
+
+    def test_complete_lists_parts_when_etags_are_omitted(self):
+        upload_id, s3_key = self.create()
+        self.put_part(upload_id, s3_key, 1, PART_BYTES)
+
+        status, body = self.action({'action': 'multipart_complete', 'uploadId': upload_id, 's3Key': s3_key})
+        self.assertEqual(status, 200, body)
+        self.assertEqual(body['fileSize'], len(PART_BYTES))
+
+    def test_declared_sha256_is_verified_and_moved_to_blob(self):
+        sha256 = hashlib.sha256(PART_BYTES).hexdigest()
+        upload_id, s3_key = self.create(sha256=sha256)
+        self.put_part(upload_id, s3_key, 1, PART_BYTES)
+
+        status, body = self.action({'action': 'multipart_complete', 'uploadId': upload_id, 's3Key': s3_key, 'fileName': 'track.wav'})
+        self.assertEqual(status, 200, body)
+        self.assertEqual(body['s3Key'], index.blob_key(sha256, 'track.wav'))
+        self.assertEqual(body['sha256'], sha256)
+        self.assertEqual(self.s3.get_object(Bucket=BUCKET, Key=body['s3Key'])['Body'].read(), PART_BYTES)
+        self.assertNotIn('Contents', self.s3.list_objects_v2(Bucket=BUCKET, Prefix=s3_key))
+
+    def test_declared_sha256_mismatch_is_rejected(self):
+        upload_id, s3_key = self.create(sha256='0' * 64)
+        self.put_part(upload_id, s3_key, 1, PART_BYTES)
+
+        status, body = self.action({'action': 'multipart_complete', 'uploadId': upload_id, 's3Key': s3_key})
+        self.assertEqual(status, 400, body)
+        self.assertNotIn('Contents', self.s3.list_objects_v2(Bucket=BUCKET, Prefix=s3_key))
+
+    def test_create_presign_put_abort(self):
+        upload_id, s3_key = self.create()
+        self.put_part(upload_id, s3_key, 1, PART_BYTES)
+
+        status, body = self.action({'action': 'multipart_abort', 'uploadId': upload_id, 's3Key': s3_key})
+        self.assertEqual(status, 200, body)
+        self.assertEqual(body['status'], 'aborted')
+        uploads = self.s3.list_multipart_uploads(Bucket=BUCKET, Prefix=s3_key).get('Uploads', [])
+        self.assertEqual(uploads, [])
+
+    def test_malformed_part_numbers_are_rejected(self):
+        upload_id, s3_key = self.create()
+        for part_numbers in (['x'], [0], [10001], [1.5], [True], '12', []):
+            status, body = self.action({
+                'action': 'multipart_presign', 'uploadId': upload_id, 's3Key': s3_key, 'partNumbers': part_numbers
+            })
+            self.assertEqual(status, 400, (part_numbers, body))
+
+        for parts in ([{'partNumber': 'x', 'etag': '"e"'}], [{'partNumber': 10001, 'etag': '"e"'}], [{'etag': '"e"'}], ['x']):
+            status, body = self.action({'action': 'multipart_complete', 'uploadId': upload_id, 's3Key': s3_key, 'parts': parts})
+            self.assertEqual(status, 400, (parts, body))
+
+        self.action({'action': 'multipart_abort', 'uploadId': upload_id, 's3Key': s3_key})
+
+if __name__ == '__main__':
+    unittest.main()
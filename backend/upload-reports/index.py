@@ -1,6 +1,6 @@
 '''
 Business: Upload and split artist streaming reports from CSV/Excel files
-Args: event with httpMethod, body (base64 encoded file), queryStringParameters
+Args: event with httpMethod, body (base64 encoded file or background job action), queryStringParameters
 Returns: HTTP response with split reports by artist
 '''
 
@@ -9,9 +9,23 @@ import base64
 import csv
 import io
 import os
-from typing import Dict, Any, List
+import itertools
+import hashlib
+import time
+import tempfile
+import shutil
+import re
+import lzma
+import math
+from typing import Dict, Any, List, Tuple, Iterator, Callable, Optional, BinaryIO
+from operator import itemgetter
 import psycopg2
+import psycopg2.extras
+import numpy as np
+import boto3
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 
 try:
     import openpyxl
@@ -19,6 +33,190 @@ try:
 except ImportError:
     EXCEL_AVAILABLE = False
 
+# Строка заголовков ищется только среди первых строк файла
+SNIFF_ROWS = 50
+
+DETECTION_SAMPLE_ROWS = 200
+
+# Профиль колонок исполнителя кэшируется, только если он построен хотя бы по стольким строкам
+MIN_PROFILE_SAMPLE_ROWS = 20
+
+PERFORMER_COLUMN_NAMES = ['Исполнитель', 'исполнитель', 'Performer', 'performer', 'Artist', 'artist', 'Артист', 'артист']
+
+NO_PERFORMER = 'Без исполнителя'
+
+# Строки уходят в report_rows через COPY пачками такого размера
+COPY_BATCH_ROWS = 5000
+
+# Типизированные колонки report_rows и варианты заголовков отчётов (в нижнем регистре, по приоритету)
+REPORT_COLUMN_ALIASES = {
+    'track': ['название трека', 'трек', 'название произведения', 'произведение', 'название', 'track', 'track name', 'track title', 'title'],
+    'album': ['название альбома', 'альбом', 'релиз', 'album', 'album name', 'release'],
+    'platform': ['площадка', 'платформа', 'сервис', 'platform', 'store', 'service', 'dsp'],
+    'territory': ['территория', 'страна', 'territory', 'country'],
+    'period': ['отчетный период', 'отчётный период', 'период', 'месяц', 'period', 'sales period', 'month'],
+    'quantity': ['количество прослушиваний', 'прослушивания', 'количество', 'кол-во', 'quantity', 'plays', 'streams', 'units'],
+    'revenue': ['итого вознаграждение', 'вознаграждение', 'доход', 'сумма', 'net revenue', 'revenue', 'royalty', 'amount', 'total'],
+}
+
+TEXT_FIELDS = ['track', 'album', 'platform', 'territory', 'period']
+
+# Известные форматы отчётов дистрибьюторов. signature — заголовки (в нижнем регистре), которые должны
+# встретиться в одной строке; header_row — номер строки заголовков (с 1), если шаблон её фиксирует;
+# columns — заголовки типизированных полей, остальные поля ищутся по REPORT_COLUMN_ALIASES;
+# decimal — десятичный разделитель в числах отчёта
+REPORT_FORMATS = [
+    {
+        'name': 'author_royalty_xlsx',
+        'header_row': 34,
+        'signature': ['исполнитель', 'площадка', 'итого вознаграждение'],
+        'performer': ['исполнитель'],
+        'columns': {
+            'track': 'название трека',
+            'album': 'альбом',
+            'platform': 'площадка',
+            'territory': 'территория',
+            'period': 'период',
+            'quantity': 'количество',
+            'revenue': 'итого вознаграждение',
+        },
+        'decimal': ',',
+    },
+    {
+        'name': 'dsp_sales_en',
+        'header_row': None,
+        'signature': ['artist', 'track title', 'store', 'quantity', 'net revenue'],
+        'performer': ['artist'],
+        'columns': {
+            'track': 'track title',
+            'album': 'release',
+            'platform': 'store',
+            'territory': 'country',
+            'period': 'sales period',
+            'quantity': 'quantity',
+            'revenue': 'net revenue',
+        },
+        'decimal': '.',
+    },
+]
+
+# Фоновая обработка: сколько секунд один вызов обрабатывает очередь и на сколько захватывает задачу
+JOB_TIME_BUDGET_SECONDS = int(os.environ.get('REPORT_JOB_TIME_BUDGET', '240'))
+JOB_LEASE_SECONDS = JOB_TIME_BUDGET_SECONDS + 60
+MAX_JOB_ATTEMPTS = 3
+
+UPLOAD_URL_TTL = 3600
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# CSV больше этого размера не отдаётся в теле ответа: он сохраняется в хранилище и клиент
+# перенаправляется на presigned URL; строки читаются из базы серверным курсором пачками
+INLINE_DOWNLOAD_BYTES = 2 * 1024 * 1024
+DOWNLOAD_FETCH_ROWS = 5000
+DOWNLOAD_URL_TTL = 600
+
+# Отчётный период в строках — свободный текст ("2024-01", "01.2024", "Январь 2024", "01.01.2024 - 31.01.2024");
+# для сравнения загрузок он приводится к месяцам YYYY-MM
+PERIOD_DATE_RE = re.compile(
+    r'(?<!\d)(?P<iso_year>\d{4})[-./](?P<iso_month>\d{1,2})(?:[-./]\d{1,2})?(?!\d)'
+    r'|(?<!\d)(?:\d{1,2}[-./])?(?P<month>\d{1,2})[-./](?P<year>\d{4})(?!\d)'
+    r'|(?P<month_name>[a-zа-яё]{3,})\.?\s+(?P<named_year>\d{4})(?!\d)',
+    re.IGNORECASE
+)
+PERIOD_MONTH_NAMES = {
+    'янв': 1, 'фев': 2, 'мар': 3, 'апр': 4, 'май': 5, 'мая': 5, 'июн': 6, 'июл': 7, 'авг': 8, 'сен': 9, 'окт': 10, 'ноя': 11, 'дек': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+# Участники совместных релизов: "A & B", "A feat. B". Запятая и "/" не делят имя: они бывают его частью
+# ("Tyler, The Creator", "AC/DC")
+PERFORMER_SPLIT_RE = re.compile(r'\s*(?:&|\bfeat\b\.?|\bft\b\.?|\bfeaturing\b)\s*', re.IGNORECASE)
+
+# Лучший пользователь для каждого имени: псевдоним из ручных привязок, иначе триграммное сходство
+# с full_name или username артиста (GIN-индексы по normalize_performer, V0058). Все имена — один запрос.
+MATCH_PERFORMERS_SQL = """
+    SELECT p.file_id, p.is_full, m.user_id, m.score, m.method
+    FROM unnest(%s::INTEGER[], %s::TEXT[], %s::BOOLEAN[]) AS p(file_id, part, is_full)
+    CROSS JOIN LATERAL (
+        SELECT c.user_id, c.score, c.method
+        FROM (
+            SELECT a.user_id, 1.0::REAL AS score, 'alias' AS method
+            FROM t_p35759334_music_label_portal.performer_aliases a
+            WHERE a.alias = t_p35759334_music_label_portal.normalize_performer(p.part)
+            UNION ALL
+            SELECT u.id, similarity(t_p35759334_music_label_portal.normalize_performer(u.full_name),
+                                    t_p35759334_music_label_portal.normalize_performer(p.part)), 'name'
+            FROM t_p35759334_music_label_portal.users u
+            WHERE u.role = 'artist' AND COALESCE(u.is_blocked, FALSE) = FALSE
+              AND t_p35759334_music_label_portal.normalize_performer(u.full_name) %% t_p35759334_music_label_portal.normalize_performer(p.part)
+            UNION ALL
+            SELECT u.id, similarity(t_p35759334_music_label_portal.normalize_performer(u.username),
+                                    t_p35759334_music_label_portal.normalize_performer(p.part)), 'name'
+            FROM t_p35759334_music_label_portal.users u
+            WHERE u.role = 'artist' AND COALESCE(u.is_blocked, FALSE) = FALSE
+              AND t_p35759334_music_label_portal.normalize_performer(u.username) %% t_p35759334_music_label_portal.normalize_performer(p.part)
+        ) c
+        ORDER BY c.score DESC
+        LIMIT 1
+    ) m
+"""
+
+# multipart/form-data: boundary из Content-Type и параметры Content-Disposition части
+MULTIPART_BOUNDARY_RE = re.compile(r'boundary=("[^"]+"|[^;\s]+)', re.IGNORECASE)
+MULTIPART_PARAM_RE = re.compile(r';\s*([\w*]+)=("(?:[^"\\]|\\.)*"|[^;]*)')
+
+# Строки отчётов старше REPORT_ARCHIVE_MONTHS уходят из базы в сжатые колоночные архивы в хранилище
+# (report-archive/<file_id>.json.xz); начисления в report_royalties остаются в базе.
+# Архив — строки JSON: заголовок, затем блоки по ARCHIVE_CHUNK_ROWS строк, чтобы читать его потоком
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('REPORT_ARCHIVE_MONTHS', '12'))
+ARCHIVE_FORMAT_VERSION = 2
+ARCHIVE_CHUNK_ROWS = 5000
+ARCHIVE_TYPED_COLUMNS = ['row_num'] + TEXT_FIELDS + ['quantity', 'revenue']
+
+# Пакетная загрузка (несколько файлов и листов): число процессов разбора и порог,
+# после которого буфер COPY уходит из памяти во временный файл
+BATCH_WORKERS = int(os.environ.get('REPORT_BATCH_WORKERS', os.cpu_count() or 1))
+BATCH_SPOOL_BYTES = 64 * 1024 * 1024
+
+# Страница списка файлов исполнителей (GET без file_id)
+DEFAULT_FILES_PAGE_SIZE = 100
+MAX_FILES_PAGE_SIZE = 500
+
+# Строки отчётов артиста (?rows=1): допустимые сортировки и группировки, размер страницы
+ROWS_SORT_COLUMNS = ['track', 'album', 'platform', 'territory', 'period', 'quantity', 'revenue', 'net']
+ROWS_GROUP_COLUMNS = ['track', 'platform', 'territory', 'period']
+DEFAULT_ROWS_PAGE_SIZE = 50
+MAX_ROWS_PAGE_SIZE = 500
+
+# Разрезы начислений (report_royalties) для ?royalties=
+ROYALTY_GROUPS = {
+    'artist': ['artist_username', 'artist_id'],
+    'track': ['artist_username', 'track', 'album'],
+    'platform': ['platform'],
+    'period': ['period'],
+    'platform_period': ['platform', 'period'],
+}
+
+# Отпечаток строк файла исполнителя — сумма 64-битных хэшей строк по модулю 2^64:
+# считается пачками и не зависит от того, сколько вызовов грузили файл
+FINGERPRINT_MODULUS = 2 ** 64
+
+COPY_REPORT_ROWS_SQL = """
+    COPY t_p35759334_music_label_portal.report_rows
+    (report_file_id, row_num, track, album, platform, territory, period, quantity, revenue, raw_values)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+# Действия с архивами отчётов, доступные только директору
+DIRECTOR_ACTIONS = ('archive_reports', 'restore_archive')
+
+# Строки архивированных файлов для ?rows=1 читаются из архивов во временную таблицу на время запроса
+COPY_ARCHIVED_ROWS_SQL = """
+    COPY archived_report_rows
+    (report_file_id, row_num, track, album, platform, territory, period, quantity, revenue, raw_values)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
@@ -34,50 +232,74 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': ''
         }
     
+    # Триггер-таймер вызывает функцию без httpMethod: обработка очереди загрузок
+    if event.get('messages'):
+        return handle_job_action({'action': 'process_jobs'}, context)
+    
     if method == 'POST':
         try:
             content_type = event.get('headers', {}).get('content-type', event.get('headers', {}).get('Content-Type', ''))
             
             if 'multipart/form-data' in content_type:
-                import cgi
-                from io import BytesIO
-                
                 body = event.get('body', '')
                 if event.get('isBase64Encoded'):
                     body = base64.b64decode(body)
                 else:
                     body = body.encode('utf-8')
                 
-                environ = {
-                    'REQUEST_METHOD': 'POST',
-                    'CONTENT_TYPE': content_type,
-                    'CONTENT_LENGTH': len(body)
-                }
+                # Части формы — срезы memoryview поверх тела запроса, файл не копируется
+                fields, files = read_multipart_form(body, content_type)
+                uploaded_by = fields.get('uploaded_by')
+                period = fields.get('period')
+                file_parts = files.get('file', [])
                 
-                form = cgi.FieldStorage(
-                    fp=BytesIO(body),
-                    environ=environ,
-                    keep_blank_values=True
-                )
+                # Несколько полей file — пакетная загрузка одним отчётом
+                if len(file_parts) > 1:
+                    sources = [{
+                        'file_name': part.filename,
+                        'file_type': 'xlsx' if part.filename.endswith('.xlsx') else 'csv',
+                        # Процессам разбора нужны bytes (memoryview не передаётся между процессами)
+                        'content': part.data.tobytes(),
+                        'sheets': None
+                    } for part in file_parts]
+                    return ingest_report_batch(sources, uploaded_by, period)
                 
-                uploaded_by = form.getvalue('uploaded_by')
-                file_field = form['file']
-                file_name = file_field.filename
-                file_content = file_field.file.read()
-                file_type = 'xlsx' if file_name.endswith('.xlsx') else 'csv'
-                
-                if not file_content or not uploaded_by:
+                if not file_parts or not file_parts[0].data or not uploaded_by:
                     return {
                         'statusCode': 400,
                         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                         'body': json.dumps({'error': 'Требуется файл и uploaded_by'})
                     }
+                
+                file_name = file_parts[0].filename
+                file_type = 'xlsx' if file_name.endswith('.xlsx') else 'csv'
+                file_stream = file_parts[0].open()
             else:
                 body_data = json.loads(event.get('body', '{}'))
+                
+                # Большие отчёты: загрузка в хранилище и фоновая обработка (report_upload_jobs)
+                if body_data.get('action'):
+                    if body_data['action'] in DIRECTOR_ACTIONS:
+                        denied = require_director(event)
+                        if denied:
+                            return denied
+                    return handle_job_action(body_data, context)
+                
+                # Квартальные пакеты: несколько файлов и листов разбираются параллельно и загружаются одним отчётом
+                if body_data.get('files'):
+                    sources = [{
+                        'file_name': item.get('file_name', 'report.csv'),
+                        'file_type': item.get('file_type', 'csv'),
+                        'content': base64.b64decode(item.get('file_content', '')),
+                        'sheets': item.get('sheets')
+                    } for item in body_data['files']]
+                    return ingest_report_batch(sources, body_data.get('uploaded_by'), body_data.get('period'))
+                
                 file_content = body_data.get('file_content', '')
                 file_type = body_data.get('file_type', 'csv')
                 file_name = body_data.get('file_name', 'report.csv')
                 uploaded_by = body_data.get('uploaded_by')
+                period = body_data.get('period')
                 
                 if not file_content or not uploaded_by:
                     return {
@@ -86,46 +308,16 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'body': json.dumps({'error': 'Требуется file_content и uploaded_by'})
                     }
                 
-                file_content = base64.b64decode(file_content)
+                file_stream = io.BytesIO(base64.b64decode(file_content))
             
-            if file_type == 'xlsx':
-                if not EXCEL_AVAILABLE:
-                    return {
-                        'statusCode': 500,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'body': json.dumps({'error': 'Поддержка Excel не установлена'})
-                    }
-                
-                if isinstance(file_content, bytes):
-                    workbook = openpyxl.load_workbook(io.BytesIO(file_content))
-                else:
-                    decoded_bytes = base64.b64decode(file_content)
-                    workbook = openpyxl.load_workbook(io.BytesIO(decoded_bytes))
-                sheet = workbook.active
-                
-                header_row_index = 34
-                data_start_row = 35
-                
-                header_row = list(sheet.iter_rows(min_row=header_row_index, max_row=header_row_index, values_only=True))[0]
-                headers = [str(cell).strip() if cell is not None and str(cell).strip() else f'col_{i}' for i, cell in enumerate(header_row)]
-                
-                print(f"DEBUG: Found headers at row {header_row_index}: {headers[:5]}... total {len(headers)} columns")
-                print(f"DEBUG: Column W (index 22): {headers[22] if len(headers) > 22 else 'N/A'}")
-                
-                rows = []
-                for row_cells in sheet.iter_rows(min_row=data_start_row, values_only=True):
-                    if any(cell is not None for cell in row_cells):
-                        row_dict = {}
-                        for i, header in enumerate(headers):
-                            row_dict[header] = row_cells[i] if i < len(row_cells) else None
-                        rows.append(row_dict)
-            else:
-                if isinstance(file_content, bytes):
-                    decoded_content = file_content.decode('utf-8')
-                else:
-                    decoded_content = file_content
-                csv_reader = csv.DictReader(io.StringIO(decoded_content))
-                rows = [row for row in csv_reader if any(v for v in row.values())]
+            if file_type == 'xlsx' and not EXCEL_AVAILABLE:
+                return {
+                    'statusCode': 500,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': 'Поддержка Excel не установлена'})
+                }
+            
+            content_sha256 = sha256_of_stream(file_stream)
             
             dsn = os.environ.get('DATABASE_URL')
             if not dsn:
@@ -138,123 +330,32 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             conn = psycopg2.connect(dsn)
             cursor = conn.cursor()
             
-            performer_columns = []
-            possible_names = ['Исполнитель', 'исполнитель', 'Performer', 'performer', 'Artist', 'artist', 'Артист', 'артист']
+            # Тот же файл уже загружен: отдаём существующий отчёт, ничего не разбирая
+            existing_report_id = find_report_by_hash(cursor, content_sha256)
+            if existing_report_id:
+                response = duplicate_upload_response(cursor, existing_report_id)
+                cursor.close()
+                conn.close()
+                return response
             
-            print(f"DEBUG: Total rows parsed: {len(rows)}")
-            if rows:
-                all_columns = list(rows[0].keys())
-                print(f"DEBUG: All columns ({len(all_columns)}): {all_columns}")
-                
-                for name in possible_names:
-                    if name in rows[0]:
-                        performer_columns.append(name)
-                        print(f"DEBUG: Found performer column by name: {name}")
-                
-                if performer_columns:
-                    print(f"DEBUG: Using columns for performers: {performer_columns}")
-                
-                if not performer_columns:
-                    print(f"DEBUG: Column name not found, analyzing data patterns...")
-                    
-                    candidates = []
-                    
-                    for col_name in all_columns:
-                        values = [str(row.get(col_name, '')).strip() 
-                                 for row in rows[:200] 
-                                 if row.get(col_name) is not None]
-                        
-                        non_empty = [v for v in values if v and v.lower() not in ['none', 'null', '']]
-                        
-                        if len(non_empty) < 50:
-                            continue
-                        
-                        def is_numeric_or_formula(s):
-                            s_clean = s.strip()
-                            if s_clean.startswith('='):
-                                return True
-                            try:
-                                float(s_clean.replace(',', ''))
-                                return True
-                            except:
-                                return False
-                        
-                        numeric_count = sum(1 for v in non_empty if is_numeric_or_formula(v))
-                        numeric_ratio = numeric_count / len(non_empty) if non_empty else 0
-                        
-                        if numeric_ratio > 0.7:
-                            continue
-                        
-                        unique_count = len(set(non_empty))
-                        total_count = len(non_empty)
-                        unique_ratio = unique_count / total_count if total_count > 0 else 0
-                        
-                        avg_length = sum(len(v) for v in non_empty) / len(non_empty) if non_empty else 0
-                        
-                        if unique_ratio > 0.3 and avg_length > 5 and avg_length < 150:
-                            candidates.append((col_name, unique_ratio, unique_count, total_count))
-                            print(f"DEBUG: Candidate {col_name}: {unique_count} unique / {total_count} total = {unique_ratio:.2%}, avg_len={avg_length:.0f}, numeric={numeric_ratio:.0%}")
-                    
-                    if candidates:
-                        candidates.sort(key=lambda x: x[1], reverse=True)
-                        performer_columns = [c[0] for c in candidates[:2]]
-                        print(f"DEBUG: Auto-detected performer columns: {performer_columns}")
-            
-            if not performer_columns:
-                print(f"DEBUG: Performer columns not found! All data will go to 'Без исполнителя'")
-            
-            artist_data = defaultdict(list)
+            # Строки читаются потоково и сразу раскладываются по исполнителям:
+            # в памяти нет ни списка всех строк, ни словаря на каждую строку
+            raw_rows = iter_xlsx_rows(file_stream) if file_type == 'xlsx' else iter_csv_rows(file_stream)
+            report_format, headers, row_iter = sniff_report(raw_rows)
             
-            for row in rows:
-                performers = []
-                
-                for col in performer_columns:
-                    value = str(row.get(col, '')).strip()
-                    if value and value.lower() not in ['none', 'null', '']:
-                        performers.append(value)
-                
-                performer = ' & '.join(performers) if performers else ''
-                performer = performer.strip()
-                
-                if performer:
-                    artist_data[performer].append(row)
-                else:
-                    artist_data['Без исполнителя'].append(row)
+            # Для определения колонки исполнителя нужны только первые строки
+            sample_rows = list(itertools.islice(row_iter, DETECTION_SAMPLE_ROWS))
+            performer_indices = resolve_performer_columns(cursor, headers, report_format, sample_rows)
             
-            print(f"DEBUG: Found {len(artist_data)} unique performers")
-            if len(artist_data) <= 20:
-                print(f"DEBUG: Performers list: {list(artist_data.keys())}")
-            else:
-                print(f"DEBUG: First 20 performers: {list(artist_data.keys())[:20]}")
+            uploaded_report_id = create_uploaded_report(cursor, file_name, uploaded_by, headers, report_format, content_sha256)
             
-            cursor.execute(
-                "INSERT INTO t_p35759334_music_label_portal.uploaded_reports (file_name, uploaded_by, total_rows, processed) VALUES (%s, %s, %s, %s) RETURNING id",
-                (file_name, uploaded_by, len(rows), True)
+            total_rows, _ = load_report_rows(
+                cursor, uploaded_report_id, headers, report_format, performer_indices,
+                itertools.chain(sample_rows, row_iter)
             )
-            uploaded_report_id = cursor.fetchone()[0]
             
-            created_files = []
-            for performer_name, performer_rows in artist_data.items():
-                cursor.execute("""
-                    INSERT INTO t_p35759334_music_label_portal.artist_report_files 
-                    (uploaded_report_id, artist_username, artist_full_name, data, deduction_percent)
-                    VALUES (%s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    uploaded_report_id,
-                    performer_name,
-                    performer_name,
-                    json.dumps(performer_rows),
-                    0
-                ))
-                
-                file_id = cursor.fetchone()[0]
-                created_files.append({
-                    'id': file_id,
-                    'artist_username': performer_name,
-                    'artist_full_name': performer_name,
-                    'rows_count': len(performer_rows)
-                })
+            diff = finalize_uploaded_report(cursor, uploaded_report_id, total_rows, period)
+            created_files = report_files_summary(cursor, uploaded_report_id)
             
             conn.commit()
             cursor.close()
@@ -265,8 +366,11 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                 'body': json.dumps({
                     'success': True,
+                    'duplicate': False,
                     'uploaded_report_id': uploaded_report_id,
-                    'total_rows': len(rows),
+                    'total_rows': total_rows,
+                    'format': report_format['name'] if report_format else None,
+                    'diff': diff,
                     'artist_files': created_files
                 })
             }
@@ -288,121 +392,209 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             conn = psycopg2.connect(dsn)
             cursor = conn.cursor()
             
+            if params.get('job_id'):
+                job = report_job_status(cursor, int(params['job_id']))
+                cursor.close()
+                conn.close()
+                
+                if not job:
+                    return {
+                        'statusCode': 404,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Задача не найдена'})
+                    }
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps(job)
+                }
+            
             if file_id:
+                # Строки и кэш CSV принадлежат файлу-владельцу строк (rows_file_id, V0055)
                 cursor.execute("""
-                    SELECT id, artist_username, artist_full_name, deduction_percent, sent_to_artist_id, sent_at, 
-                           data
-                    FROM t_p35759334_music_label_portal.artist_report_files
-                    WHERE id = %s
+                    SELECT arf.artist_username, owner.id, owner.data IS NOT NULL, ur.headers, owner.csv_storage_key,
+                           owner.archive_key
+                    FROM t_p35759334_music_label_portal.artist_report_files arf
+                    JOIN t_p35759334_music_label_portal.artist_report_files owner ON owner.id = COALESCE(arf.rows_file_id, arf.id)
+                    JOIN t_p35759334_music_label_portal.uploaded_reports ur ON owner.uploaded_report_id = ur.id
+                    WHERE arf.id = %s
                 """, (file_id,))
                 row = cursor.fetchone()
-                cursor.close()
-                conn.close()
                 
                 if not row:
+                    cursor.close()
+                    conn.close()
                     return {
                         'statusCode': 404,
                         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                         'body': json.dumps({'error': 'Файл не найден'})
                     }
                 
-                full_data = row[6]
-                rows_count = len(full_data)
+                artist_username, rows_file_id, is_legacy, headers, csv_storage_key, archive_key = row
+                download_name = f"artist_{artist_username}.csv"
+                force_inline = params.get('inline') in ('1', 'true')
+                storage = get_report_storage()
                 
-                csv_output = io.StringIO()
-                if full_data:
-                    headers = list(full_data[0].keys())
-                    writer = csv.DictWriter(csv_output, fieldnames=headers)
-                    writer.writeheader()
-                    writer.writerows(full_data)
+                # Готовый CSV уже лежит в хранилище: отдаём ссылку, база не читается
+                if csv_storage_key and not force_inline:
+                    download_url = storage.download_url(csv_storage_key, download_name)
+                    if download_url:
+                        cursor.close()
+                        conn.close()
+                        return redirect_response(download_url)
+                
+                csv_file = render_report_csv(conn, rows_file_id, is_legacy, headers, archive_key)
+                csv_size = csv_file.seek(0, io.SEEK_END)
+                csv_file.seek(0)
+                
+                if csv_size > INLINE_DOWNLOAD_BYTES and not force_inline:
+                    csv_storage_key = f"report-csv/{rows_file_id}.csv"
+                    storage.put_file(csv_storage_key, csv_file, 'text/csv')
+                    download_url = storage.download_url(csv_storage_key, download_name)
+                    if download_url:
+                        cursor.execute(
+                            "UPDATE t_p35759334_music_label_portal.artist_report_files SET csv_storage_key = %s WHERE id = %s",
+                            (csv_storage_key, rows_file_id)
+                        )
+                        conn.commit()
+                        csv_file.close()
+                        cursor.close()
+                        conn.close()
+                        return redirect_response(download_url)
+                    csv_file.seek(0)
+                
+                cursor.close()
+                conn.close()
                 
-                csv_content = csv_output.getvalue()
+                with csv_file:
+                    csv_content = csv_file.read().decode('utf-8')
                 
                 return {
                     'statusCode': 200,
                     'headers': {
                         'Content-Type': 'text/csv',
                         'Access-Control-Allow-Origin': '*',
-                        'Content-Disposition': f'attachment; filename="artist_{row[1]}.csv"'
+                        'Content-Disposition': f'attachment; filename="{download_name}"'
                     },
                     'body': csv_content
                 }
             
-            if uploaded_report_id:
-                cursor.execute("""
-                    SELECT DISTINCT artist_username, artist_full_name
-                    FROM t_p35759334_music_label_portal.artist_report_files
-                    WHERE uploaded_report_id = %s
-                    ORDER BY artist_username
-                """, (uploaded_report_id,))
-                
-                performers = []
-                for row in cursor.fetchall():
-                    performers.append({
-                        'username': row[0],
-                        'full_name': row[1]
-                    })
-                
-                cursor.execute("""
-                    SELECT id, artist_username, artist_full_name, deduction_percent, sent_to_artist_id, sent_at, 
-                           jsonb_array_length(data) as rows_count
-                    FROM t_p35759334_music_label_portal.artist_report_files
-                    WHERE uploaded_report_id = %s
-                    ORDER BY artist_username
-                """, (uploaded_report_id,))
+            if params.get('rows') or params.get('compare_to'):
+                requester_id = requester_user_id(event)
+                if requester_id is None:
+                    cursor.close()
+                    conn.close()
+                    return {
+                        'statusCode': 401,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Unauthorized'})
+                    }
                 
-                files = []
-                for row in cursor.fetchall():
-                    files.append({
-                        'id': row[0],
-                        'artist_username': row[1],
-                        'artist_full_name': row[2],
-                        'deduction_percent': float(row[3]) if row[3] else 0,
-                        'sent_to_artist_id': row[4],
-                        'sent_at': row[5].isoformat() if row[5] else None,
-                        'rows_count': row[6]
-                    })
+                try:
+                    if params.get('compare_to'):
+                        page = compare_uploads(cursor, requester_id, params)
+                    else:
+                        page = query_report_rows(cursor, requester_id, params)
+                except ValueError as e:
+                    cursor.close()
+                    conn.close()
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': str(e)})
+                    }
                 
                 cursor.close()
                 conn.close()
+                if page is None:
+                    return {
+                        'statusCode': 403,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Нет доступа к отчётам артиста'})
+                    }
                 
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'files': files, 'performers': performers})
+                    'body': json.dumps(page)
                 }
-            else:
-                cursor.execute("""
-                    SELECT arf.id, arf.artist_username, arf.artist_full_name, arf.deduction_percent, 
-                           arf.sent_to_artist_id, arf.sent_at, jsonb_array_length(arf.data) as rows_count,
-                           ur.file_name, ur.uploaded_at
-                    FROM t_p35759334_music_label_portal.artist_report_files arf
-                    JOIN t_p35759334_music_label_portal.uploaded_reports ur ON arf.uploaded_report_id = ur.id
-                    ORDER BY ur.uploaded_at DESC, arf.artist_username
-                """)
-            
-                files = []
-                for row in cursor.fetchall():
-                    files.append({
-                        'id': row[0],
-                        'artist_username': row[1],
-                        'artist_full_name': row[2],
-                        'deduction_percent': float(row[3]) if row[3] else 0,
-                        'sent_to_artist_id': row[4],
-                        'sent_at': row[5].isoformat() if row[5] else None,
-                        'rows_count': row[6],
-                        'file_name': row[7],
-                        'uploaded_at': row[8].isoformat() if row[8] else None
-                    })
             
+            if params.get('artist_id') or params.get('royalties'):
+                requester_id = requester_user_id(event)
+                if requester_id is None:
+                    cursor.close()
+                    conn.close()
+                    return {
+                        'statusCode': 401,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Unauthorized'})
+                    }
+                
+                # Начисления артиста — ему самому, директору и менеджеру; сводка по отчёту — только им
+                allowed = True
+                if params.get('artist_id'):
+                    artist_id = resolve_report_artist(cursor, requester_id, params)
+                    allowed = artist_id is not None
+                if params.get('royalties'):
+                    allowed = allowed and is_report_manager(cursor, requester_id)
+                if not allowed:
+                    cursor.close()
+                    conn.close()
+                    return {
+                        'statusCode': 403,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Нет доступа к отчётам артиста'})
+                    }
+            
+            if params.get('artist_id'):
+                reports = artist_royalties(cursor, artist_id)
                 cursor.close()
                 conn.close()
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'reports': reports})
+                }
             
+            if uploaded_report_id and params.get('royalties'):
+                group_by = params['royalties']
+                if group_by not in ROYALTY_GROUPS:
+                    cursor.close()
+                    conn.close()
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': f"royalties: одно из {', '.join(ROYALTY_GROUPS)}"})
+                    }
+                
+                royalties = royalty_totals(cursor, int(uploaded_report_id), group_by)
+                cursor.close()
+                conn.close()
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'files': files})
+                    'body': json.dumps({'group_by': group_by, 'royalties': royalties})
+                }
+            
+            try:
+                page = list_report_files(cursor, params)
+            except ValueError as e:
+                cursor.close()
+                conn.close()
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': str(e)})
                 }
+            cursor.close()
+            conn.close()
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps(page)
+            }
             
         except Exception as e:
             return {
@@ -430,9 +622,21 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             cursor.execute("""
                 UPDATE t_p35759334_music_label_portal.artist_report_files
-                SET sent_to_artist_id = %s
+                SET sent_to_artist_id = %s, sent_at = CURRENT_TIMESTAMP, match_user_id = %s, match_score = 1, match_method = 'manual'
                 WHERE id = %s
-            """, (artist_id, file_id))
+            """, (artist_id, artist_id, file_id))
+            
+            # Ручная привязка запоминается как псевдоним: следующие отчёты с этим исполнителем привяжутся сами
+            cursor.execute("""
+                INSERT INTO t_p35759334_music_label_portal.performer_aliases (alias, user_id)
+                SELECT t_p35759334_music_label_portal.normalize_performer(artist_username), %s
+                FROM t_p35759334_music_label_portal.artist_report_files
+                WHERE id = %s AND artist_username <> %s
+                ON CONFLICT (alias) DO UPDATE SET
+                    user_id = EXCLUDED.user_id,
+                    links_count = CASE WHEN performer_aliases.user_id = EXCLUDED.user_id THEN performer_aliases.links_count + 1 ELSE 1 END,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (artist_id, file_id, NO_PERFORMER))
             
             conn.commit()
             cursor.close()
@@ -495,4 +699,2092 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'statusCode': 405,
         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
         'body': json.dumps({'error': 'Method not allowed'})
-    }
\ No newline at end of file
+    }
+
+class MultipartPart:
+    '''Часть multipart/form-data: заголовки и данные — memoryview поверх тела запроса'''
+    
+    def __init__(self, headers: Dict[str, str], data: memoryview):
+        self.headers = headers
+        self.data = data
+        params = dict(MULTIPART_PARAM_RE.findall(headers.get('content-disposition', '')))
+        self.name = unquote_header_value(params.get('name', ''))
+        self.filename = unquote_header_value(params['filename']) if 'filename' in params else None
+        self.content_type = headers.get('content-type', 'application/octet-stream')
+    
+    def text(self) -> str:
+        return str(self.data, 'utf-8')
+    
+    def chunks(self, size: int) -> Iterator[memoryview]:
+        for offset in range(0, len(self.data), size):
+            yield self.data[offset:offset + size]
+    
+    def open(self) -> BinaryIO:
+        '''Файловый объект с seek (нужен openpyxl и хешу) без копии данных'''
+        return io.BufferedReader(MemoryviewReader(self.data))
+
+class MemoryviewReader(io.RawIOBase):
+    def __init__(self, data: memoryview):
+        self._data = data
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._data) - self._pos)
+        buffer[:size] = self._data[self._pos:self._pos + size]
+        self._pos += size
+        return size
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._data)}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+    
+    def tell(self) -> int:
+        return self._pos
+
+def iter_multipart(body: bytes, content_type: str) -> Iterator[MultipartPart]:
+    '''
+    Разбор multipart/form-data одним проходом по телу: границы ищутся bytes.find,
+    данные частей отдаются срезами memoryview без копирования
+    '''
+    match = MULTIPART_BOUNDARY_RE.search(content_type)
+    if not match:
+        raise ValueError('В Content-Type нет boundary')
+    delimiter = b'--' + unquote_header_value(match.group(1)).encode('latin-1')
+    view = memoryview(body)
+    
+    position = body.find(delimiter)
+    if position < 0:
+        return
+    position += len(delimiter)
+    
+    while not body.startswith(b'--', position):
+        if body.startswith(b'\r\n', position):
+            position += 2
+        headers_end = body.find(b'\r\n\r\n', position)
+        if headers_end < 0:
+            raise ValueError('Повреждённая часть multipart: нет конца заголовков')
+        
+        headers = {}
+        for line in body[position:headers_end].decode('utf-8', errors='replace').split('\r\n'):
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        data_start = headers_end + 4
+        data_end = body.find(b'\r\n' + delimiter, data_start)
+        if data_end < 0:
+            raise ValueError('Повреждённая часть multipart: нет завершающей границы')
+        
+        yield MultipartPart(headers, view[data_start:data_end])
+        position = data_end + 2 + len(delimiter)
+
+def read_multipart_form(body: bytes, content_type: str) -> Tuple[Dict[str, str], Dict[str, List[MultipartPart]]]:
+    '''Текстовые поля формы и файлы по имени поля (полей file может быть несколько)'''
+    fields: Dict[str, str] = {}
+    files: Dict[str, List[MultipartPart]] = defaultdict(list)
+    for part in iter_multipart(body, content_type):
+        if part.filename is not None:
+            files[part.name].append(part)
+        else:
+            fields[part.name] = part.text()
+    return fields, files
+
+def unquote_header_value(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
+
+def iter_xlsx_rows(stream: BinaryIO, sheet: Optional[str] = None) -> Iterator[tuple]:
+    '''Все строки листа (по умолчанию активного) как есть (read_only: строки не материализуются целиком)'''
+    workbook = openpyxl.load_workbook(stream, read_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        yield from worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[list]:
+    '''Все строки CSV как есть; байты декодируются по мере чтения'''
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text_stream)
+    finally:
+        text_stream.detach()
+
+def iter_source_sheets(source: Dict[str, Any]) -> Iterator[Tuple[Optional[str], Iterator]]:
+    '''Листы источника (у CSV — один, None) с их строками; книга xlsx открывается один раз на все листы'''
+    if source['file_type'] != 'xlsx':
+        yield None, iter_csv_rows(io.BytesIO(source['content']))
+        return
+    workbook = openpyxl.load_workbook(io.BytesIO(source['content']), read_only=True)
+    try:
+        for sheet in source.get('sheets') or workbook.sheetnames:
+            yield sheet, workbook[sheet].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def sniff_report(raw_rows: Iterator) -> Tuple[Optional[Dict[str, Any]], List[str], Iterator[tuple]]:
+    '''
+    По первым SNIFF_ROWS строкам выбирает формат из REPORT_FORMATS и строку заголовков.
+    Если формат не узнан, заголовками считается самая широкая текстовая строка (при равенстве — первая).
+    Возвращает формат, заголовки и итератор непустых строк данных, выровненных по заголовкам.
+    '''
+    head = list(itertools.islice(raw_rows, SNIFF_ROWS))
+    report_format, header_index, headers = sniff_report_head(head)
+    return report_format, headers, report_data_rows(itertools.chain(head[header_index + 1:], raw_rows), len(headers))
+
+def sniff_report_head(head: List[tuple]) -> Tuple[Optional[Dict[str, Any]], int, List[str]]:
+    '''Формат, номер строки заголовков (с 0) и заголовки по первым строкам файла'''
+    report_format, header_index = match_report_format(head)
+    
+    if report_format is None:
+        text_widths = [
+            sum(1 for cell in row if isinstance(cell, str) and cell.strip() and parse_number(cell) is None)
+            for row in head
+        ]
+        header_index = text_widths.index(max(text_widths)) if head else 0
+    
+    header_row = head[header_index] if head else ()
+    headers = [str(cell).strip() if cell is not None and str(cell).strip() else f'col_{i}' for i, cell in enumerate(header_row)]
+    
+    print(f"DEBUG: Format {report_format['name'] if report_format else 'unknown'}, headers at row {header_index + 1}: {headers[:5]}... total {len(headers)} columns")
+    return report_format, header_index, headers
+
+def report_data_rows(raw_rows: Iterator, width: int) -> Iterator[tuple]:
+    '''Непустые строки данных, выровненные по числу заголовков'''
+    return (fit_row(row, width) for row in raw_rows if any(cell is not None and cell != '' for cell in row))
+
+def match_report_format(head: List[tuple]) -> Tuple[Optional[Dict[str, Any]], int]:
+    normalized = [{str(cell).strip().lower() for cell in row if cell is not None} for row in head]
+    
+    for report_format in REPORT_FORMATS:
+        if report_format['header_row']:
+            candidates = [report_format['header_row'] - 1]
+        else:
+            candidates = range(len(normalized))
+        for index in candidates:
+            if index < len(normalized) and normalized[index].issuperset(report_format['signature']):
+                return report_format, index
+    
+    return None, 0
+
+def fit_row(values, width: int) -> tuple:
+    '''Выравнивает строку по числу заголовков: недостающие ячейки — None, лишние отбрасываются'''
+    if len(values) >= width:
+        return tuple(values[:width])
+    return tuple(values) + (None,) * (width - len(values))
+
+def detect_performer_columns(cursor, headers: List[str], sample_rows: List[tuple]) -> List[int]:
+    '''
+    Индексы колонок исполнителя: по известному заголовку, иначе из кэша профилей по сигнатуре заголовков,
+    иначе векторным профилем первых строк (непустой результат кэшируется для следующих загрузок того же формата)
+    '''
+    if not sample_rows:
+        return []
+    
+    performer_indices = [headers.index(name) for name in PERFORMER_COLUMN_NAMES if name in headers]
+    if performer_indices:
+        return performer_indices
+    
+    signature = header_signature(headers)
+    cursor.execute("""
+        UPDATE t_p35759334_music_label_portal.report_header_profiles
+        SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP
+        WHERE header_signature = %s
+        RETURNING performer_columns
+    """, (signature,))
+    cached = cursor.fetchone()
+    if cached and cached[0]:
+        print(f"DEBUG: Performer columns from profile cache: {cached[0]}")
+        return list(cached[0])
+    
+    print(f"DEBUG: Column name not found, analyzing data patterns...")
+    performer_indices = profile_performer_columns(headers, sample_rows)
+    
+    # Пустой профиль или профиль по паре строк не кэшируем: иначе одна неудачная выборка
+    # навсегда отключит поиск исполнителя для этого формата
+    if not performer_indices or len(sample_rows) < MIN_PROFILE_SAMPLE_ROWS:
+        return performer_indices
+    
+    cursor.execute("""
+        INSERT INTO t_p35759334_music_label_portal.report_header_profiles (header_signature, headers, performer_columns)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (header_signature) DO UPDATE
+        SET performer_columns = EXCLUDED.performer_columns, last_used_at = CURRENT_TIMESTAMP
+        WHERE cardinality(report_header_profiles.performer_columns) = 0
+    """, (signature, headers, performer_indices))
+    
+    return performer_indices
+
+def header_signature(headers: List[str]) -> str:
+    return hashlib.sha1('\x1f'.join(h.strip().lower() for h in headers).encode('utf-8')).hexdigest()
+
+def profile_performer_columns(headers: List[str], sample_rows: List[tuple]) -> List[int]:
+    '''
+    Оценивает все колонки выборки сразу на матрице строк NumPy: доля чисел, доля уникальных значений
+    и средняя длина. Кандидат — текстовая колонка с разнообразными значениями разумной длины.
+    '''
+    matrix = np.array([['' if cell is None else str(cell) for cell in row] for row in sample_rows], dtype=str)
+    if matrix.ndim != 2 or matrix.shape[1] == 0:
+        return []
+    values = np.char.strip(matrix)
+    lowered = np.char.lower(values)
+    non_empty = (values != '') & (lowered != 'none') & (lowered != 'null')
+    counts = non_empty.sum(axis=0)
+    safe_counts = np.maximum(counts, 1)
+    
+    # Число: цифры с не более чем одной точкой и знаком (запятые — разделители разрядов); формула начинается с "="
+    digits = np.char.replace(np.char.lstrip(np.char.replace(values, ',', ''), '+-'), '.', '', count=1)
+    numeric = (np.char.isdigit(digits) | np.char.startswith(values, '=')) & non_empty
+    numeric_ratio = numeric.sum(axis=0) / safe_counts
+    
+    avg_length = np.where(non_empty, np.char.str_len(values), 0).sum(axis=0) / safe_counts
+    
+    # Уникальные значения всех колонок за одну сортировку: считаются границы между разными значениями
+    ordered = np.sort(np.where(non_empty, values, ''), axis=0)
+    boundaries = np.ones(ordered.shape, dtype=bool)
+    boundaries[1:] = ordered[1:] != ordered[:-1]
+    unique_counts = (boundaries & (ordered != '')).sum(axis=0)
+    unique_ratio = unique_counts / safe_counts
+    
+    candidates = (counts >= 50) & (numeric_ratio <= 0.7) & (unique_ratio > 0.3) & (avg_length > 5) & (avg_length < 150)
+    
+    for col_index in np.flatnonzero(candidates):
+        print(f"DEBUG: Candidate {headers[col_index]}: {unique_counts[col_index]} unique / {counts[col_index]} total = {unique_ratio[col_index]:.2%}, avg_len={avg_length[col_index]:.0f}, numeric={numeric_ratio[col_index]:.0%}")
+    
+    ranked = sorted(np.flatnonzero(candidates), key=lambda i: unique_ratio[i], reverse=True)
+    return [int(i) for i in ranked[:2]]
+
+def column_indices(headers: List[str], names: List[str]) -> List[int]:
+    positions = {name.strip().lower(): i for i, name in reversed(list(enumerate(headers)))}
+    return [positions[name] for name in names if name in positions]
+
+def map_typed_columns(headers: List[str], report_format: Optional[Dict[str, Any]]) -> Dict[str, Optional[int]]:
+    '''Индекс колонки файла для каждого типизированного поля report_rows (None, если колонки нет)'''
+    format_columns = report_format['columns'] if report_format else {}
+    mapping = {}
+    for field, aliases in REPORT_COLUMN_ALIASES.items():
+        names = [format_columns[field]] + aliases if field in format_columns else aliases
+        indices = column_indices(headers, names)
+        mapping[field] = indices[0] if indices else None
+    return mapping
+
+def compile_performer_extractor(performer_indices: List[int]) -> Callable[[tuple], str]:
+    '''Функция строка -> исполнитель; значения нескольких колонок объединяются через " & "'''
+    if not performer_indices:
+        return lambda row: NO_PERFORMER
+    
+    getter = itemgetter(*performer_indices)
+    single = len(performer_indices) == 1
+    
+    def extract(row: tuple) -> str:
+        values = (getter(row),) if single else getter(row)
+        performers = [str(v).strip() for v in values if v is not None]
+        performer = ' & '.join(v for v in performers if v and v.lower() not in ('none', 'null'))
+        return performer or NO_PERFORMER
+    
+    return extract
+
+def compile_field_extractor(headers: List[str], report_format: Optional[Dict[str, Any]]) -> Callable[[tuple], tuple]:
+    '''
+    Функция строка -> (track, album, platform, territory, period, quantity, revenue) для COPY.
+    Индексы колонок и разбор чисел выбираются один раз на файл, а не на каждой строке.
+    '''
+    columns = map_typed_columns(headers, report_format)
+    parse = NUMBER_PARSERS.get(report_format['decimal'] if report_format else None, parse_number)
+    
+    def text(index: Optional[int]) -> Callable[[tuple], Any]:
+        if index is None:
+            return lambda row: None
+        return lambda row: str(row[index]).strip() if row[index] is not None else None
+    
+    def number(index: Optional[int]) -> Callable[[tuple], Any]:
+        if index is None:
+            return lambda row: None
+        return lambda row: parse(row[index])
+    
+    track, album, platform, territory, period = (text(columns[field]) for field in TEXT_FIELDS)
+    quantity, revenue = number(columns['quantity']), number(columns['revenue'])
+    
+    def extract(row: tuple) -> tuple:
+        plays = quantity(row)
+        return (
+            track(row), album(row), platform(row), territory(row), period(row),
+            int(round(plays)) if plays is not None else None,
+            revenue(row)
+        )
+    
+    return extract
+
+def finite_number(value: Any) -> Any:
+    '''float из числа или строки; nan, inf и переполнение вроде "1e400" считаем пустой ячейкой'''
+    try:
+        number = float(value)
+    except (ValueError, OverflowError):
+        return None
+    return number if math.isfinite(number) else None
+
+def parse_number(value: Any) -> Any:
+    '''Число из ячейки: поддерживает "1 234,56" и "1,234.56"; формулы, текст и nan/inf дают None'''
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return finite_number(value)
+    
+    text = str(value).strip().replace('\xa0', '').replace(' ', '')
+    if ',' in text and '.' in text:
+        text = text.replace(',', '')
+    else:
+        text = text.replace(',', '.')
+    return finite_number(text)
+
+def parse_number_decimal_comma(value: Any) -> Any:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return finite_number(value)
+    return finite_number(str(value).replace('\xa0', '').replace(' ', '').replace('.', '').replace(',', '.'))
+
+def parse_number_decimal_dot(value: Any) -> Any:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return finite_number(value)
+    return finite_number(str(value).replace('\xa0', '').replace(' ', '').replace(',', ''))
+
+NUMBER_PARSERS = {
+    ',': parse_number_decimal_comma,
+    '.': parse_number_decimal_dot,
+}
+
+def pg_array_literal(values: tuple) -> str:
+    '''Литерал TEXT[] для COPY: NULL для пустых ячеек, остальное в кавычках'''
+    items = []
+    for value in values:
+        if value is None:
+            items.append('NULL')
+        else:
+            items.append('"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"')
+    return '{' + ','.join(items) + '}'
+
+def resolve_performer_columns(cursor, headers: List[str], report_format: Optional[Dict[str, Any]], sample_rows: List[tuple]) -> List[int]:
+    if report_format:
+        performer_indices = column_indices(headers, report_format['performer'])
+    else:
+        performer_indices = detect_performer_columns(cursor, headers, sample_rows)
+    
+    if performer_indices:
+        print(f"DEBUG: Using columns for performers: {[headers[i] for i in performer_indices]}")
+    else:
+        print(f"DEBUG: Performer columns not found! All data will go to 'Без исполнителя'")
+    
+    return performer_indices
+
+def load_report_rows(cursor, uploaded_report_id: int, headers: List[str], report_format: Optional[Dict[str, Any]],
+                     performer_indices: List[int], rows: Iterator[tuple], start_row: int = 0,
+                     checkpoint: Optional[Callable[[int], None]] = None, deadline: Optional[float] = None) -> Tuple[int, bool]:
+    '''
+    Раскладывает строки по файлам исполнителей и грузит их в report_rows через COPY пачками по COPY_BATCH_ROWS.
+    Файл исполнителя создаётся при первой его строке; в памяти только текущая пачка и её статистика.
+    После каждой пачки вызывается checkpoint(обработано строк) — фоновая задача фиксирует там транзакцию.
+    Первые start_row строк пропускаются (продолжение с последнего checkpoint), по deadline загрузка
+    останавливается на границе пачки. Возвращает (обработано строк, файл дочитан до конца).
+    '''
+    performer_of = compile_performer_extractor(performer_indices)
+    typed_fields = compile_field_extractor(headers, report_format)
+    
+    cursor.execute("""
+        SELECT artist_username, id FROM t_p35759334_music_label_portal.artist_report_files
+        WHERE uploaded_report_id = %s
+    """, (uploaded_report_id,))
+    file_ids: Dict[str, int] = dict(cursor.fetchall())
+    
+    # Приращения статистики файлов за текущую пачку: file_id -> [строк, количество, доход, отпечаток]
+    batch_stats: Dict[int, List] = {}
+    copy_buffer = io.StringIO()
+    copy_writer = csv.writer(copy_buffer)
+    row_num = start_row
+    
+    for row in itertools.islice(rows, start_row, None):
+        performer = performer_of(row)
+        file_id = file_ids.get(performer)
+        if file_id is None:
+            cursor.execute("""
+                INSERT INTO t_p35759334_music_label_portal.artist_report_files 
+                (uploaded_report_id, artist_username, artist_full_name, deduction_percent)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (uploaded_report_id, performer, performer, 0))
+            file_id = file_ids[performer] = cursor.fetchone()[0]
+        
+        row_num += 1
+        fields = typed_fields(row)
+        stats = batch_stats.get(file_id)
+        if stats is None:
+            stats = batch_stats[file_id] = [0, 0, 0.0, 0]
+        raw_values = pg_array_literal(row)
+        stats[0] += 1
+        stats[1] += fields[5] or 0
+        stats[2] += fields[6] or 0
+        stats[3] = (stats[3] + row_fingerprint(raw_values)) % FINGERPRINT_MODULUS
+        copy_writer.writerow((file_id, row_num) + fields + (raw_values,))
+        
+        if row_num % COPY_BATCH_ROWS == 0:
+            flush_report_rows(cursor, copy_buffer, batch_stats)
+            if checkpoint:
+                checkpoint(row_num)
+            if deadline and time.monotonic() > deadline:
+                print(f"DEBUG: Time budget exhausted at row {row_num}")
+                return row_num, False
+    
+    flush_report_rows(cursor, copy_buffer, batch_stats)
+    print(f"DEBUG: Total rows loaded: {row_num}, performers: {len(file_ids)}")
+    return row_num, True
+
+def flush_report_rows(cursor, buffer: io.StringIO, batch_stats: Dict[int, List]) -> None:
+    '''Отправляет пачку строк через COPY и прибавляет её статистику к файлам исполнителей'''
+    if buffer.tell() == 0:
+        return
+    buffer.seek(0)
+    cursor.copy_expert(COPY_REPORT_ROWS_SQL, buffer)
+    buffer.seek(0)
+    buffer.truncate()
+    
+    psycopg2.extras.execute_values(cursor, """
+        UPDATE t_p35759334_music_label_portal.artist_report_files AS arf
+        SET rows_count = arf.rows_count + v.rows_count,
+            total_quantity = arf.total_quantity + v.total_quantity,
+            total_revenue = arf.total_revenue + v.total_revenue,
+            rows_fingerprint = mod(arf.rows_fingerprint + v.rows_fingerprint, %s)
+        FROM (VALUES %%s) AS v(id, rows_count, total_quantity, total_revenue, rows_fingerprint)
+        WHERE arf.id = v.id
+    """ % FINGERPRINT_MODULUS, [
+        (file_id, stats[0], stats[1], round(stats[2], 6), stats[3]) for file_id, stats in batch_stats.items()
+    ], template='(%s, %s, %s, %s, %s::NUMERIC)')
+    batch_stats.clear()
+
+def ingest_report_batch(sources: List[Dict[str, Any]], uploaded_by: Any, period: Optional[str]) -> Dict[str, Any]:
+    '''
+    Пакетная загрузка: несколько файлов (xlsx — заданные листы или все) становятся одним отчётом.
+    Заголовки и колонки исполнителя определяются здесь (нужен кэш профилей в базе), сами строки разбираются
+    в процессах по числу ядер (parse_report_source), затем исполнители объединяются и строки уходят одним COPY.
+    Заголовки отчёта — объединение заголовков всех источников, raw_values выровнены по нему.
+    '''
+    if not uploaded_by or not sources or not all(source['content'] for source in sources):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Требуются файлы и uploaded_by'})
+        }
+    
+    if any(source['file_type'] == 'xlsx' for source in sources) and not EXCEL_AVAILABLE:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Поддержка Excel не установлена'})
+        }
+    
+    # Отпечаток пакета: содержимое файлов и выбранные листы по порядку
+    batch_hash = hashlib.sha256()
+    for source in sources:
+        batch_hash.update(sha256_of_stream(io.BytesIO(source['content'])).encode('ascii'))
+        batch_hash.update(json.dumps(source.get('sheets')).encode('utf-8'))
+    content_sha256 = batch_hash.hexdigest()
+    
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
+    cursor = conn.cursor()
+    
+    # Соединение закрывается и при ошибке разбора или загрузки: незакоммиченный отчёт откатывается
+    try:
+        existing_report_id = find_report_by_hash(cursor, content_sha256)
+        if existing_report_id:
+            return duplicate_upload_response(cursor, existing_report_id)
+        
+        # Формат и заголовки определяются здесь один раз и передаются в задачу: процесс разбора
+        # не открывает источник повторно ради них, а сразу пропускает строки до данных
+        tasks = []
+        union_keys: List[tuple] = []
+        known_keys = set()
+        formats = set()
+        for source in sources:
+            for sheet, raw_rows in iter_source_sheets(source):
+                head = list(itertools.islice(raw_rows, SNIFF_ROWS))
+                report_format, header_index, headers = sniff_report_head(head)
+                sample_rows = list(itertools.islice(report_data_rows(head[header_index + 1:], len(headers)), DETECTION_SAMPLE_ROWS))
+                task = {
+                    'file_type': source['file_type'], 'content': source['content'], 'sheet': sheet,
+                    'format': report_format, 'header_index': header_index, 'headers': headers,
+                    'performer_indices': resolve_performer_columns(cursor, headers, report_format, sample_rows),
+                    'header_keys': header_keys(headers)
+                }
+                tasks.append(task)
+                formats.add(report_format['name'] if report_format else None)
+                for key in task['header_keys']:
+                    if key not in known_keys:
+                        known_keys.add(key)
+                        union_keys.append(key)
+        
+        # Позиция колонки источника для каждой колонки объединённых заголовков (None — у источника её нет)
+        for task in tasks:
+            source_index = {key: i for i, key in enumerate(task.pop('header_keys'))}
+            task['positions'] = [source_index.get(key) for key in union_keys]
+        
+        union_headers = [name for name, _ in union_keys]
+        report_format = next((f for f in REPORT_FORMATS if len(formats) == 1 and f['name'] in formats), None)
+        file_name = sources[0]['file_name'] if len(sources) == 1 else f"{sources[0]['file_name']} (+{len(sources) - 1})"
+        
+        uploaded_report_id = create_uploaded_report(cursor, file_name[:255], uploaded_by, union_headers, report_format, content_sha256)
+        
+        started = time.monotonic()
+        results = parse_report_sources(tasks)
+        print(f"DEBUG: Parsed {len(tasks)} sources in {time.monotonic() - started:.2f}s")
+        
+        try:
+            total_rows = load_parsed_sources(cursor, uploaded_report_id, results)
+        finally:
+            remove_parsed_sources(results)
+        diff = finalize_uploaded_report(cursor, uploaded_report_id, total_rows, period)
+        created_files = report_files_summary(cursor, uploaded_report_id)
+        
+        conn.commit()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'success': True,
+                'duplicate': False,
+                'uploaded_report_id': uploaded_report_id,
+                'total_rows': total_rows,
+                'sources': len(tasks),
+                'format': report_format['name'] if report_format else None,
+                'diff': diff,
+                'artist_files': created_files
+            })
+        }
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def open_report_source(task: Dict[str, Any]) -> Iterator:
+    stream = io.BytesIO(task['content'])
+    return iter_xlsx_rows(stream, task['sheet']) if task['file_type'] == 'xlsx' else iter_csv_rows(stream)
+
+def header_keys(headers: List[str]) -> List[tuple]:
+    '''Ключи колонок для объединения заголовков: повторяющееся имя в одном источнике — отдельные колонки'''
+    seen: Dict[str, int] = defaultdict(int)
+    keys = []
+    for name in headers:
+        keys.append((name, seen[name]))
+        seen[name] += 1
+    return keys
+
+def parse_report_sources(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    '''
+    Разбор источников в процессах; без поддержки процессов в среде — последовательно.
+    Если разбор одного источника упал, временные файлы уже разобранных удаляются.
+    '''
+    workers = min(len(tasks), BATCH_WORKERS)
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(parse_report_source, task) for task in tasks]
+                # Ждём все процессы: файл, который ещё пишется, иначе пропустили бы при очистке
+                wait(futures)
+                results = []
+                error: Optional[BaseException] = None
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except BaseException as e:
+                        error = error or e
+                if error:
+                    remove_parsed_sources(results)
+                    raise error
+                return results
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(f"DEBUG: Process pool unavailable ({e}), parsing sequentially")
+    
+    results = []
+    try:
+        for task in tasks:
+            results.append(parse_report_source(task))
+    except BaseException:
+        remove_parsed_sources(results)
+        raise
+    return results
+
+def remove_parsed_sources(results: List[Dict[str, Any]]) -> None:
+    for result in results:
+        try:
+            os.unlink(result['path'])
+        except FileNotFoundError:
+            pass
+
+def parse_report_source(task: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Рабочий процесс: строки источника в порядке файла пишутся во временный CSV как (исполнитель,
+    поля report_rows..., raw_values), raw_values уже выровнены по объединённым заголовкам.
+    Родителю возвращаются только путь к файлу и статистика по исполнителям.
+    '''
+    headers = task['headers']
+    raw_rows = itertools.islice(open_report_source(task), task['header_index'] + 1, None)
+    rows = report_data_rows(raw_rows, len(headers))
+    performer_of = compile_performer_extractor(task['performer_indices'])
+    typed_fields = compile_field_extractor(headers, task['format'])
+    positions = task['positions']
+    
+    stats: Dict[str, List] = {}
+    fd, path = tempfile.mkstemp(prefix='report-rows-', suffix='.csv')
+    try:
+        with open(fd, 'w', encoding='utf-8', newline='') as rows_file:
+            writer = csv.writer(rows_file)
+            for row in rows:
+                performer = performer_of(row)
+                fields = typed_fields(row)
+                raw_values = pg_array_literal(tuple(row[i] if i is not None else None for i in positions))
+                performer_stats = stats.get(performer)
+                if performer_stats is None:
+                    performer_stats = stats[performer] = [0, 0, 0.0, 0]
+                performer_stats[0] += 1
+                performer_stats[1] += fields[5] or 0
+                performer_stats[2] += fields[6] or 0
+                performer_stats[3] = (performer_stats[3] + row_fingerprint(raw_values)) % FINGERPRINT_MODULUS
+                writer.writerow((performer,) + fields + (raw_values,))
+    except BaseException:
+        os.unlink(path)
+        raise
+    
+    return {'path': path, 'stats': stats}
+
+def load_parsed_sources(cursor, uploaded_report_id: int, results: List[Dict[str, Any]]) -> int:
+    '''
+    Объединяет исполнителей всех источников, создаёт их файлы одним INSERT и грузит все строки одним COPY:
+    файлы процессов читаются потоком, к строке добавляются id файла исполнителя и сквозной номер
+    '''
+    merged: Dict[str, List] = {}
+    for result in results:
+        for performer, stats in result['stats'].items():
+            total = merged.setdefault(performer, [0, 0, 0.0, 0])
+            total[0] += stats[0]
+            total[1] += stats[1]
+            total[2] += stats[2]
+            total[3] = (total[3] + stats[3]) % FINGERPRINT_MODULUS
+    
+    if not merged:
+        return 0
+    
+    inserted = psycopg2.extras.execute_values(cursor, """
+        INSERT INTO t_p35759334_music_label_portal.artist_report_files
+        (uploaded_report_id, artist_username, artist_full_name, deduction_percent)
+        VALUES %s
+        RETURNING artist_username, id
+    """, [(uploaded_report_id, performer, performer, 0) for performer in merged], fetch=True)
+    file_ids: Dict[str, int] = dict(inserted)
+    
+    row_num = 0
+    with tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES, mode='w+', newline='') as buffer:
+        writer = csv.writer(buffer)
+        for result in results:
+            with open(result['path'], encoding='utf-8', newline='') as rows_file:
+                for row in csv.reader(rows_file):
+                    row_num += 1
+                    writer.writerow([file_ids[row[0]], row_num] + row[1:])
+        flush_report_rows(cursor, buffer, {file_ids[performer]: stats for performer, stats in merged.items()})
+    
+    print(f"DEBUG: Batch loaded {row_num} rows, performers: {len(file_ids)}")
+    return row_num
+
+def row_fingerprint(raw_values: str) -> int:
+    return int.from_bytes(hashlib.blake2b(raw_values.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def sha256_of_stream(stream: BinaryIO) -> str:
+    '''SHA-256 файла чтением по HASH_CHUNK_BYTES; поток возвращается в начало'''
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def find_report_by_hash(cursor, content_sha256: str) -> Optional[int]:
+    '''Готовый отчёт с тем же содержимым; недогруженный (processed = FALSE) дубликатом не считается'''
+    cursor.execute(
+        "SELECT id FROM t_p35759334_music_label_portal.uploaded_reports WHERE content_sha256 = %s AND processed = TRUE",
+        (content_sha256,)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def create_uploaded_report(cursor, file_name: str, uploaded_by: Any, headers: List[str],
+                           report_format: Optional[Dict[str, Any]], content_sha256: str) -> int:
+    '''
+    Создаёт отчёт. Уникальность content_sha256 проверяется только у готовых отчётов (V0064): пока отчёт
+    грузится, тот же файл можно загрузить снова, а упавшая загрузка не блокирует повтор
+    '''
+    cursor.execute("""
+        INSERT INTO t_p35759334_music_label_portal.uploaded_reports
+        (file_name, uploaded_by, total_rows, processed, headers, report_format, content_sha256)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """, (file_name, uploaded_by, 0, False, headers, report_format['name'] if report_format else None, content_sha256))
+    return cursor.fetchone()[0]
+
+def duplicate_upload_response(cursor, existing_report_id: int) -> Dict[str, Any]:
+    created_files = report_files_summary(cursor, existing_report_id)
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'success': True,
+            'duplicate': True,
+            'uploaded_report_id': existing_report_id,
+            'total_rows': sum(f['rows_count'] for f in created_files),
+            'artist_files': created_files
+        })
+    }
+
+def finalize_uploaded_report(cursor, uploaded_report_id: int, total_rows: int, period: Optional[str]) -> Optional[Dict[str, Any]]:
+    '''
+    Завершает загрузку: период отчёта (явный или по колонке period строк, в месяцах YYYY-MM) и сравнение
+    с предыдущей загрузкой того же периода. Файлы исполнителей с тем же набором строк (rows_count и отпечаток совпали)
+    не хранят копию: их строки удаляются, а rows_file_id указывает на строки предыдущей загрузки.
+    '''
+    # Период сравнивается по месяцам: лексический MIN/MAX по тексту ("12.2023" > "01.2024") даёт
+    # чужой период и подмену строк. Если хоть одно значение не разобрано, сравнение пропускается
+    if period:
+        months = parse_period_months(period)
+        period_from, period_to = (min(months), max(months)) if months else (period, period)
+        comparable = bool(months)
+    else:
+        cursor.execute("""
+            SELECT DISTINCT rr.period
+            FROM t_p35759334_music_label_portal.report_rows rr
+            JOIN t_p35759334_music_label_portal.artist_report_files arf ON arf.id = rr.report_file_id
+            WHERE arf.uploaded_report_id = %s AND NULLIF(TRIM(rr.period), '') IS NOT NULL
+        """, (uploaded_report_id,))
+        months = []
+        comparable = True
+        for (value,) in cursor.fetchall():
+            value_months = parse_period_months(value)
+            if not value_months:
+                print(f"DEBUG: Unparsed report period {value!r}, skipping upload diff")
+                comparable = False
+                break
+            months.extend(value_months)
+        comparable = comparable and bool(months)
+        period_from, period_to = (min(months), max(months)) if comparable else (None, None)
+    
+    # Тот же файл, загруженный параллельно, мог стать готовым раньше: хэш остаётся за ним
+    cursor.execute("""
+        UPDATE t_p35759334_music_label_portal.uploaded_reports ur
+        SET total_rows = %s, processed = TRUE, period_from = %s, period_to = %s,
+            content_sha256 = CASE WHEN EXISTS (
+                SELECT 1 FROM t_p35759334_music_label_portal.uploaded_reports done
+                WHERE done.content_sha256 = ur.content_sha256 AND done.processed = TRUE AND done.id <> ur.id
+            ) THEN NULL ELSE ur.content_sha256 END
+        WHERE ur.id = %s
+    """, (total_rows, period_from, period_to, uploaded_report_id))
+    
+    diff = diff_with_previous_upload(cursor, uploaded_report_id, period_from, period_to) if comparable else None
+    
+    match_performers(cursor, uploaded_report_id)
+    
+    # Начисления считаются после сравнения и привязки: неизменившиеся файлы уже ссылаются
+    # на строки предыдущей загрузки, а артисты известны
+    cursor.execute("""
+        SELECT t_p35759334_music_label_portal.refresh_report_royalties(id)
+        FROM t_p35759334_music_label_portal.artist_report_files
+        WHERE uploaded_report_id = %s
+    """, (uploaded_report_id,))
+    
+    return diff
+
+def parse_period_months(value: Any) -> List[str]:
+    '''Месяцы YYYY-MM, упомянутые в тексте периода; пустой список, если ни одной даты не разобрано'''
+    months = []
+    for match in PERIOD_DATE_RE.finditer(str(value)):
+        if match.group('iso_year'):
+            year, month = int(match.group('iso_year')), int(match.group('iso_month'))
+        elif match.group('year'):
+            year, month = int(match.group('year')), int(match.group('month'))
+        else:
+            month = PERIOD_MONTH_NAMES.get(match.group('month_name')[:3].lower())
+            if month is None:
+                continue
+            year = int(match.group('named_year'))
+        if not 1 <= month <= 12:
+            return []
+        months.append(f"{year:04d}-{month:02d}")
+    return months
+
+def diff_with_previous_upload(cursor, uploaded_report_id: int, period_from: str, period_to: str) -> Optional[Dict[str, Any]]:
+    cursor.execute("""
+        SELECT id FROM t_p35759334_music_label_portal.uploaded_reports
+        WHERE period_from = %s AND period_to = %s AND processed = TRUE AND id <> %s
+        ORDER BY uploaded_at DESC, id DESC
+        LIMIT 1
+    """, (period_from, period_to, uploaded_report_id))
+    previous = cursor.fetchone()
+    if not previous:
+        return None
+    previous_report_id = previous[0]
+    
+    cursor.execute("""
+        SELECT COALESCE(n.artist_username, p.artist_username),
+               CASE
+                   WHEN p.id IS NULL THEN 'added'
+                   WHEN n.id IS NULL THEN 'removed'
+                   WHEN p.data IS NULL AND n.rows_count = p.rows_count AND n.rows_fingerprint = p.rows_fingerprint
+                        AND NOT EXISTS (
+                            -- Строки из архива (archive_key) не годятся: начисления пересчитываются из report_rows
+                            SELECT 1 FROM t_p35759334_music_label_portal.artist_report_files o
+                            WHERE o.id = COALESCE(p.rows_file_id, p.id) AND o.archive_key IS NOT NULL
+                        ) THEN 'unchanged'
+                   ELSE 'changed'
+               END,
+               n.id, COALESCE(p.rows_file_id, p.id),
+               COALESCE(n.rows_count, 0) - COALESCE(p.rows_count, 0),
+               COALESCE(n.total_revenue, 0) - COALESCE(p.total_revenue, 0)
+        FROM (SELECT * FROM t_p35759334_music_label_portal.artist_report_files WHERE uploaded_report_id = %s) n
+        FULL OUTER JOIN (SELECT * FROM t_p35759334_music_label_portal.artist_report_files WHERE uploaded_report_id = %s) p
+            ON p.artist_username = n.artist_username
+    """, (uploaded_report_id, previous_report_id))
+    
+    diff: Dict[str, Any] = {'previous_report_id': previous_report_id, 'added': [], 'removed': [], 'changed': [], 'unchanged': []}
+    reused = []
+    for performer, state, file_id, previous_rows_file_id, rows_delta, revenue_delta in cursor.fetchall():
+        if state == 'unchanged':
+            diff['unchanged'].append(performer)
+            reused.append((file_id, previous_rows_file_id))
+        elif state == 'changed':
+            diff['changed'].append({'artist_username': performer, 'rows_delta': rows_delta, 'revenue_delta': float(revenue_delta)})
+        else:
+            diff[state].append(performer)
+    
+    if reused:
+        cursor.execute(
+            "DELETE FROM t_p35759334_music_label_portal.report_rows WHERE report_file_id = ANY(%s)",
+            ([file_id for file_id, _ in reused],)
+        )
+        psycopg2.extras.execute_values(cursor, """
+            UPDATE t_p35759334_music_label_portal.artist_report_files AS arf
+            SET rows_file_id = v.rows_file_id
+            FROM (VALUES %s) AS v(id, rows_file_id)
+            WHERE arf.id = v.id
+        """, reused)
+    
+    cursor.execute(
+        "UPDATE t_p35759334_music_label_portal.uploaded_reports SET previous_report_id = %s, diff = %s WHERE id = %s",
+        (previous_report_id, json.dumps(diff, ensure_ascii=False), uploaded_report_id)
+    )
+    print(f"DEBUG: Diff vs report {previous_report_id}: {len(diff['unchanged'])} unchanged, {len(diff['changed'])} changed, {len(diff['added'])} added, {len(diff['removed'])} removed")
+    return diff
+
+def render_report_csv(conn, rows_file_id: int, is_legacy: bool, headers: Optional[List[str]],
+                      archive_key: Optional[str] = None) -> BinaryIO:
+    '''
+    Пишет CSV файла исполнителя во временный файл (в памяти до INLINE_DOWNLOAD_BYTES, дальше на диске).
+    Строки читаются серверным курсором по DOWNLOAD_FETCH_ROWS, поэтому память не зависит от размера файла.
+    Архивированный файл читается из архива в хранилище.
+    '''
+    csv_file = tempfile.SpooledTemporaryFile(max_size=INLINE_DOWNLOAD_BYTES)
+    text_stream = io.TextIOWrapper(csv_file, encoding='utf-8', newline='')
+    
+    if archive_key:
+        writer = csv.writer(text_stream)
+        header_written = False
+        for block in read_report_archive(get_report_storage(), archive_key):
+            if not header_written:
+                writer.writerow(block['fields'] if block['legacy'] else (headers or []))
+                header_written = True
+            writer.writerows(iter_archive_rows(block))
+        if not header_written:
+            writer.writerow(headers or [])
+        text_stream.flush()
+        text_stream.detach()
+        return csv_file
+    
+    rows_cursor = conn.cursor(name=f'report_csv_{rows_file_id}')
+    rows_cursor.itersize = DOWNLOAD_FETCH_ROWS
+    try:
+        if is_legacy:
+            # Файлы до V0051: строки в JSONB, разворачиваются на стороне базы
+            rows_cursor.execute("""
+                SELECT element
+                FROM t_p35759334_music_label_portal.artist_report_files arf,
+                     jsonb_array_elements(arf.data) AS element
+                WHERE arf.id = %s
+            """, (rows_file_id,))
+            writer = None
+            for (element,) in rows_cursor:
+                if writer is None:
+                    writer = csv.DictWriter(text_stream, fieldnames=list(element.keys()))
+                    writer.writeheader()
+                writer.writerow(element)
+        else:
+            writer = csv.writer(text_stream)
+            writer.writerow(headers or [])
+            rows_cursor.execute("""
+                SELECT raw_values FROM t_p35759334_music_label_portal.report_rows
+                WHERE report_file_id = %s
+                ORDER BY row_num
+            """, (rows_file_id,))
+            for (raw_values,) in rows_cursor:
+                writer.writerow(raw_values)
+    finally:
+        rows_cursor.close()
+    
+    text_stream.flush()
+    text_stream.detach()
+    return csv_file
+
+def archive_old_reports(dsn: str, deadline: float, months: int = ARCHIVE_AFTER_MONTHS) -> List[Dict[str, Any]]:
+    '''
+    Переносит строки файлов отчётов старше months месяцев в архивы хранилища: по файлу за транзакцию,
+    пока есть время до deadline. Файлы, которые ссылаются на чужие строки (rows_file_id), не архивируются —
+    их строки лежат у файла-владельца. Владелец, на чьи строки ссылается более свежий файл, тоже остаётся
+    в базе: иначе ?rows=1 этого файла опустеет.
+    '''
+    storage = get_report_storage()
+    conn = psycopg2.connect(dsn)
+    cursor = conn.cursor()
+    archived = []
+    
+    try:
+        while time.monotonic() < deadline:
+            cursor.execute("""
+                SELECT arf.id, arf.data IS NOT NULL
+                FROM t_p35759334_music_label_portal.artist_report_files arf
+                JOIN t_p35759334_music_label_portal.uploaded_reports ur ON ur.id = arf.uploaded_report_id
+                WHERE arf.archive_key IS NULL AND arf.rows_file_id IS NULL
+                  AND ur.uploaded_at < CURRENT_TIMESTAMP - make_interval(months => %s)
+                  AND NOT EXISTS (
+                      SELECT 1
+                      FROM t_p35759334_music_label_portal.artist_report_files ref
+                      JOIN t_p35759334_music_label_portal.uploaded_reports rur ON rur.id = ref.uploaded_report_id
+                      WHERE ref.rows_file_id = arf.id
+                        AND rur.uploaded_at >= CURRENT_TIMESTAMP - make_interval(months => %s)
+                  )
+                ORDER BY arf.id
+                LIMIT 1
+                FOR UPDATE OF arf SKIP LOCKED
+            """, (months, months))
+            row = cursor.fetchone()
+            if not row:
+                break
+            
+            file_id, is_legacy = row
+            archive_key = f"report-archive/{file_id}.json.xz"
+            with tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES) as payload:
+                rows_count = write_report_archive(conn, file_id, is_legacy, payload)
+                archive_bytes = payload.tell()
+                payload.seek(0)
+                storage.put_file(archive_key, payload, 'application/x-xz')
+            
+            cursor.execute(
+                "DELETE FROM t_p35759334_music_label_portal.report_rows WHERE report_file_id = %s",
+                (file_id,)
+            )
+            cursor.execute("""
+                UPDATE t_p35759334_music_label_portal.artist_report_files
+                SET archive_key = %s, archived_at = CURRENT_TIMESTAMP, archive_bytes = %s, data = NULL
+                WHERE id = %s
+            """, (archive_key, archive_bytes, file_id))
+            conn.commit()
+            
+            archived.append({'file_id': file_id, 'rows': rows_count, 'bytes': archive_bytes})
+    finally:
+        cursor.close()
+        conn.close()
+    
+    if archived:
+        print(f"DEBUG: Archived {len(archived)} report files, {sum(a['bytes'] for a in archived)} bytes")
+    return archived
+
+def write_report_archive(conn, file_id: int, is_legacy: bool, out: BinaryIO) -> int:
+    '''
+    Пишет в out сжатый архив строк файла и возвращает их число. Строки идут блоками по колонкам:
+    одинаковые ключи не повторяются в каждой строке, а однотипные значения одной колонки рядом — так они
+    лучше сжимаются. Числа дохода хранятся строками без потери точности.
+    '''
+    rows_cursor = conn.cursor(name=f'report_archive_{file_id}')
+    rows_cursor.itersize = DOWNLOAD_FETCH_ROWS
+    count = 0
+    try:
+        with lzma.open(out, 'wt', encoding='utf-8') as archive:
+            def write_line(block: Dict[str, Any]) -> None:
+                archive.write(json.dumps(block, ensure_ascii=False, separators=(',', ':')))
+                archive.write('\n')
+            
+            if is_legacy:
+                # Набор полей нужен заранее (заголовок CSV): ключи в порядке первого появления
+                with conn.cursor() as fields_cursor:
+                    fields_cursor.execute("""
+                        SELECT k.key
+                        FROM t_p35759334_music_label_portal.artist_report_files arf,
+                             jsonb_array_elements(arf.data) WITH ORDINALITY AS e(element, row_ord),
+                             jsonb_each(e.element) WITH ORDINALITY AS k(key, value, key_ord)
+                        WHERE arf.id = %s
+                        GROUP BY k.key
+                        ORDER BY MIN(e.row_ord), MIN(k.key_ord)
+                    """, (file_id,))
+                    fields = [key for (key,) in fields_cursor.fetchall()]
+                write_line({'version': ARCHIVE_FORMAT_VERSION, 'legacy': True, 'fields': fields})
+                
+                rows_cursor.execute("""
+                    SELECT element
+                    FROM t_p35759334_music_label_portal.artist_report_files arf,
+                         jsonb_array_elements(arf.data) AS element
+                    WHERE arf.id = %s
+                """, (file_id,))
+                while True:
+                    elements = [element for (element,) in rows_cursor.fetchmany(ARCHIVE_CHUNK_ROWS)]
+                    if not elements:
+                        break
+                    write_line({'rows': len(elements), 'columns': [[e.get(key) for e in elements] for key in fields]})
+                    count += len(elements)
+                return count
+            
+            write_line({'version': ARCHIVE_FORMAT_VERSION, 'legacy': False})
+            rows_cursor.execute("""
+                SELECT row_num, track, album, platform, territory, period, quantity, revenue::TEXT, raw_values
+                FROM t_p35759334_music_label_portal.report_rows
+                WHERE report_file_id = %s
+                ORDER BY row_num
+            """, (file_id,))
+            while True:
+                rows = rows_cursor.fetchmany(ARCHIVE_CHUNK_ROWS)
+                if not rows:
+                    break
+                raw_rows = [row[-1] or [] for row in rows]
+                width = max(len(raw_values) for raw_values in raw_rows)
+                write_line({
+                    'rows': len(rows),
+                    'typed': {column: [row[i] for row in rows] for i, column in enumerate(ARCHIVE_TYPED_COLUMNS)},
+                    'raw': [[raw_values[i] if i < len(raw_values) else None for raw_values in raw_rows] for i in range(width)]
+                })
+                count += len(rows)
+            return count
+    finally:
+        rows_cursor.close()
+
+def read_report_archive(storage, archive_key: str) -> Iterator[Dict[str, Any]]:
+    '''
+    Блоки архива по одному (в памяти не больше ARCHIVE_CHUNK_ROWS строк); у каждого блока есть поля
+    заголовка (legacy, fields). Архив версии 1 — один документ и читается одним блоком.
+    '''
+    with storage.open(archive_key) as f:
+        with lzma.open(f, 'rt', encoding='utf-8') as lines:
+            header: Dict[str, Any] = {}
+            for line in lines:
+                block = json.loads(line)
+                if 'rows' not in block:
+                    header = block
+                    continue
+                yield {**header, **block}
+
+def iter_archive_rows(block: Dict[str, Any]) -> Iterator[tuple]:
+    '''Строки блока архива в исходном виде: raw_values по порядку заголовков (у старых файлов — значения полей)'''
+    columns = block['columns'] if block['legacy'] else block['raw']
+    return zip(*columns) if columns else iter([()] * block['rows'])
+
+def restore_report_archive(cursor, file_id: int) -> int:
+    '''
+    Возвращает строки архивированного файла в report_rows (нужно для построчных запросов ?rows=1
+    и повторного расчёта начислений); архив в хранилище остаётся. Старые файлы возвращаются в data.
+    '''
+    cursor.execute(
+        "SELECT archive_key FROM t_p35759334_music_label_portal.artist_report_files WHERE id = %s",
+        (file_id,)
+    )
+    row = cursor.fetchone()
+    if not row or not row[0]:
+        return 0
+    
+    rows_count = 0
+    data: Optional[List[Dict[str, Any]]] = None
+    with tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES, mode='w+', newline='') as buffer:
+        writer = csv.writer(buffer)
+        for block in read_report_archive(get_report_storage(), row[0]):
+            rows_count += block['rows']
+            if block['legacy']:
+                # Старые файлы возвращаются в колонку data одним JSONB, поэтому собираются целиком
+                data = data if data is not None else []
+                data.extend(dict(zip(block['fields'], values)) for values in iter_archive_rows(block))
+                continue
+            typed_rows = zip(*(block['typed'][column] for column in ARCHIVE_TYPED_COLUMNS))
+            for typed, raw_values in zip(typed_rows, iter_archive_rows(block)):
+                writer.writerow((file_id,) + tuple(typed) + (pg_array_literal(raw_values),))
+        
+        if data is not None:
+            cursor.execute(
+                "UPDATE t_p35759334_music_label_portal.artist_report_files SET data = %s WHERE id = %s",
+                (json.dumps(data, ensure_ascii=False), file_id)
+            )
+        else:
+            buffer.seek(0)
+            cursor.copy_expert(COPY_REPORT_ROWS_SQL, buffer)
+    
+    cursor.execute("""
+        UPDATE t_p35759334_music_label_portal.artist_report_files
+        SET archive_key = NULL, archived_at = NULL, archive_bytes = NULL
+        WHERE id = %s
+    """, (file_id,))
+    print(f"DEBUG: Restored {rows_count} rows of report file {file_id} from archive")
+    return rows_count
+
+def redirect_response(url: str) -> Dict[str, Any]:
+    return {
+        'statusCode': 302,
+        'headers': {'Location': url, 'Access-Control-Allow-Origin': '*'},
+        'body': ''
+    }
+
+def match_performers(cursor, uploaded_report_id: int) -> Dict[str, int]:
+    '''
+    Привязывает непривязанные файлы отчёта к пользователям. Имя ищется целиком, у совместных релизов —
+    ещё и по участникам. Сам файл привязывается (sent_to_artist_id, sent_at) только по псевдониму из ручных
+    привязок: целиком или ровно у одного участника. Триграммное совпадение — лишь подсказка менеджеру
+    (match_user_id/match_score), подтверждается через PATCH.
+    '''
+    cursor.execute("""
+        SELECT id, artist_username FROM t_p35759334_music_label_portal.artist_report_files
+        WHERE uploaded_report_id = %s AND sent_to_artist_id IS NULL AND artist_username <> %s
+    """, (uploaded_report_id, NO_PERFORMER))
+    files = cursor.fetchall()
+    if not files:
+        return {'linked': 0, 'suggested': 0}
+    
+    file_ids, parts, is_full = [], [], []
+    for file_id, performer in files:
+        file_ids.append(file_id)
+        parts.append(performer)
+        is_full.append(True)
+        members = [m for m in PERFORMER_SPLIT_RE.split(performer) if m.strip()]
+        if len(members) > 1:
+            for member in members:
+                file_ids.append(file_id)
+                parts.append(member)
+                is_full.append(False)
+    
+    cursor.execute(MATCH_PERFORMERS_SQL, (file_ids, parts, is_full))
+    
+    full_matches: Dict[int, tuple] = {}
+    member_matches: Dict[int, Dict[int, float]] = defaultdict(dict)
+    member_aliases: Dict[int, set] = defaultdict(set)
+    for file_id, full, user_id, score, method in cursor.fetchall():
+        if full:
+            full_matches[file_id] = (user_id, score, method)
+        else:
+            member_matches[file_id][user_id] = max(score, member_matches[file_id].get(user_id, 0))
+            if method == 'alias':
+                member_aliases[file_id].add(user_id)
+    
+    updates = []
+    for file_id, _ in files:
+        full = full_matches.get(file_id)
+        
+        if full and full[2] == 'alias':
+            updates.append((file_id, full[0], full[1], 'alias', True))
+        elif len(member_aliases.get(file_id, ())) == 1:
+            user_id = next(iter(member_aliases[file_id]))
+            updates.append((file_id, user_id, member_matches[file_id][user_id], 'collaboration', True))
+        elif full:
+            updates.append((file_id, full[0], full[1], full[2], False))
+        elif member_matches.get(file_id):
+            user_id, score = max(member_matches[file_id].items(), key=lambda c: c[1])
+            updates.append((file_id, user_id, score, 'suggestion', False))
+    
+    if updates:
+        psycopg2.extras.execute_values(cursor, """
+            UPDATE t_p35759334_music_label_portal.artist_report_files AS arf
+            SET match_user_id = v.user_id, match_score = v.score, match_method = v.method,
+                sent_to_artist_id = CASE WHEN v.link THEN v.user_id ELSE arf.sent_to_artist_id END,
+                sent_at = CASE WHEN v.link THEN CURRENT_TIMESTAMP ELSE arf.sent_at END
+            FROM (VALUES %s) AS v(id, user_id, score, method, link)
+            WHERE arf.id = v.id
+        """, updates)
+    
+    linked = sum(1 for u in updates if u[4])
+    print(f"DEBUG: Performer matching for report {uploaded_report_id}: {linked} linked, {len(updates) - linked} suggested of {len(files)}")
+    return {'linked': linked, 'suggested': len(updates) - linked}
+
+def list_report_files(cursor, params: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Страница файлов исполнителей по курсору. Внутри отчёта (uploaded_report_id) — по имени исполнителя,
+    по всем отчётам — от новых к старым. Фильтры: artist (имя исполнителя), sent (1/0), sent_to_artist_id.
+    Количество строк и суммы хранятся в artist_report_files с загрузки, блоки данных не читаются.
+    '''
+    limit = min(max(int(params.get('limit', DEFAULT_FILES_PAGE_SIZE)), 1), MAX_FILES_PAGE_SIZE)
+    uploaded_report_id = params.get('uploaded_report_id')
+    
+    filters = ['TRUE']
+    query_params: Dict[str, Any] = {'limit': limit + 1}
+    
+    if uploaded_report_id:
+        filters.append('arf.uploaded_report_id = %(uploaded_report_id)s')
+        query_params['uploaded_report_id'] = int(uploaded_report_id)
+    if params.get('artist'):
+        filters.append('arf.artist_username = %(artist)s')
+        query_params['artist'] = params['artist']
+    if params.get('sent') in ('1', 'true'):
+        filters.append('arf.sent_to_artist_id IS NOT NULL')
+    elif params.get('sent') in ('0', 'false'):
+        filters.append('arf.sent_to_artist_id IS NULL')
+    if params.get('sent_to_artist_id'):
+        filters.append('arf.sent_to_artist_id = %(sent_to_artist_id)s')
+        query_params['sent_to_artist_id'] = int(params['sent_to_artist_id'])
+    
+    # Внутри отчёта порядок (artist_username, id) идёт по индексу idx_artist_report_files_report_performer (V0059)
+    if uploaded_report_id:
+        order_by = 'arf.artist_username, arf.id'
+        if params.get('cursor'):
+            after_username, _, after_id = params['cursor'].rpartition('_')
+            filters.append('(arf.artist_username, arf.id) > (%(after_username)s, %(after_id)s)')
+            query_params['after_username'] = after_username
+            query_params['after_id'] = int(after_id)
+    else:
+        order_by = 'arf.id DESC'
+        if params.get('cursor'):
+            filters.append('arf.id < %(before_id)s')
+            query_params['before_id'] = int(params['cursor'])
+    
+    cursor.execute(f"""
+        SELECT arf.id, arf.artist_username, arf.artist_full_name, arf.deduction_percent,
+               arf.sent_to_artist_id, arf.sent_at, arf.rows_count, arf.total_quantity, arf.total_revenue,
+               arf.match_user_id, arf.match_score, arf.match_method,
+               arf.uploaded_report_id, ur.file_name, ur.uploaded_at
+        FROM t_p35759334_music_label_portal.artist_report_files arf
+        JOIN t_p35759334_music_label_portal.uploaded_reports ur ON arf.uploaded_report_id = ur.id
+        WHERE {' AND '.join(filters)}
+        ORDER BY {order_by}
+        LIMIT %(limit)s
+    """, query_params)
+    
+    files = []
+    for row in cursor.fetchall():
+        files.append({
+            'id': row[0],
+            'artist_username': row[1],
+            'artist_full_name': row[2],
+            'deduction_percent': float(row[3]) if row[3] else 0,
+            'sent_to_artist_id': row[4],
+            'sent_at': row[5].isoformat() if row[5] else None,
+            'rows_count': row[6],
+            'total_quantity': row[7],
+            'total_revenue': float(row[8]),
+            'match_user_id': row[9],
+            'match_score': row[10],
+            'match_method': row[11],
+            'uploaded_report_id': row[12],
+            'file_name': row[13],
+            'uploaded_at': row[14].isoformat() if row[14] else None
+        })
+    
+    has_more = len(files) > limit
+    files = files[:limit]
+    next_cursor = None
+    if has_more:
+        last = files[-1]
+        next_cursor = f"{last['artist_username']}_{last['id']}" if uploaded_report_id else str(last['id'])
+    
+    page: Dict[str, Any] = {'files': files, 'has_more': has_more, 'next_cursor': next_cursor}
+    
+    # Исполнитель в отчёте — ровно один файл, поэтому список исполнителей читается
+    # из того же индекса (index-only scan), без DISTINCT; отдаётся с первой страницей
+    if uploaded_report_id and not params.get('cursor'):
+        cursor.execute("""
+            SELECT artist_username, artist_full_name
+            FROM t_p35759334_music_label_portal.artist_report_files
+            WHERE uploaded_report_id = %s
+            ORDER BY artist_username
+        """, (int(uploaded_report_id),))
+        page['performers'] = [{'username': row[0], 'full_name': row[1]} for row in cursor.fetchall()]
+    
+    return page
+
+def requester_user_id(event: Dict[str, Any]) -> Optional[int]:
+    '''Пользователь из заголовка X-User-Id; None — заголовка нет или он не число'''
+    headers = event.get('headers', {}) or {}
+    user_id = headers.get('X-User-Id') or headers.get('x-user-id')
+    try:
+        return int(user_id) if user_id else None
+    except ValueError:
+        return None
+
+def requester_role(cursor, requester_id: int) -> Optional[str]:
+    cursor.execute(
+        "SELECT role FROM t_p35759334_music_label_portal.users WHERE id = %s",
+        (requester_id,)
+    )
+    user = cursor.fetchone()
+    return user[0] if user else None
+
+def require_director(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    '''Ответ 401/403, если запрос не от директора; None — доступ есть'''
+    requester_id = requester_user_id(event)
+    if requester_id is None:
+        return {
+            'statusCode': 401,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Unauthorized'})
+        }
+    
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
+    cursor = conn.cursor()
+    try:
+        role = requester_role(cursor, requester_id)
+    finally:
+        cursor.close()
+        conn.close()
+    
+    if role != 'director':
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Доступно только директору'})
+        }
+    return None
+
+def is_report_manager(cursor, requester_id: int) -> bool:
+    return requester_role(cursor, requester_id) in ('director', 'manager')
+
+def resolve_report_artist(cursor, requester_id: int, params: Dict[str, Any]) -> Optional[int]:
+    '''
+    Чьи отчёты смотрит пользователь: артист — только свои (чужой artist_id — нет доступа),
+    директор и менеджер — artist_id из запроса; None — нет доступа
+    '''
+    role = requester_role(cursor, requester_id)
+    if role == 'artist':
+        if params.get('artist_id') and str(params['artist_id']) != str(requester_id):
+            return None
+        return requester_id
+    if role in ('director', 'manager') and params.get('artist_id'):
+        return int(params['artist_id'])
+    return None
+
+def query_report_rows(cursor, requester_id: int, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    '''
+    Срез строк отчётов артиста для таблиц в кабинете: фильтры track (подстрока), platform, country, period,
+    uploaded_report_id, file_id; сортировка sort/order; group_by — суммы по треку, площадке, стране или периоду;
+    страница limit/offset. Артист видит только отправленные ему файлы, директор и менеджер — файлы artist_id.
+    None — нет доступа.
+    '''
+    artist_id = resolve_report_artist(cursor, requester_id, params)
+    if artist_id is None:
+        return None
+    
+    limit = min(max(int(params.get('limit', DEFAULT_ROWS_PAGE_SIZE)), 1), MAX_ROWS_PAGE_SIZE)
+    offset = max(int(params.get('offset', 0)), 0)
+    
+    group_by = [c for c in (params.get('group_by') or '').split(',') if c]
+    unknown = [c for c in group_by if c not in ROWS_GROUP_COLUMNS]
+    if unknown:
+        raise ValueError(f"group_by: допустимы {', '.join(ROWS_GROUP_COLUMNS)}")
+    
+    sort = params.get('sort') or ('revenue' if group_by else 'period')
+    allowed_sort = group_by + ['quantity', 'revenue', 'net', 'rows_count'] if group_by else ROWS_SORT_COLUMNS
+    if sort not in allowed_sort:
+        raise ValueError(f"sort: допустимы {', '.join(allowed_sort)}")
+    direction = 'ASC' if params.get('order') == 'asc' else 'DESC'
+    
+    filters = ['f.sent_to_artist_id = %(artist_id)s']
+    query_params: Dict[str, Any] = {'artist_id': artist_id, 'limit': limit + 1, 'offset': offset}
+    
+    if params.get('uploaded_report_id'):
+        filters.append('f.uploaded_report_id = %(uploaded_report_id)s')
+        query_params['uploaded_report_id'] = int(params['uploaded_report_id'])
+    if params.get('file_id'):
+        filters.append('f.id = %(file_id)s')
+        query_params['file_id'] = int(params['file_id'])
+    if params.get('track'):
+        filters.append("r.track ILIKE %(track)s ESCAPE '\\'")
+        escaped = params['track'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query_params['track'] = f"%{escaped}%"
+    for param, column in (('platform', 'platform'), ('country', 'territory'), ('territory', 'territory'), ('period', 'period')):
+        if params.get(param):
+            filters.append(f'r.{column} = %({param})s')
+            query_params[param] = params[param]
+    
+    # Строки неизменившихся файлов лежат у файла предыдущей загрузки (rows_file_id, V0055);
+    # строки архивированных файлов подмешиваются из архивов; доход артиста — после удержания лейбла по файлу
+    rows_table = 't_p35759334_music_label_portal.report_rows'
+    file_filters = [f for f in filters if f.startswith('f.')]
+    if load_archived_rows(cursor, file_filters, query_params):
+        rows_table = f"(SELECT * FROM {rows_table} UNION ALL SELECT * FROM archived_report_rows)"
+    source = f"""
+        FROM t_p35759334_music_label_portal.artist_report_files f
+        JOIN {rows_table} r ON r.report_file_id = COALESCE(f.rows_file_id, f.id)
+        WHERE {' AND '.join(filters)}
+    """
+    net_expr = 'r.revenue * (100 - COALESCE(f.deduction_percent, 0)) / 100'
+    
+    if group_by:
+        group_list = ', '.join(f'r.{c}' for c in group_by)
+        cursor.execute(f"""
+            SELECT {', '.join(f'r.{c} AS {c}' for c in group_by)},
+                   COUNT(*) AS rows_count,
+                   SUM(COALESCE(r.quantity, 0)) AS quantity,
+                   SUM(COALESCE(r.revenue, 0)) AS revenue,
+                   SUM(COALESCE({net_expr}, 0)) AS net
+            {source}
+            GROUP BY {group_list}
+            ORDER BY {sort} {direction} NULLS LAST, {group_list}
+            LIMIT %(limit)s OFFSET %(offset)s
+        """, query_params)
+        items = []
+        for row in cursor.fetchall():
+            item = dict(zip(group_by, row))
+            item.update({
+                'rows_count': row[len(group_by)],
+                'quantity': int(row[len(group_by) + 1]),
+                'revenue': float(row[len(group_by) + 2]),
+                'net': float(row[len(group_by) + 3])
+            })
+            items.append(item)
+    else:
+        cursor.execute(f"""
+            SELECT f.id, f.uploaded_report_id, r.row_num, r.track AS track, r.album AS album,
+                   r.platform AS platform, r.territory AS territory, r.period AS period,
+                   r.quantity AS quantity, r.revenue AS revenue, {net_expr} AS net
+            {source}
+            ORDER BY {sort} {direction} NULLS LAST, f.id, r.row_num
+            LIMIT %(limit)s OFFSET %(offset)s
+        """, query_params)
+        items = [{
+            'file_id': row[0],
+            'uploaded_report_id': row[1],
+            'row_num': row[2],
+            'track': row[3],
+            'album': row[4],
+            'platform': row[5],
+            'territory': row[6],
+            'period': row[7],
+            'quantity': row[8],
+            'revenue': float(row[9]) if row[9] is not None else None,
+            'net': float(row[10]) if row[10] is not None else None
+        } for row in cursor.fetchall()]
+    
+    has_more = len(items) > limit
+    return {
+        'rows': items[:limit],
+        'group_by': group_by,
+        'has_more': has_more,
+        'next_offset': offset + limit if has_more else None
+    }
+
+def load_archived_rows(cursor, file_filters: List[str], query_params: Dict[str, Any]) -> bool:
+    '''
+    Загружает во временную таблицу archived_report_rows строки архивированных файлов, подходящих под
+    file_filters (условия на f.*). Архивы не возвращаются в report_rows: иначе каждый просмотр старого отчёта
+    отменял бы архивацию. False — архивированных файлов нет, таблица не создана.
+    '''
+    cursor.execute(f"""
+        SELECT DISTINCT src.id, src.archive_key
+        FROM t_p35759334_music_label_portal.artist_report_files f
+        JOIN t_p35759334_music_label_portal.artist_report_files src ON src.id = COALESCE(f.rows_file_id, f.id)
+        WHERE {' AND '.join(file_filters)} AND src.archive_key IS NOT NULL
+    """, query_params)
+    archived = cursor.fetchall()
+    if not archived:
+        return False
+    
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS archived_report_rows
+        (LIKE t_p35759334_music_label_portal.report_rows) ON COMMIT DROP
+    """)
+    storage = get_report_storage()
+    for file_id, archive_key in archived:
+        with tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES, mode='w+', newline='') as buffer:
+            writer = csv.writer(buffer)
+            for block in read_report_archive(storage, archive_key):
+                # Старые файлы (data) в report_rows не попадали и в построчных запросах не участвуют
+                if block['legacy']:
+                    break
+                typed_rows = zip(*(block['typed'][column] for column in ARCHIVE_TYPED_COLUMNS))
+                for typed, raw_values in zip(typed_rows, iter_archive_rows(block)):
+                    writer.writerow((file_id,) + tuple(typed) + (pg_array_literal(raw_values),))
+            buffer.seek(0)
+            cursor.copy_expert(COPY_ARCHIVED_ROWS_SQL, buffer)
+    print(f"DEBUG: Loaded rows of {len(archived)} archived report files for query")
+    return True
+
+def compare_uploads(cursor, requester_id: int, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    '''
+    Сравнение двух загрузок для артиста по трекам: прослушивания и доход (net) в compare_from и compare_to
+    и их разница. Без compare_from берётся предыдущая загрузка с начислениями артиста.
+    Читаются свёртки report_royalties (V0057), а не строки отчётов. None — нет доступа.
+    '''
+    artist_id = resolve_report_artist(cursor, requester_id, params)
+    if artist_id is None:
+        return None
+    
+    to_report_id = int(params['compare_to'])
+    if params.get('compare_from'):
+        from_report_id = int(params['compare_from'])
+    else:
+        cursor.execute("""
+            SELECT MAX(uploaded_report_id) FROM t_p35759334_music_label_portal.report_royalties
+            WHERE artist_id = %s AND uploaded_report_id < %s
+        """, (artist_id, to_report_id))
+        from_report_id = cursor.fetchone()[0]
+        if from_report_id is None:
+            raise ValueError('Нет предыдущей загрузки для сравнения, укажите compare_from')
+    
+    # FULL JOIN: треки, которые есть только в одной из загрузок, попадают в сравнение с нулями
+    cursor.execute("""
+        WITH totals AS (
+            SELECT uploaded_report_id, COALESCE(track, '') AS track, MAX(album) AS album,
+                   SUM(plays) AS plays, SUM(net) AS revenue
+            FROM t_p35759334_music_label_portal.report_royalties
+            WHERE artist_id = %(artist_id)s AND uploaded_report_id IN (%(from_id)s, %(to_id)s)
+            GROUP BY uploaded_report_id, COALESCE(track, '')
+        ),
+        a AS (SELECT * FROM totals WHERE uploaded_report_id = %(from_id)s),
+        b AS (SELECT * FROM totals WHERE uploaded_report_id = %(to_id)s)
+        SELECT COALESCE(b.track, a.track), COALESCE(b.album, a.album),
+               COALESCE(a.plays, 0), COALESCE(b.plays, 0),
+               COALESCE(a.revenue, 0), COALESCE(b.revenue, 0)
+        FROM a FULL OUTER JOIN b ON a.track = b.track
+        ORDER BY abs(COALESCE(b.revenue, 0) - COALESCE(a.revenue, 0)) DESC, 1
+    """, {'artist_id': artist_id, 'from_id': from_report_id, 'to_id': to_report_id})
+    
+    tracks = []
+    totals = {'plays_from': 0, 'plays_to': 0, 'revenue_from': 0.0, 'revenue_to': 0.0}
+    for track, album, plays_from, plays_to, revenue_from, revenue_to in cursor.fetchall():
+        item = {
+            'track': track or None,
+            'album': album,
+            'plays_from': int(plays_from),
+            'plays_to': int(plays_to),
+            'plays_delta': int(plays_to - plays_from),
+            'revenue_from': float(revenue_from),
+            'revenue_to': float(revenue_to),
+            'revenue_delta': float(revenue_to - revenue_from),
+            'revenue_change_percent': round(float((revenue_to - revenue_from) / revenue_from * 100), 2) if revenue_from else None
+        }
+        for key in totals:
+            totals[key] += item[key]
+        tracks.append(item)
+    
+    totals['plays_delta'] = totals['plays_to'] - totals['plays_from']
+    totals['revenue_delta'] = totals['revenue_to'] - totals['revenue_from']
+    
+    return {
+        'artist_id': artist_id,
+        'compare_from': from_report_id,
+        'compare_to': to_report_id,
+        'tracks': tracks,
+        'totals': totals
+    }
+
+def royalty_totals(cursor, uploaded_report_id: int, group_by: str) -> List[Dict[str, Any]]:
+    '''Суммы начислений отчёта в разрезе ROYALTY_GROUPS[group_by]; payout NULL, если среди файлов есть непривязанные'''
+    columns = ROYALTY_GROUPS[group_by]
+    column_list = ', '.join(columns)
+    cursor.execute(f"""
+        SELECT {column_list}, SUM(plays), SUM(gross), SUM(deduction), SUM(net),
+               CASE WHEN bool_and(payout IS NOT NULL) THEN SUM(payout) END
+        FROM t_p35759334_music_label_portal.report_royalties
+        WHERE uploaded_report_id = %s
+        GROUP BY {column_list}
+        ORDER BY SUM(net) DESC
+    """, (uploaded_report_id,))
+    
+    totals = []
+    for row in cursor.fetchall():
+        item = dict(zip(columns, row))
+        plays, gross, deduction, net, payout = row[len(columns):]
+        item.update({
+            'plays': int(plays),
+            'gross': float(gross),
+            'deduction': float(deduction),
+            'net': float(net),
+            'payout': float(payout) if payout is not None else None
+        })
+        totals.append(item)
+    return totals
+
+def artist_royalties(cursor, artist_id: int) -> List[Dict[str, Any]]:
+    '''Начисления артиста по всем привязанным к нему файлам в формате кабинета артиста (ArtistReports)'''
+    cursor.execute("""
+        SELECT rr.id, rr.period, rr.platform, rr.territory, rr.artist_username, rr.track, rr.album,
+               rr.plays, rr.gross, rr.net, rr.revenue_share_percent, rr.payout, ur.uploaded_at
+        FROM t_p35759334_music_label_portal.report_royalties rr
+        JOIN t_p35759334_music_label_portal.uploaded_reports ur ON ur.id = rr.uploaded_report_id
+        WHERE rr.artist_id = %s
+        ORDER BY rr.period DESC NULLS LAST, rr.net DESC
+    """, (artist_id,))
+    
+    return [{
+        'id': row[0],
+        'period_start': row[1],
+        'period_end': row[1],
+        'platform': row[2],
+        'territory': row[3],
+        'performer': row[4],
+        'track_name': row[5],
+        'album_name': row[6],
+        'plays': int(row[7]),
+        'author_reward_license': float(row[8]),
+        'author_reward_license_changed': float(row[9]),
+        'total_reward': float(row[9]),
+        'revenue_share_percent': row[10],
+        'payout': float(row[11]) if row[11] is not None else None,
+        'uploaded_at': row[12].isoformat() if row[12] else None
+    } for row in cursor.fetchall()]
+
+def report_files_summary(cursor, uploaded_report_id: int) -> List[Dict[str, Any]]:
+    cursor.execute("""
+        SELECT id, artist_username, artist_full_name, rows_count, total_quantity, total_revenue
+        FROM t_p35759334_music_label_portal.artist_report_files
+        WHERE uploaded_report_id = %s
+        ORDER BY artist_username
+    """, (uploaded_report_id,))
+    
+    return [{
+        'id': row[0],
+        'artist_username': row[1],
+        'artist_full_name': row[2],
+        'rows_count': row[3],
+        'total_quantity': row[4],
+        'total_revenue': float(row[5])
+    } for row in cursor.fetchall()]
+
+class S3ReportStorage:
+    '''Исходные файлы отчётов в Yandex Object Storage; клиент загружает их сам по presigned URL'''
+    
+    def __init__(self):
+        self.bucket = os.environ.get('YC_S3_BUCKET_NAME')
+        self.client = boto3.client(
+            's3',
+            endpoint_url='https://storage.yandexcloud.net',
+            aws_access_key_id=os.environ.get('YC_S3_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.environ.get('YC_S3_SECRET_ACCESS_KEY'),
+            region_name='ru-central1'
+        )
+    
+    def upload_url(self, key: str, content_type: str) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket, 'Key': key, 'ContentType': content_type},
+            ExpiresIn=UPLOAD_URL_TTL
+        )
+    
+    def download_url(self, key: str, file_name: str) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': key, 'ResponseContentDisposition': f'attachment; filename="{file_name}"'},
+            ExpiresIn=DOWNLOAD_URL_TTL
+        )
+    
+    def put(self, key: str, content: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=content)
+    
+    def put_file(self, key: str, fileobj: BinaryIO, content_type: str) -> None:
+        self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs={'ContentType': content_type})
+    
+    def open(self, key: str) -> BinaryIO:
+        # Файл скачивается во временный файл на диске, а не в память функции
+        tmp = tempfile.TemporaryFile()
+        self.client.download_fileobj(self.bucket, key, tmp)
+        tmp.seek(0)
+        return tmp
+    
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+class LocalReportStorage:
+    '''Каталог на диске вместо S3 (REPORTS_STORAGE_DIR) — для тестов и локального запуска'''
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+    
+    def upload_url(self, key: str, content_type: str) -> Optional[str]:
+        # Presigned URL нет: файл передаётся в create_upload как file_content
+        return None
+    
+    def download_url(self, key: str, file_name: str) -> Optional[str]:
+        # Ссылок нет: CSV отдаётся в теле ответа
+        return None
+    
+    def put(self, key: str, content: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+    
+    def put_file(self, key: str, fileobj: BinaryIO, content_type: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(fileobj, f)
+    
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), 'rb')
+    
+    def delete(self, key: str) -> None:
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+def get_report_storage():
+    storage_dir = os.environ.get('REPORTS_STORAGE_DIR')
+    if storage_dir:
+        return LocalReportStorage(storage_dir)
+    return S3ReportStorage()
+
+def handle_job_action(body_data: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Фоновая загрузка отчётов:
+    match_performers — повторная автопривязка исполнителей отчёта к пользователям;
+    archive_reports — перенос строк старых отчётов в архивы хранилища (также в остаток времени process_jobs);
+    restore_archive — возврат строк архивированного файла в базу;
+    create_upload — создаёт задачу и выдаёт URL для загрузки файла (или принимает file_content сразу);
+    start_job — ставит загруженный файл в очередь; process_jobs — обрабатывает очередь (вызывается таймером).
+    Прогресс и результат по исполнителям — GET ?job_id=.
+    '''
+    action = body_data.get('action')
+    
+    try:
+        dsn = os.environ.get('DATABASE_URL')
+        
+        if action == 'process_jobs':
+            deadline = time.monotonic() + JOB_TIME_BUDGET_SECONDS
+            processed = process_report_jobs(dsn, deadline)
+            # Оставшееся время таймера — на архивацию старых отчётов
+            archived = archive_old_reports(dsn, deadline)
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'status': 'ok', 'processed': processed, 'archived': archived})
+            }
+        
+        if action == 'archive_reports':
+            months = int(body_data.get('months', ARCHIVE_AFTER_MONTHS))
+            archived = archive_old_reports(dsn, time.monotonic() + JOB_TIME_BUDGET_SECONDS, months)
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'status': 'ok', 'archived': archived})
+            }
+        
+        if action == 'restore_archive':
+            file_id = body_data.get('file_id')
+            if not file_id:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': 'Требуется file_id'})
+                }
+            
+            conn = psycopg2.connect(dsn)
+            cursor = conn.cursor()
+            restored_rows = restore_report_archive(cursor, int(file_id))
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'status': 'ok', 'restored_rows': restored_rows})
+            }
+        
+        if action == 'match_performers':
+            uploaded_report_id = body_data.get('uploaded_report_id')
+            if not uploaded_report_id:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': 'Требуется uploaded_report_id'})
+                }
+            
+            conn = psycopg2.connect(dsn)
+            cursor = conn.cursor()
+            result = match_performers(cursor, int(uploaded_report_id))
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps(result)
+            }
+        
+        if action == 'create_upload':
+            file_name = body_data.get('file_name', 'report.csv')
+            uploaded_by = body_data.get('uploaded_by')
+            file_type = 'xlsx' if file_name.endswith('.xlsx') else 'csv'
+            
+            if not uploaded_by:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': 'Требуется uploaded_by'})
+                }
+            
+            if file_type == 'xlsx' and not EXCEL_AVAILABLE:
+                return {
+                    'statusCode': 500,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': 'Поддержка Excel не установлена'})
+                }
+            
+            storage = get_report_storage()
+            conn = psycopg2.connect(dsn)
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO t_p35759334_music_label_portal.report_upload_jobs (file_name, file_type, uploaded_by, period)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (file_name, file_type, uploaded_by, body_data.get('period')))
+            job_id = cursor.fetchone()[0]
+            storage_key = f"report-uploads/{job_id}.{file_type}"
+            
+            upload_url = None
+            status = 'awaiting_upload'
+            if body_data.get('file_content'):
+                storage.put(storage_key, base64.b64decode(body_data['file_content']))
+                status = 'queued'
+            else:
+                content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' if file_type == 'xlsx' else 'text/csv'
+                upload_url = storage.upload_url(storage_key, content_type)
+            
+            cursor.execute("""
+                UPDATE t_p35759334_music_label_portal.report_upload_jobs
+                SET storage_key = %s, status = %s
+                WHERE id = %s
+            """, (storage_key, status, job_id))
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            return {
+                'statusCode': 201,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'job_id': job_id, 'status': status, 'upload_url': upload_url})
+            }
+        
+        if action == 'start_job':
+            job_id = body_data.get('job_id')
+            if not job_id:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': 'Требуется job_id'})
+                }
+            
+            conn = psycopg2.connect(dsn)
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE t_p35759334_music_label_portal.report_upload_jobs
+                SET status = 'queued', updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND status = 'awaiting_upload'
+                RETURNING id
+            """, (job_id,))
+            started = cursor.fetchone() is not None
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            if not started:
+                return {
+                    'statusCode': 409,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': 'Задача не найдена или уже запущена'})
+                }
+            
+            return {
+                'statusCode': 202,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'job_id': int(job_id), 'status': 'queued'})
+            }
+        
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': f'Неизвестное действие: {action}'})
+        }
+    
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def process_report_jobs(dsn: str, deadline: float) -> List[Dict[str, Any]]:
+    '''
+    Берёт задачи из очереди по одной (SKIP LOCKED + аренда locked_until) и обрабатывает до deadline.
+    Незаконченная задача возвращается в очередь с сохранённым processed_rows, следующий вызов продолжит её.
+    Задача, чья аренда истекла (функция упала), подхватывается заново с последнего checkpoint.
+    '''
+    processed = []
+    conn = psycopg2.connect(dsn)
+    cursor = conn.cursor()
+    
+    try:
+        while time.monotonic() < deadline:
+            cursor.execute("""
+                UPDATE t_p35759334_music_label_portal.report_upload_jobs
+                SET status = 'processing', attempts = attempts + 1,
+                    locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                    started_at = COALESCE(started_at, CURRENT_TIMESTAMP), updated_at = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT id FROM t_p35759334_music_label_portal.report_upload_jobs
+                    WHERE status = 'queued' OR (status = 'processing' AND locked_until < CURRENT_TIMESTAMP)
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, file_name, file_type, storage_key, uploaded_by, uploaded_report_id,
+                          performer_columns, processed_rows, period
+            """, (JOB_LEASE_SECONDS,))
+            job = cursor.fetchone()
+            conn.commit()
+            if not job:
+                break
+            
+            job_id = job[0]
+            try:
+                processed.append(run_report_job(conn, job, deadline))
+            except Exception as e:
+                conn.rollback()
+                print(f"DEBUG: Report job {job_id} failed: {e}")
+                cursor.execute("""
+                    UPDATE t_p35759334_music_label_portal.report_upload_jobs
+                    SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+                        error = %s, locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                    RETURNING status, uploaded_report_id
+                """, (MAX_JOB_ATTEMPTS, str(e), job_id))
+                status, partial_report_id = cursor.fetchone()
+                if status == 'failed' and partial_report_id:
+                    # Недогруженный отчёт больше не выдаётся за загруженный файл
+                    cursor.execute("""
+                        UPDATE t_p35759334_music_label_portal.uploaded_reports
+                        SET content_sha256 = NULL
+                        WHERE id = %s AND processed = FALSE
+                    """, (partial_report_id,))
+                conn.commit()
+                processed.append({'job_id': job_id, 'error': str(e)})
+    finally:
+        cursor.close()
+        conn.close()
+    
+    return processed
+
+def run_report_job(conn, job: tuple, deadline: float) -> Dict[str, Any]:
+    job_id, file_name, file_type, storage_key, uploaded_by, uploaded_report_id, performer_columns, processed_rows, period = job
+    cursor = conn.cursor()
+    storage = get_report_storage()
+    
+    with storage.open(storage_key) as stream:
+        if uploaded_report_id is None:
+            content_sha256 = sha256_of_stream(stream)
+            existing_report_id = find_report_by_hash(cursor, content_sha256)
+            if existing_report_id:
+                return finish_duplicate_job(conn, cursor, job_id, existing_report_id)
+        
+        raw_rows = iter_xlsx_rows(stream) if file_type == 'xlsx' else iter_csv_rows(stream)
+        report_format, headers, rows = sniff_report(raw_rows)
+        
+        if uploaded_report_id is None:
+            sample_rows = list(itertools.islice(rows, DETECTION_SAMPLE_ROWS))
+            performer_columns = resolve_performer_columns(cursor, headers, report_format, sample_rows)
+            rows = itertools.chain(sample_rows, rows)
+            
+            uploaded_report_id = create_uploaded_report(cursor, file_name, uploaded_by, headers, report_format, content_sha256)
+            cursor.execute("""
+                UPDATE t_p35759334_music_label_portal.report_upload_jobs
+                SET uploaded_report_id = %s, performer_columns = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (uploaded_report_id, performer_columns, job_id))
+            conn.commit()
+        
+        def checkpoint(rows_done: int) -> None:
+            cursor.execute("""
+                UPDATE t_p35759334_music_label_portal.report_upload_jobs
+                SET processed_rows = %s, locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (rows_done, JOB_LEASE_SECONDS, job_id))
+            conn.commit()
+        
+        rows_done, finished = load_report_rows(
+            cursor, uploaded_report_id, headers, report_format, list(performer_columns), rows,
+            start_row=processed_rows, checkpoint=checkpoint, deadline=deadline
+        )
+    
+    if finished:
+        finalize_uploaded_report(cursor, uploaded_report_id, rows_done, period)
+        cursor.execute("""
+            UPDATE t_p35759334_music_label_portal.report_upload_jobs
+            SET status = 'done', processed_rows = %s, error = NULL, locked_until = NULL,
+                finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (rows_done, job_id))
+    else:
+        # Прогресс уже зафиксирован checkpoint'ом: задача возвращается в очередь без штрафа за попытку
+        cursor.execute("""
+            UPDATE t_p35759334_music_label_portal.report_upload_jobs
+            SET status = 'queued', attempts = attempts - 1, locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (job_id,))
+    conn.commit()
+    cursor.close()
+    
+    return {'job_id': job_id, 'processed_rows': rows_done, 'finished': finished}
+
+def finish_duplicate_job(conn, cursor, job_id: int, existing_report_id: int) -> Dict[str, Any]:
+    '''Файл задачи совпал с уже загруженным отчётом: задача сразу завершается ссылкой на него'''
+    cursor.execute("""
+        UPDATE t_p35759334_music_label_portal.report_upload_jobs
+        SET status = 'done', duplicate = TRUE, uploaded_report_id = %s, error = NULL, locked_until = NULL,
+            finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    """, (existing_report_id, job_id))
+    conn.commit()
+    cursor.close()
+    print(f"DEBUG: Report job {job_id} is a duplicate of report {existing_report_id}")
+    return {'job_id': job_id, 'duplicate_of': existing_report_id, 'finished': True}
+
+def report_job_status(cursor, job_id: int) -> Optional[Dict[str, Any]]:
+    cursor.execute("""
+        SELECT j.id, j.file_name, j.status, j.processed_rows, j.uploaded_report_id, j.error,
+               j.created_at, j.started_at, j.finished_at, ur.report_format, j.duplicate, ur.diff
+        FROM t_p35759334_music_label_portal.report_upload_jobs j
+        LEFT JOIN t_p35759334_music_label_portal.uploaded_reports ur ON ur.id = j.uploaded_report_id
+        WHERE j.id = %s
+    """, (job_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    
+    return {
+        'job_id': row[0],
+        'file_name': row[1],
+        'status': row[2],
+        'processed_rows': row[3],
+        'uploaded_report_id': row[4],
+        'error': row[5],
+        'created_at': row[6].isoformat() if row[6] else None,
+        'started_at': row[7].isoformat() if row[7] else None,
+        'finished_at': row[8].isoformat() if row[8] else None,
+        'format': row[9],
+        'duplicate': row[10],
+        'diff': row[11],
+        'artist_files': report_files_summary(cursor, row[4]) if row[4] else []
+    }
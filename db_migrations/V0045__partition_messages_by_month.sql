@@ -0,0 +1,99 @@
+-- Помесячное секционирование таблицы messages по created_at
+-- Горячие индексы живут только в секциях последних месяцев, старые секции уходят в архив (data-retention)
+
+-- Функция создания помесячных секций с месяца p_from по месяц p_to включительно
+-- Имена секций: <таблица>_pYYYY_MM (по ним data-retention определяет возраст секции)
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.create_monthly_partitions(
+    p_table TEXT,
+    p_from DATE,
+    p_to DATE
+) RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_from)::DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= p_to LOOP
+        partition_name := p_table || '_p' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass('t_p35759334_music_label_portal.' || partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE t_p35759334_music_label_portal.%I PARTITION OF t_p35759334_music_label_portal.%I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, p_table, month_start, (month_start + INTERVAL '1 month')::DATE
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Журнал секций, выгруженных в архивное хранилище (S3, gzip CSV)
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.partition_archives (
+    id SERIAL PRIMARY KEY,
+    parent_table VARCHAR(100) NOT NULL,
+    partition_name VARCHAR(100) NOT NULL UNIQUE,
+    range_start DATE NOT NULL,
+    range_end DATE NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    s3_key VARCHAR(500) NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_partition_archives_parent ON t_p35759334_music_label_portal.partition_archives(parent_table, range_start);
+
+-- Новая секционированная таблица (первичный ключ обязан включать ключ секционирования)
+CREATE TABLE t_p35759334_music_label_portal.messages_partitioned (
+    id INTEGER NOT NULL DEFAULT nextval('t_p35759334_music_label_portal.messages_id_seq'),
+    sender_id INTEGER NOT NULL REFERENCES t_p35759334_music_label_portal.users(id),
+    message TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    is_read BOOLEAN DEFAULT FALSE,
+    receiver_id INTEGER,
+    is_from_boss BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Секции покрывают всю существующую историю и три месяца вперёд
+SELECT t_p35759334_music_label_portal.create_monthly_partitions(
+    'messages_partitioned',
+    COALESCE((SELECT MIN(created_at)::DATE FROM t_p35759334_music_label_portal.messages), CURRENT_DATE),
+    (CURRENT_DATE + INTERVAL '3 months')::DATE
+);
+
+INSERT INTO t_p35759334_music_label_portal.messages_partitioned
+    (id, sender_id, message, created_at, is_read, receiver_id, is_from_boss)
+SELECT id, sender_id, message, COALESCE(created_at, CURRENT_TIMESTAMP), is_read, receiver_id, is_from_boss
+FROM t_p35759334_music_label_portal.messages;
+
+-- Подмена таблицы: последовательность id переходит к новой таблице
+ALTER SEQUENCE t_p35759334_music_label_portal.messages_id_seq OWNED BY NONE;
+DROP TABLE t_p35759334_music_label_portal.messages;
+ALTER TABLE t_p35759334_music_label_portal.messages_partitioned RENAME TO messages;
+ALTER TABLE t_p35759334_music_label_portal.messages RENAME CONSTRAINT messages_partitioned_pkey TO messages_pkey;
+ALTER SEQUENCE t_p35759334_music_label_portal.messages_id_seq OWNED BY t_p35759334_music_label_portal.messages.id;
+
+DO $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 't_p35759334_music_label_portal.messages'::regclass
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE t_p35759334_music_label_portal.%I RENAME TO %I',
+            part.relname, replace(part.relname, 'messages_partitioned_', 'messages_')
+        );
+    END LOOP;
+END;
+$$;
+
+-- Индексы создаются на родительской таблице и наследуются каждой секцией
+CREATE INDEX IF NOT EXISTS idx_messages_receiver_unread ON t_p35759334_music_label_portal.messages(receiver_id, sender_id) WHERE is_read = FALSE;
+CREATE INDEX IF NOT EXISTS idx_messages_dialog ON t_p35759334_music_label_portal.messages(sender_id, receiver_id, created_at DESC);
+
+COMMENT ON TABLE t_p35759334_music_label_portal.messages IS 'Личные сообщения (помесячные секции messages_pYYYY_MM по created_at)';
+COMMENT ON TABLE t_p35759334_music_label_portal.partition_archives IS 'Секции, выгруженные в архив и удалённые из БД';
@@ -0,0 +1,177 @@
+-- Счётчики непрочитанного для каждого пользователя, поддерживаемые триггерами
+-- unread-counts читает одну строку по первичному ключу вместо 1-4 COUNT(*) на каждый опрос
+
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.user_counters (
+    user_id INTEGER PRIMARY KEY REFERENCES t_p35759334_music_label_portal.users(id) ON DELETE CASCADE,
+    tickets INTEGER NOT NULL DEFAULT 0,
+    tasks INTEGER NOT NULL DEFAULT 0,
+    messages INTEGER NOT NULL DEFAULT 0,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE t_p35759334_music_label_portal.user_counters IS 'Счётчики для бейджей (тикеты, задачи, сообщения, заявки); пересчитываются триггерами при записи';
+
+-- Пересчёт счётчиков одного пользователя по тем же правилам, что раньше применял unread-counts.
+-- Строка счётчиков блокируется до подсчёта: конкурентная транзакция дождётся коммита
+-- и посчитает уже с учётом чужих изменений, поэтому значения не теряются.
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.refresh_user_counters(p_user_id INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    user_role TEXT;
+    c_tickets INTEGER := 0;
+    c_tasks INTEGER := 0;
+    c_messages INTEGER := 0;
+    c_submissions INTEGER := 0;
+BEGIN
+    IF p_user_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    SELECT role INTO user_role FROM t_p35759334_music_label_portal.users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO t_p35759334_music_label_portal.user_counters (user_id)
+    VALUES (p_user_id)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    PERFORM 1 FROM t_p35759334_music_label_portal.user_counters WHERE user_id = p_user_id FOR UPDATE;
+
+    IF user_role = 'director' THEN
+        SELECT COUNT(*) INTO c_tickets FROM t_p35759334_music_label_portal.tickets WHERE status = 'open';
+        SELECT COUNT(*) INTO c_tasks FROM t_p35759334_music_label_portal.tasks WHERE status = 'pending';
+        SELECT COUNT(*) INTO c_submissions FROM t_p35759334_music_label_portal.submissions WHERE status = 'pending';
+    ELSIF user_role = 'manager' THEN
+        SELECT COUNT(*) INTO c_tickets FROM t_p35759334_music_label_portal.tickets
+        WHERE assigned_to = p_user_id AND status != 'resolved' AND status != 'closed';
+        SELECT COUNT(*) INTO c_tasks FROM t_p35759334_music_label_portal.tasks
+        WHERE assigned_to = p_user_id AND is_read = FALSE;
+    ELSIF user_role = 'artist' THEN
+        SELECT COUNT(*) INTO c_tickets FROM t_p35759334_music_label_portal.tickets
+        WHERE created_by = p_user_id AND status != 'open';
+    END IF;
+
+    SELECT COUNT(DISTINCT sender_id) INTO c_messages FROM t_p35759334_music_label_portal.messages
+    WHERE receiver_id = p_user_id AND is_read = FALSE;
+
+    UPDATE t_p35759334_music_label_portal.user_counters
+    SET tickets = c_tickets,
+        tasks = c_tasks,
+        messages = c_messages,
+        submissions = c_submissions,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE user_id = p_user_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Счётчики директоров глобальные: пересчитываются один раз на оператор, а не на строку
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.refresh_director_counters_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM t_p35759334_music_label_portal.refresh_user_counters(id)
+    FROM t_p35759334_music_label_portal.users
+    WHERE role = 'director'
+    ORDER BY id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.tickets_counters_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM t_p35759334_music_label_portal.refresh_user_counters(OLD.assigned_to);
+        PERFORM t_p35759334_music_label_portal.refresh_user_counters(OLD.created_by);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF TG_OP = 'INSERT' OR NEW.assigned_to IS DISTINCT FROM OLD.assigned_to THEN
+            PERFORM t_p35759334_music_label_portal.refresh_user_counters(NEW.assigned_to);
+        END IF;
+        IF TG_OP = 'INSERT' OR NEW.created_by IS DISTINCT FROM OLD.created_by THEN
+            PERFORM t_p35759334_music_label_portal.refresh_user_counters(NEW.created_by);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.tasks_counters_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM t_p35759334_music_label_portal.refresh_user_counters(OLD.assigned_to);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.assigned_to IS DISTINCT FROM OLD.assigned_to) THEN
+        PERFORM t_p35759334_music_label_portal.refresh_user_counters(NEW.assigned_to);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.messages_counters_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM t_p35759334_music_label_portal.refresh_user_counters(OLD.receiver_id);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.receiver_id IS DISTINCT FROM OLD.receiver_id) THEN
+        PERFORM t_p35759334_music_label_portal.refresh_user_counters(NEW.receiver_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.users_counters_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM t_p35759334_music_label_portal.refresh_user_counters(NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Тикеты: исполнитель и автор (строчный триггер) + директора (операторный)
+DROP TRIGGER IF EXISTS trg_tickets_counters ON t_p35759334_music_label_portal.tickets;
+CREATE TRIGGER trg_tickets_counters
+    AFTER INSERT OR DELETE OR UPDATE OF status, assigned_to, created_by ON t_p35759334_music_label_portal.tickets
+    FOR EACH ROW EXECUTE FUNCTION t_p35759334_music_label_portal.tickets_counters_trg();
+
+DROP TRIGGER IF EXISTS trg_tickets_director_counters ON t_p35759334_music_label_portal.tickets;
+CREATE TRIGGER trg_tickets_director_counters
+    AFTER INSERT OR DELETE OR UPDATE OF status ON t_p35759334_music_label_portal.tickets
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p35759334_music_label_portal.refresh_director_counters_trg();
+
+-- Задачи: исполнитель (строчный триггер) + директора (операторный)
+DROP TRIGGER IF EXISTS trg_tasks_counters ON t_p35759334_music_label_portal.tasks;
+CREATE TRIGGER trg_tasks_counters
+    AFTER INSERT OR DELETE OR UPDATE OF is_read, assigned_to ON t_p35759334_music_label_portal.tasks
+    FOR EACH ROW EXECUTE FUNCTION t_p35759334_music_label_portal.tasks_counters_trg();
+
+DROP TRIGGER IF EXISTS trg_tasks_director_counters ON t_p35759334_music_label_portal.tasks;
+CREATE TRIGGER trg_tasks_director_counters
+    AFTER INSERT OR DELETE OR UPDATE OF status ON t_p35759334_music_label_portal.tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p35759334_music_label_portal.refresh_director_counters_trg();
+
+-- Заявки артистов учитываются только у директоров
+DROP TRIGGER IF EXISTS trg_submissions_director_counters ON t_p35759334_music_label_portal.submissions;
+CREATE TRIGGER trg_submissions_director_counters
+    AFTER INSERT OR DELETE OR UPDATE OF status ON t_p35759334_music_label_portal.submissions
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p35759334_music_label_portal.refresh_director_counters_trg();
+
+-- Сообщения: получатель
+DROP TRIGGER IF EXISTS trg_messages_counters ON t_p35759334_music_label_portal.messages;
+CREATE TRIGGER trg_messages_counters
+    AFTER INSERT OR DELETE OR UPDATE OF is_read, receiver_id ON t_p35759334_music_label_portal.messages
+    FOR EACH ROW EXECUTE FUNCTION t_p35759334_music_label_portal.messages_counters_trg();
+
+-- Новый пользователь или смена роли меняют правила подсчёта
+DROP TRIGGER IF EXISTS trg_users_counters ON t_p35759334_music_label_portal.users;
+CREATE TRIGGER trg_users_counters
+    AFTER INSERT OR UPDATE OF role ON t_p35759334_music_label_portal.users
+    FOR EACH ROW EXECUTE FUNCTION t_p35759334_music_label_portal.users_counters_trg();
+
+-- Начальное заполнение
+SELECT t_p35759334_music_label_portal.refresh_user_counters(id)
+FROM t_p35759334_music_label_portal.users
+ORDER BY id;
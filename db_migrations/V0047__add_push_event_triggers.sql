@@ -0,0 +1,92 @@
+-- События для push-шлюза (push-gateway): записи в уведомления, сообщения, тикеты и счётчики
+-- публикуются в канал portal_events через pg_notify. Полезная нагрузка — короткий JSON
+-- с получателем и типом события; сами данные клиент дочитывает через API.
+
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.notify_portal_event(
+    p_user_id INTEGER,
+    p_event TEXT,
+    p_entity_id INTEGER
+) RETURNS VOID AS $$
+BEGIN
+    IF p_user_id IS NULL THEN
+        RETURN;
+    END IF;
+    PERFORM pg_notify('portal_events', json_build_object(
+        'user_id', p_user_id,
+        'event', p_event,
+        'id', p_entity_id
+    )::text);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.notifications_push_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM t_p35759334_music_label_portal.notify_portal_event(NEW.user_id, 'notification', NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.messages_push_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM t_p35759334_music_label_portal.notify_portal_event(NEW.receiver_id, 'message', NEW.id);
+    IF TG_OP = 'UPDATE' THEN
+        -- Отправитель видит, что сообщение прочитано
+        PERFORM t_p35759334_music_label_portal.notify_portal_event(NEW.sender_id, 'message_read', NEW.id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.tickets_push_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM t_p35759334_music_label_portal.notify_portal_event(NEW.created_by, 'ticket', NEW.id);
+    IF NEW.assigned_to IS DISTINCT FROM NEW.created_by THEN
+        PERFORM t_p35759334_music_label_portal.notify_portal_event(NEW.assigned_to, 'ticket', NEW.id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Счётчики (V0046) отправляются целиком: бейджи обновляются без запроса к unread-counts
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.user_counters_push_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('portal_events', json_build_object(
+        'user_id', NEW.user_id,
+        'event', 'counters',
+        'counts', json_build_object(
+            'tickets', NEW.tickets,
+            'tasks', NEW.tasks,
+            'messages', NEW.messages,
+            'submissions', NEW.submissions
+        )
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notifications_push ON t_p35759334_music_label_portal.notifications;
+CREATE TRIGGER trg_notifications_push
+    AFTER INSERT ON t_p35759334_music_label_portal.notifications
+    FOR EACH ROW EXECUTE FUNCTION t_p35759334_music_label_portal.notifications_push_trg();
+
+DROP TRIGGER IF EXISTS trg_messages_push ON t_p35759334_music_label_portal.messages;
+CREATE TRIGGER trg_messages_push
+    AFTER INSERT OR UPDATE OF is_read ON t_p35759334_music_label_portal.messages
+    FOR EACH ROW EXECUTE FUNCTION t_p35759334_music_label_portal.messages_push_trg();
+
+DROP TRIGGER IF EXISTS trg_tickets_push ON t_p35759334_music_label_portal.tickets;
+CREATE TRIGGER trg_tickets_push
+    AFTER INSERT OR UPDATE OF status, assigned_to ON t_p35759334_music_label_portal.tickets
+    FOR EACH ROW EXECUTE FUNCTION t_p35759334_music_label_portal.tickets_push_trg();
+
+DROP TRIGGER IF EXISTS trg_user_counters_push ON t_p35759334_music_label_portal.user_counters;
+CREATE TRIGGER trg_user_counters_push
+    AFTER UPDATE ON t_p35759334_music_label_portal.user_counters
+    FOR EACH ROW
+    WHEN (OLD.tickets, OLD.tasks, OLD.messages, OLD.submissions)
+         IS DISTINCT FROM (NEW.tickets, NEW.tasks, NEW.messages, NEW.submissions)
+    EXECUTE FUNCTION t_p35759334_music_label_portal.user_counters_push_trg();
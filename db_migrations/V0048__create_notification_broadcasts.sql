@@ -0,0 +1,21 @@
+-- Очередь рассылок уведомлений для больших аудиторий (create-notification с async: true)
+-- Рассылка сохраняется сразу, а вставка строк в notifications выполняется одним INSERT ... SELECT при обработке очереди
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.notification_broadcasts (
+    id SERIAL PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    type VARCHAR(50) DEFAULT 'info',
+    related_entity_type VARCHAR(50),
+    related_entity_id INTEGER,
+    user_ids INTEGER[] NOT NULL DEFAULT '{}',
+    roles VARCHAR(50)[] NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    recipients_count INTEGER,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_notification_broadcasts_pending ON t_p35759334_music_label_portal.notification_broadcasts(created_at) WHERE status = 'pending';
+
+COMMENT ON TABLE t_p35759334_music_label_portal.notification_broadcasts IS 'Отложенные рассылки уведомлений: получатели по user_ids и ролям, статус pending/done/failed';
@@ -0,0 +1,74 @@
+-- Помесячное секционирование notifications и сводки (дайджесты) по старым прочитанным уведомлениям
+-- data-retention сворачивает прочитанные уведомления старше N дней в notification_digests,
+-- а секции старше срока хранения выгружает в архив, как и для messages (V0045)
+
+CREATE TABLE t_p35759334_music_label_portal.notifications_partitioned (
+    id INTEGER NOT NULL DEFAULT nextval('t_p35759334_music_label_portal.notifications_id_seq'),
+    user_id INTEGER NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    type VARCHAR(50) DEFAULT 'info',
+    read BOOLEAN DEFAULT FALSE,
+    related_entity_type VARCHAR(50),
+    related_entity_id INTEGER,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+SELECT t_p35759334_music_label_portal.create_monthly_partitions(
+    'notifications_partitioned',
+    COALESCE((SELECT MIN(created_at)::DATE FROM t_p35759334_music_label_portal.notifications), CURRENT_DATE),
+    (CURRENT_DATE + INTERVAL '3 months')::DATE
+);
+
+INSERT INTO t_p35759334_music_label_portal.notifications_partitioned
+    (id, user_id, title, message, type, read, related_entity_type, related_entity_id, created_at)
+SELECT id, user_id, title, message, type, read, related_entity_type, related_entity_id, COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM t_p35759334_music_label_portal.notifications;
+
+ALTER SEQUENCE t_p35759334_music_label_portal.notifications_id_seq OWNED BY NONE;
+DROP TABLE t_p35759334_music_label_portal.notifications;
+ALTER TABLE t_p35759334_music_label_portal.notifications_partitioned RENAME TO notifications;
+ALTER TABLE t_p35759334_music_label_portal.notifications RENAME CONSTRAINT notifications_partitioned_pkey TO notifications_pkey;
+ALTER SEQUENCE t_p35759334_music_label_portal.notifications_id_seq OWNED BY t_p35759334_music_label_portal.notifications.id;
+
+DO $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 't_p35759334_music_label_portal.notifications'::regclass
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE t_p35759334_music_label_portal.%I RENAME TO %I',
+            part.relname, replace(part.relname, 'notifications_partitioned_', 'notifications_')
+        );
+    END LOOP;
+END;
+$$;
+
+-- Лента пользователя и частичный индекс непрочитанных; в каждой секции они остаются маленькими
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON t_p35759334_music_label_portal.notifications(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON t_p35759334_music_label_portal.notifications(user_id) WHERE read = FALSE;
+
+-- Триггер push-шлюза (V0047) пропал вместе со старой таблицей
+CREATE TRIGGER trg_notifications_push
+    AFTER INSERT ON t_p35759334_music_label_portal.notifications
+    FOR EACH ROW EXECUTE FUNCTION t_p35759334_music_label_portal.notifications_push_trg();
+
+-- Сводка свёрнутых уведомлений: одна строка на пользователя и месяц, количество по типам
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.notification_digests (
+    user_id INTEGER NOT NULL,
+    month DATE NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    counts_by_type JSONB NOT NULL DEFAULT '{}'::jsonb,
+    last_notification_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, month)
+);
+
+COMMENT ON TABLE t_p35759334_music_label_portal.notifications IS 'Уведомления (помесячные секции notifications_pYYYY_MM по created_at)';
+COMMENT ON TABLE t_p35759334_music_label_portal.notification_digests IS 'Свёрнутые прочитанные уведомления старше срока хранения: количество по типам за месяц';
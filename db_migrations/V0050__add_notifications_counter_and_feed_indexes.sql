@@ -0,0 +1,138 @@
+-- Счётчик непрочитанных уведомлений в user_counters и индексы для постраничной ленты уведомлений
+ALTER TABLE t_p35759334_music_label_portal.user_counters
+ADD COLUMN IF NOT EXISTS notifications INTEGER NOT NULL DEFAULT 0;
+
+-- refresh_user_counters (V0046) дополняется подсчётом непрочитанных уведомлений
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.refresh_user_counters(p_user_id INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    user_role TEXT;
+    c_tickets INTEGER := 0;
+    c_tasks INTEGER := 0;
+    c_messages INTEGER := 0;
+    c_submissions INTEGER := 0;
+    c_notifications INTEGER := 0;
+BEGIN
+    IF p_user_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    SELECT role INTO user_role FROM t_p35759334_music_label_portal.users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO t_p35759334_music_label_portal.user_counters (user_id)
+    VALUES (p_user_id)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    PERFORM 1 FROM t_p35759334_music_label_portal.user_counters WHERE user_id = p_user_id FOR UPDATE;
+
+    IF user_role = 'director' THEN
+        SELECT COUNT(*) INTO c_tickets FROM t_p35759334_music_label_portal.tickets WHERE status = 'open';
+        SELECT COUNT(*) INTO c_tasks FROM t_p35759334_music_label_portal.tasks WHERE status = 'pending';
+        SELECT COUNT(*) INTO c_submissions FROM t_p35759334_music_label_portal.submissions WHERE status = 'pending';
+    ELSIF user_role = 'manager' THEN
+        SELECT COUNT(*) INTO c_tickets FROM t_p35759334_music_label_portal.tickets
+        WHERE assigned_to = p_user_id AND status != 'resolved' AND status != 'closed';
+        SELECT COUNT(*) INTO c_tasks FROM t_p35759334_music_label_portal.tasks
+        WHERE assigned_to = p_user_id AND is_read = FALSE;
+    ELSIF user_role = 'artist' THEN
+        SELECT COUNT(*) INTO c_tickets FROM t_p35759334_music_label_portal.tickets
+        WHERE created_by = p_user_id AND status != 'open';
+    END IF;
+
+    SELECT COUNT(DISTINCT sender_id) INTO c_messages FROM t_p35759334_music_label_portal.messages
+    WHERE receiver_id = p_user_id AND is_read = FALSE;
+
+    SELECT COUNT(*) INTO c_notifications FROM t_p35759334_music_label_portal.notifications
+    WHERE user_id = p_user_id AND read = FALSE;
+
+    UPDATE t_p35759334_music_label_portal.user_counters
+    SET tickets = c_tickets,
+        tasks = c_tasks,
+        messages = c_messages,
+        submissions = c_submissions,
+        notifications = c_notifications,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE user_id = p_user_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Уведомления создаются массово (рассылки), поэтому счётчик ведётся приращениями, а не пересчётом
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.notifications_counters_trg()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta INTEGER := 0;
+    target_user INTEGER;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        target_user := NEW.user_id;
+        delta := CASE WHEN COALESCE(NEW.read, FALSE) THEN 0 ELSE 1 END;
+    ELSIF TG_OP = 'DELETE' THEN
+        target_user := OLD.user_id;
+        delta := CASE WHEN COALESCE(OLD.read, FALSE) THEN 0 ELSE -1 END;
+    ELSE
+        target_user := NEW.user_id;
+        delta := (CASE WHEN COALESCE(NEW.read, FALSE) THEN 0 ELSE 1 END)
+               - (CASE WHEN COALESCE(OLD.read, FALSE) THEN 0 ELSE 1 END);
+    END IF;
+
+    IF delta != 0 THEN
+        UPDATE t_p35759334_music_label_portal.user_counters
+        SET notifications = GREATEST(notifications + delta, 0),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = target_user;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notifications_counters ON t_p35759334_music_label_portal.notifications;
+CREATE TRIGGER trg_notifications_counters
+    AFTER INSERT OR DELETE OR UPDATE OF read ON t_p35759334_music_label_portal.notifications
+    FOR EACH ROW EXECUTE FUNCTION t_p35759334_music_label_portal.notifications_counters_trg();
+
+-- Счётчики отправляются в push-шлюз вместе с уведомлениями (V0047)
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.user_counters_push_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('portal_events', json_build_object(
+        'user_id', NEW.user_id,
+        'event', 'counters',
+        'counts', json_build_object(
+            'tickets', NEW.tickets,
+            'tasks', NEW.tasks,
+            'messages', NEW.messages,
+            'submissions', NEW.submissions,
+            'notifications', NEW.notifications
+        )
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_user_counters_push ON t_p35759334_music_label_portal.user_counters;
+CREATE TRIGGER trg_user_counters_push
+    AFTER UPDATE ON t_p35759334_music_label_portal.user_counters
+    FOR EACH ROW
+    WHEN (OLD.tickets, OLD.tasks, OLD.messages, OLD.submissions, OLD.notifications)
+         IS DISTINCT FROM (NEW.tickets, NEW.tasks, NEW.messages, NEW.submissions, NEW.notifications)
+    EXECUTE FUNCTION t_p35759334_music_label_portal.user_counters_push_trg();
+
+-- Лента: курсор (created_at, id) по убыванию; отдельный частичный индекс для unread_only
+DROP INDEX IF EXISTS t_p35759334_music_label_portal.idx_notifications_user_created;
+DROP INDEX IF EXISTS t_p35759334_music_label_portal.idx_notifications_user_unread;
+CREATE INDEX IF NOT EXISTS idx_notifications_user_feed ON t_p35759334_music_label_portal.notifications(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON t_p35759334_music_label_portal.notifications(user_id, created_at DESC, id DESC) WHERE read = FALSE;
+
+-- Начальное заполнение счётчика
+UPDATE t_p35759334_music_label_portal.user_counters c
+SET notifications = n.cnt
+FROM (
+    SELECT user_id, COUNT(*) AS cnt
+    FROM t_p35759334_music_label_portal.notifications
+    WHERE read = FALSE
+    GROUP BY user_id
+) n
+WHERE c.user_id = n.user_id;
@@ -0,0 +1,39 @@
+-- Строки отчётов в отдельной узкой таблице вместо JSONB-массива на каждого исполнителя
+-- upload-reports загружает их через COPY; статистика файла хранится в колонках artist_report_files
+
+-- Порядок колонок исходного файла: raw_values в report_rows выровнены по нему
+ALTER TABLE t_p35759334_music_label_portal.uploaded_reports
+ADD COLUMN IF NOT EXISTS headers TEXT[];
+
+-- data остаётся только у файлов, загруженных до перехода на report_rows
+ALTER TABLE t_p35759334_music_label_portal.artist_report_files
+ALTER COLUMN data DROP NOT NULL;
+
+ALTER TABLE t_p35759334_music_label_portal.artist_report_files
+ADD COLUMN IF NOT EXISTS rows_count INTEGER NOT NULL DEFAULT 0,
+ADD COLUMN IF NOT EXISTS total_quantity BIGINT NOT NULL DEFAULT 0,
+ADD COLUMN IF NOT EXISTS total_revenue NUMERIC(18, 6) NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.report_rows (
+    report_file_id INTEGER NOT NULL REFERENCES t_p35759334_music_label_portal.artist_report_files(id) ON DELETE CASCADE,
+    row_num INTEGER NOT NULL,
+    track TEXT,
+    album TEXT,
+    platform TEXT,
+    territory TEXT,
+    period TEXT,
+    quantity BIGINT,
+    revenue NUMERIC(18, 6),
+    raw_values TEXT[] NOT NULL,
+    PRIMARY KEY (report_file_id, row_num)
+);
+
+-- Количество строк старых файлов считается один раз здесь, а не в каждом списке
+UPDATE t_p35759334_music_label_portal.artist_report_files
+SET rows_count = jsonb_array_length(data)
+WHERE data IS NOT NULL AND jsonb_typeof(data) = 'array';
+
+COMMENT ON TABLE t_p35759334_music_label_portal.report_rows IS 'Строки отчётов дистрибьюторов по файлам исполнителей (artist_report_files)';
+COMMENT ON COLUMN t_p35759334_music_label_portal.report_rows.row_num IS 'Номер строки в исходном файле';
+COMMENT ON COLUMN t_p35759334_music_label_portal.report_rows.raw_values IS 'Все значения строки в порядке uploaded_reports.headers';
+COMMENT ON COLUMN t_p35759334_music_label_portal.artist_report_files.data IS 'Устарело: строки файлов до V0051, новые строки лежат в report_rows';
@@ -0,0 +1,13 @@
+-- Кэш автоопределения колонок исполнителя по сигнатуре заголовков отчёта
+-- Повторные загрузки отчёта того же дистрибьютора берут колонки отсюда и не профилируют данные
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.report_header_profiles (
+    header_signature VARCHAR(40) PRIMARY KEY,
+    headers TEXT[] NOT NULL,
+    performer_columns INTEGER[] NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE t_p35759334_music_label_portal.report_header_profiles IS 'Колонки исполнителя, найденные профилированием, по sha1 заголовков отчёта';
+COMMENT ON COLUMN t_p35759334_music_label_portal.report_header_profiles.performer_columns IS 'Индексы колонок исполнителя (пустой массив — колонка не найдена)';
@@ -0,0 +1,3 @@
+-- Формат отчёта, определённый upload-reports по первым строкам файла (REPORT_FORMATS), NULL — формат не узнан
+ALTER TABLE t_p35759334_music_label_portal.uploaded_reports
+ADD COLUMN IF NOT EXISTS report_format VARCHAR(50);
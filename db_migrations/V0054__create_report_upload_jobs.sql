@@ -0,0 +1,28 @@
+-- Фоновая обработка больших отчётов: файл загружается в хранилище по presigned URL,
+-- upload-reports обрабатывает его пачками и сохраняет прогресс (processed_rows) после каждой пачки
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.report_upload_jobs (
+    id SERIAL PRIMARY KEY,
+    file_name VARCHAR(255) NOT NULL,
+    file_type VARCHAR(10) NOT NULL DEFAULT 'csv',
+    storage_key VARCHAR(500),
+    uploaded_by INTEGER NOT NULL REFERENCES t_p35759334_music_label_portal.users(id),
+    status VARCHAR(20) NOT NULL DEFAULT 'awaiting_upload',
+    uploaded_report_id INTEGER REFERENCES t_p35759334_music_label_portal.uploaded_reports(id),
+    performer_columns INTEGER[],
+    processed_rows INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    locked_until TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Очередь: только задачи, которые ещё предстоит обработать
+CREATE INDEX IF NOT EXISTS idx_report_upload_jobs_queue ON t_p35759334_music_label_portal.report_upload_jobs(created_at)
+WHERE status IN ('queued', 'processing');
+
+COMMENT ON TABLE t_p35759334_music_label_portal.report_upload_jobs IS 'Задачи фоновой загрузки отчётов: awaiting_upload -> queued -> processing -> done/failed';
+COMMENT ON COLUMN t_p35759334_music_label_portal.report_upload_jobs.processed_rows IS 'Строк загружено в report_rows на последнем checkpoint';
+COMMENT ON COLUMN t_p35759334_music_label_portal.report_upload_jobs.locked_until IS 'Аренда обработчика: после её истечения задачу подхватывает следующий вызов';
@@ -0,0 +1,25 @@
+-- Повторная загрузка того же файла отчёта возвращает существующий отчёт (по SHA-256 содержимого),
+-- а повторная загрузка за тот же период сравнивается с предыдущей: неизменившиеся файлы исполнителей
+-- не хранят копию строк и ссылаются на строки предыдущей загрузки (rows_file_id)
+ALTER TABLE t_p35759334_music_label_portal.uploaded_reports
+ADD COLUMN IF NOT EXISTS content_sha256 CHAR(64),
+ADD COLUMN IF NOT EXISTS period_from TEXT,
+ADD COLUMN IF NOT EXISTS period_to TEXT,
+ADD COLUMN IF NOT EXISTS previous_report_id INTEGER REFERENCES t_p35759334_music_label_portal.uploaded_reports(id),
+ADD COLUMN IF NOT EXISTS diff JSONB;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_uploaded_reports_content_sha256 ON t_p35759334_music_label_portal.uploaded_reports(content_sha256)
+WHERE content_sha256 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_uploaded_reports_period ON t_p35759334_music_label_portal.uploaded_reports(period_from, period_to, uploaded_at DESC);
+
+ALTER TABLE t_p35759334_music_label_portal.artist_report_files
+ADD COLUMN IF NOT EXISTS rows_fingerprint NUMERIC(20, 0) NOT NULL DEFAULT 0,
+ADD COLUMN IF NOT EXISTS rows_file_id INTEGER REFERENCES t_p35759334_music_label_portal.artist_report_files(id);
+
+ALTER TABLE t_p35759334_music_label_portal.report_upload_jobs
+ADD COLUMN IF NOT EXISTS period TEXT,
+ADD COLUMN IF NOT EXISTS duplicate BOOLEAN NOT NULL DEFAULT FALSE;
+
+COMMENT ON COLUMN t_p35759334_music_label_portal.artist_report_files.rows_fingerprint IS 'Сумма 64-битных хэшей строк файла по модулю 2^64';
+COMMENT ON COLUMN t_p35759334_music_label_portal.artist_report_files.rows_file_id IS 'Файл, чьи строки в report_rows совпадают с этим (NULL — строки лежат под собственным id)';
+COMMENT ON COLUMN t_p35759334_music_label_portal.uploaded_reports.diff IS 'Сравнение с previous_report_id: added/removed/changed/unchanged исполнители';
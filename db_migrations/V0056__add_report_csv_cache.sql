@@ -0,0 +1,5 @@
+-- Готовый CSV больших файлов исполнителей в объектном хранилище: повторное скачивание не читает строки из базы
+ALTER TABLE t_p35759334_music_label_portal.artist_report_files
+ADD COLUMN IF NOT EXISTS csv_storage_key VARCHAR(500);
+
+COMMENT ON COLUMN t_p35759334_music_label_portal.artist_report_files.csv_storage_key IS 'Ключ готового CSV в хранилище (report-csv/<id>.csv); строки файла после загрузки не меняются';
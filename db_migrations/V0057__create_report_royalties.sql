@@ -0,0 +1,107 @@
+-- Начисления по отчётам: суммы по исполнителю, треку, площадке и периоду, посчитанные один раз при загрузке
+-- gross — доход из отчёта, deduction — удержание лейбла (deduction_percent файла),
+-- net = gross - deduction, payout — доля артиста (users.revenue_share_percent), NULL пока файл не привязан к артисту
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.report_royalties (
+    id BIGSERIAL PRIMARY KEY,
+    uploaded_report_id INTEGER NOT NULL REFERENCES t_p35759334_music_label_portal.uploaded_reports(id) ON DELETE CASCADE,
+    report_file_id INTEGER NOT NULL REFERENCES t_p35759334_music_label_portal.artist_report_files(id) ON DELETE CASCADE,
+    artist_id INTEGER REFERENCES t_p35759334_music_label_portal.users(id),
+    artist_username VARCHAR(255) NOT NULL,
+    track TEXT,
+    album TEXT,
+    platform TEXT,
+    territory TEXT,
+    period TEXT,
+    plays BIGINT NOT NULL DEFAULT 0,
+    gross NUMERIC(18, 6) NOT NULL DEFAULT 0,
+    deduction NUMERIC(18, 6) NOT NULL DEFAULT 0,
+    net NUMERIC(18, 6) NOT NULL DEFAULT 0,
+    revenue_share_percent INTEGER,
+    payout NUMERIC(18, 6),
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_report_royalties_file ON t_p35759334_music_label_portal.report_royalties(report_file_id);
+CREATE INDEX IF NOT EXISTS idx_report_royalties_report ON t_p35759334_music_label_portal.report_royalties(uploaded_report_id, artist_username);
+CREATE INDEX IF NOT EXISTS idx_report_royalties_artist ON t_p35759334_music_label_portal.report_royalties(artist_id, period DESC) WHERE artist_id IS NOT NULL;
+
+-- Полный пересчёт файла из report_rows: вызывается upload-reports после загрузки отчёта
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.refresh_report_royalties(p_report_file_id INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM t_p35759334_music_label_portal.report_royalties WHERE report_file_id = p_report_file_id;
+
+    INSERT INTO t_p35759334_music_label_portal.report_royalties
+        (uploaded_report_id, report_file_id, artist_id, artist_username, track, album, platform, territory, period,
+         plays, gross, deduction, net, revenue_share_percent, payout)
+    SELECT f.uploaded_report_id, f.id, f.sent_to_artist_id, f.artist_username,
+           g.track, g.album, g.platform, g.territory, g.period,
+           g.plays, g.gross,
+           g.gross * COALESCE(f.deduction_percent, 0) / 100,
+           g.gross * (100 - COALESCE(f.deduction_percent, 0)) / 100,
+           u.revenue_share_percent,
+           g.gross * (100 - COALESCE(f.deduction_percent, 0)) / 100 * u.revenue_share_percent / 100
+    FROM t_p35759334_music_label_portal.artist_report_files f
+    CROSS JOIN LATERAL (
+        SELECT track, album, platform, territory, period,
+               SUM(COALESCE(quantity, 0)) AS plays,
+               SUM(COALESCE(revenue, 0)) AS gross
+        FROM t_p35759334_music_label_portal.report_rows
+        WHERE report_file_id = COALESCE(f.rows_file_id, f.id)
+        GROUP BY track, album, platform, territory, period
+    ) g
+    LEFT JOIN t_p35759334_music_label_portal.users u ON u.id = f.sent_to_artist_id
+    WHERE f.id = p_report_file_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Удержание и привязка к артисту меняют только суммы: строки отчёта заново не читаются
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.report_files_royalties_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE t_p35759334_music_label_portal.report_royalties rr
+    SET artist_id = NEW.sent_to_artist_id,
+        deduction = rr.gross * COALESCE(NEW.deduction_percent, 0) / 100,
+        net = rr.gross * (100 - COALESCE(NEW.deduction_percent, 0)) / 100,
+        revenue_share_percent = u.revenue_share_percent,
+        payout = rr.gross * (100 - COALESCE(NEW.deduction_percent, 0)) / 100 * u.revenue_share_percent / 100,
+        computed_at = CURRENT_TIMESTAMP
+    FROM (SELECT NEW.sent_to_artist_id AS artist_id) a
+    LEFT JOIN t_p35759334_music_label_portal.users u ON u.id = a.artist_id
+    WHERE rr.report_file_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_report_files_royalties ON t_p35759334_music_label_portal.artist_report_files;
+CREATE TRIGGER trg_report_files_royalties
+    AFTER UPDATE OF deduction_percent, sent_to_artist_id ON t_p35759334_music_label_portal.artist_report_files
+    FOR EACH ROW
+    WHEN (OLD.deduction_percent IS DISTINCT FROM NEW.deduction_percent OR OLD.sent_to_artist_id IS DISTINCT FROM NEW.sent_to_artist_id)
+    EXECUTE FUNCTION t_p35759334_music_label_portal.report_files_royalties_trg();
+
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.users_royalties_trg()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE t_p35759334_music_label_portal.report_royalties
+    SET revenue_share_percent = NEW.revenue_share_percent,
+        payout = net * NEW.revenue_share_percent / 100,
+        computed_at = CURRENT_TIMESTAMP
+    WHERE artist_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_royalties ON t_p35759334_music_label_portal.users;
+CREATE TRIGGER trg_users_royalties
+    AFTER UPDATE OF revenue_share_percent ON t_p35759334_music_label_portal.users
+    FOR EACH ROW
+    WHEN (OLD.revenue_share_percent IS DISTINCT FROM NEW.revenue_share_percent)
+    EXECUTE FUNCTION t_p35759334_music_label_portal.users_royalties_trg();
+
+-- Начисления по уже загруженным файлам (файлы до V0051 со строками в JSONB не считаются)
+SELECT t_p35759334_music_label_portal.refresh_report_royalties(id)
+FROM t_p35759334_music_label_portal.artist_report_files
+WHERE data IS NULL;
+
+COMMENT ON TABLE t_p35759334_music_label_portal.report_royalties IS 'Начисления по файлам отчётов: трек x площадка x период, пересчитываются триггерами при смене удержания, артиста и его доли';
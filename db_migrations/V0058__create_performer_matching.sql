@@ -0,0 +1,44 @@
+-- Автоматическая привязка файлов исполнителей к пользователям: триграммный поиск по именам артистов
+-- и словарь псевдонимов, который пополняется при ручной привязке (PATCH в upload-reports)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Одна нормализация для индекса, псевдонимов и запросов: нижний регистр, одиночные пробелы
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.normalize_performer(p_name TEXT)
+RETURNS TEXT AS $$
+    SELECT lower(regexp_replace(btrim(p_name), '\s+', ' ', 'g'));
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm ON t_p35759334_music_label_portal.users
+USING gin (t_p35759334_music_label_portal.normalize_performer(full_name) gin_trgm_ops)
+WHERE role = 'artist';
+
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm ON t_p35759334_music_label_portal.users
+USING gin (t_p35759334_music_label_portal.normalize_performer(username) gin_trgm_ops)
+WHERE role = 'artist';
+
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.performer_aliases (
+    alias TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES t_p35759334_music_label_portal.users(id) ON DELETE CASCADE,
+    links_count INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Псевдонимы из уже сделанных ручных привязок
+INSERT INTO t_p35759334_music_label_portal.performer_aliases (alias, user_id, links_count)
+SELECT DISTINCT ON (t_p35759334_music_label_portal.normalize_performer(artist_username))
+       t_p35759334_music_label_portal.normalize_performer(artist_username), sent_to_artist_id, COUNT(*) OVER w
+FROM t_p35759334_music_label_portal.artist_report_files
+WHERE sent_to_artist_id IS NOT NULL
+WINDOW w AS (PARTITION BY t_p35759334_music_label_portal.normalize_performer(artist_username), sent_to_artist_id)
+ORDER BY t_p35759334_music_label_portal.normalize_performer(artist_username), COUNT(*) OVER w DESC, MAX(created_at) OVER w DESC
+ON CONFLICT (alias) DO NOTHING;
+
+-- Лучший найденный пользователь для файла; sent_to_artist_id ставится автоматически только при уверенном совпадении
+ALTER TABLE t_p35759334_music_label_portal.artist_report_files
+ADD COLUMN IF NOT EXISTS match_user_id INTEGER REFERENCES t_p35759334_music_label_portal.users(id),
+ADD COLUMN IF NOT EXISTS match_score REAL,
+ADD COLUMN IF NOT EXISTS match_method VARCHAR(20);
+
+COMMENT ON TABLE t_p35759334_music_label_portal.performer_aliases IS 'Нормализованное имя исполнителя из отчётов -> пользователь (по ручным привязкам)';
+COMMENT ON COLUMN t_p35759334_music_label_portal.artist_report_files.match_method IS 'alias — по псевдониму, name — по имени целиком, collaboration — по одному из участников "A & B"';
@@ -0,0 +1,19 @@
+-- Постраничный список файлов исполнителей (upload-reports GET) по курсору
+-- Внутри отчёта: порядок (artist_username, id); artist_full_name в индексе — список исполнителей
+-- отчёта читается index-only scan вместо DISTINCT по таблице с блоками данных
+CREATE INDEX IF NOT EXISTS idx_artist_report_files_report_performer
+ON t_p35759334_music_label_portal.artist_report_files(uploaded_report_id, artist_username, id)
+INCLUDE (artist_full_name);
+
+-- Все отчёты, фильтр по исполнителю: от новых файлов к старым
+CREATE INDEX IF NOT EXISTS idx_artist_report_files_artist_id
+ON t_p35759334_music_label_portal.artist_report_files(artist_username, id DESC);
+
+-- Очередь неотправленных файлов (sent=0)
+CREATE INDEX IF NOT EXISTS idx_artist_report_files_unsent
+ON t_p35759334_music_label_portal.artist_report_files(id DESC)
+WHERE sent_to_artist_id IS NULL;
+
+-- Перекрываются новыми индексами
+DROP INDEX IF EXISTS t_p35759334_music_label_portal.idx_artist_report_files_uploaded_report;
+DROP INDEX IF EXISTS t_p35759334_music_label_portal.idx_artist_report_files_artist;
@@ -0,0 +1,12 @@
+-- Запросы кабинета артиста к строкам отчётов (upload-reports GET ?rows=1)
+-- Файлы артиста, при необходимости в пределах одной загрузки
+CREATE INDEX IF NOT EXISTS idx_artist_report_files_sent_report
+ON t_p35759334_music_label_portal.artist_report_files(sent_to_artist_id, uploaded_report_id)
+WHERE sent_to_artist_id IS NOT NULL;
+
+DROP INDEX IF EXISTS t_p35759334_music_label_portal.idx_artist_report_files_sent;
+
+-- Фильтры и группировки по площадке, стране и периоду внутри файла без чтения raw_values
+CREATE INDEX IF NOT EXISTS idx_report_rows_file_dimensions
+ON t_p35759334_music_label_portal.report_rows(report_file_id, platform, territory, period)
+INCLUDE (quantity, revenue);
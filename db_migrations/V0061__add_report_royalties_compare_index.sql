@@ -0,0 +1,6 @@
+-- Сравнение загрузок для артиста (upload-reports GET ?compare_to=): суммы по трекам читаются из индекса,
+-- предыдущая загрузка артиста находится по нему же
+CREATE INDEX IF NOT EXISTS idx_report_royalties_artist_upload
+ON t_p35759334_music_label_portal.report_royalties(artist_id, uploaded_report_id)
+INCLUDE (track, album, plays, net)
+WHERE artist_id IS NOT NULL;
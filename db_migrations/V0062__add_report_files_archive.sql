@@ -0,0 +1,13 @@
+-- Архивация старых отчётов: строки файла (report_rows или устаревший data) переносятся в сжатый
+-- колоночный архив в хранилище, в базе остаются файл, его статистика и начисления (report_royalties)
+ALTER TABLE t_p35759334_music_label_portal.artist_report_files
+ADD COLUMN IF NOT EXISTS archive_key TEXT,
+ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP,
+ADD COLUMN IF NOT EXISTS archive_bytes BIGINT;
+
+-- Поиск следующего файла для архивации: только ещё не архивированные владельцы строк
+CREATE INDEX IF NOT EXISTS idx_artist_report_files_archive_pending
+ON t_p35759334_music_label_portal.artist_report_files(uploaded_report_id, id)
+WHERE archive_key IS NULL AND rows_file_id IS NULL;
+
+COMMENT ON COLUMN t_p35759334_music_label_portal.artist_report_files.archive_key IS 'Ключ архива строк в хранилище (report-archive/<id>.json.xz); NULL — строки в базе';
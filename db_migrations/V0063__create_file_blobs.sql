@@ -0,0 +1,24 @@
+-- Загрузки через upload-direct хранятся по адресу содержимого: один объект в S3 на каждый уникальный sha256
+-- (blobs/<sha[:2]>/<sha256>.<ext>), повторная загрузка того же файла только добавляет ссылку
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.file_blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    s3_key TEXT NOT NULL,
+    size BIGINT NOT NULL,
+    content_type VARCHAR(255),
+    refs_count INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_referenced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Логические файлы (каждая загрузка с её именем) -> блоб
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.file_refs (
+    id BIGSERIAL PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL REFERENCES t_p35759334_music_label_portal.file_blobs(sha256),
+    file_name TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_file_refs_sha256 ON t_p35759334_music_label_portal.file_refs(sha256);
+
+COMMENT ON TABLE t_p35759334_music_label_portal.file_blobs IS 'Уникальное содержимое загруженных файлов в S3 (адрес по sha256)';
+COMMENT ON TABLE t_p35759334_music_label_portal.file_refs IS 'Загрузки файлов: имя, под которым файл загружен, и его содержимое в file_blobs';
@@ -0,0 +1,13 @@
+-- Уникальность content_sha256 — только у готовых отчётов: недогруженный отчёт (задача упала или ещё
+-- идёт) не выдаётся за дубликат и не мешает загрузить тот же файл снова
+DROP INDEX IF EXISTS t_p35759334_music_label_portal.idx_uploaded_reports_content_sha256;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_uploaded_reports_content_sha256_processed
+ON t_p35759334_music_label_portal.uploaded_reports(content_sha256)
+WHERE content_sha256 IS NOT NULL AND processed = TRUE;
+
+-- Отчёты задач, исчерпавших попытки, освобождают хэш
+UPDATE t_p35759334_music_label_portal.uploaded_reports ur
+SET content_sha256 = NULL
+FROM t_p35759334_music_label_portal.report_upload_jobs j
+WHERE j.uploaded_report_id = ur.id AND j.status = 'failed' AND ur.processed = FALSE;
@@ -0,0 +1,76 @@
+-- DEFAULT-секции для messages и notifications: если data-retention перестанет заранее создавать
+-- помесячные секции, вставки попадут сюда, а не упадут с ошибкой "no partition found for row"
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.messages_default
+PARTITION OF t_p35759334_music_label_portal.messages DEFAULT;
+
+CREATE TABLE IF NOT EXISTS t_p35759334_music_label_portal.notifications_default
+PARTITION OF t_p35759334_music_label_portal.notifications DEFAULT;
+
+-- Секцию нельзя создать, пока в DEFAULT-секции лежат строки её диапазона. Поэтому месяц, для которого
+-- такие строки есть, собирается в отдельной таблице и присоединяется через ATTACH PARTITION: строки не
+-- вставляются в родителя повторно и push-триггеры не срабатывают второй раз. DELETE из DEFAULT-секции
+-- уменьшил user_counters, поэтому счётчики после переноса пересчитываются.
+CREATE OR REPLACE FUNCTION t_p35759334_music_label_portal.create_monthly_partitions(
+    p_table TEXT,
+    p_from DATE,
+    p_to DATE
+) RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_from)::DATE;
+    month_end DATE;
+    partition_name TEXT;
+    default_name TEXT := p_table || '_default';
+    has_default BOOLEAN := to_regclass('t_p35759334_music_label_portal.' || p_table || '_default') IS NOT NULL;
+    has_default_rows BOOLEAN;
+    moved_total INTEGER := 0;
+    moved INTEGER;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= p_to LOOP
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        partition_name := p_table || '_p' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass('t_p35759334_music_label_portal.' || partition_name) IS NULL THEN
+            has_default_rows := FALSE;
+            IF has_default THEN
+                EXECUTE format(
+                    'SELECT EXISTS (SELECT 1 FROM t_p35759334_music_label_portal.%I WHERE created_at >= %L AND created_at < %L)',
+                    default_name, month_start, month_end
+                ) INTO has_default_rows;
+            END IF;
+
+            IF has_default_rows THEN
+                EXECUTE format(
+                    'CREATE TABLE t_p35759334_music_label_portal.%I (LIKE t_p35759334_music_label_portal.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    partition_name, p_table
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM t_p35759334_music_label_portal.%I WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                    'INSERT INTO t_p35759334_music_label_portal.%I SELECT * FROM moved',
+                    default_name, month_start, month_end, partition_name
+                );
+                GET DIAGNOSTICS moved = ROW_COUNT;
+                moved_total := moved_total + moved;
+                EXECUTE format(
+                    'ALTER TABLE t_p35759334_music_label_portal.%I ATTACH PARTITION t_p35759334_music_label_portal.%I FOR VALUES FROM (%L) TO (%L)',
+                    p_table, partition_name, month_start, month_end
+                );
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE t_p35759334_music_label_portal.%I PARTITION OF t_p35759334_music_label_portal.%I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, p_table, month_start, month_end
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+
+    IF moved_total > 0 THEN
+        PERFORM t_p35759334_music_label_portal.refresh_user_counters(user_id)
+        FROM t_p35759334_music_label_portal.user_counters
+        ORDER BY user_id;
+    END IF;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,14 @@
+-- Асинхронные рассылки create-notification убраны: очередь разбирал только таймер, которого нет.
+-- Рассылка идёт одним INSERT ... SELECT прямо в запросе, поэтому очередь не нужна.
+-- Оставшиеся в очереди рассылки доставляются здесь же тем же INSERT ... SELECT, затем таблица удаляется.
+INSERT INTO t_p35759334_music_label_portal.notifications
+    (user_id, title, message, type, related_entity_type, related_entity_id)
+SELECT u.id, b.title, b.message, b.type, b.related_entity_type, b.related_entity_id
+FROM t_p35759334_music_label_portal.notification_broadcasts b
+JOIN t_p35759334_music_label_portal.users u
+  ON u.id = ANY(b.user_ids)
+  OR (u.role = ANY(b.roles) AND COALESCE(u.is_blocked, FALSE) = FALSE)
+WHERE b.status = 'pending'
+ORDER BY b.created_at, u.id;
+
+DROP TABLE IF EXISTS t_p35759334_music_label_portal.notification_broadcasts;
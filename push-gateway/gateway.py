@@ -0,0 +1,245 @@
+'''
+Business: Push-шлюз: слушает канал portal_events в PostgreSQL и рассылает события клиентам через Server-Sent Events
+Args: переменные окружения DATABASE_URL, PUSH_GATEWAY_PORT, PUSH_GATEWAY_SOURCE (postgres | memory)
+Returns: долгоживущий HTTP-сервер: GET /events (заголовок X-User-Id), GET /health, POST /publish (только memory)
+
+Это отдельный процесс, а не облачная функция: SSE-соединение живёт дольше таймаута функции.
+События в канал публикуют триггеры из миграции V0047 (уведомления, сообщения, тикеты, счётчики).
+
+Запуск:       DATABASE_URL=... python push-gateway/gateway.py
+Локально/тесты: PUSH_GATEWAY_SOURCE=memory python push-gateway/gateway.py
+              события подаются через POST /publish с JSON-телом {"user_id": 1, "event": "notification"}
+Клиент:       fetch(`${PUSH_GATEWAY_URL}/events`, { headers: { 'X-User-Id': '42' } }) с чтением потока.
+              Пользователь берётся только из X-User-Id, как в HTTP-функциях; user_id в адресе не принимается,
+              поэтому встроенный EventSource (он не умеет слать заголовки) не подходит.
+'''
+
+import asyncio
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Any, Set, AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+CHANNEL = 'portal_events'
+HEARTBEAT_SECONDS = 25
+RECONNECT_SECONDS = 5
+CLIENT_QUEUE_SIZE = 100
+
+CORS_HEADERS = (
+    'Access-Control-Allow-Origin: *\r\n'
+    'Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n'
+    'Access-Control-Allow-Headers: Content-Type, Last-Event-ID, X-User-Id\r\n'
+)
+
+class PostgresEventSource:
+    '''События из LISTEN portal_events; соединение psycopg2 обслуживается в цикле asyncio'''
+
+    def __init__(self, dsn: str, channel: str = CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cur = conn.cursor()
+        cur.execute(f'LISTEN {self.channel}')
+
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        loop.add_reader(conn.fileno(), readable.set)
+
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        yield json.loads(notify.payload)
+                    except ValueError:
+                        print(f"Skipping malformed payload: {notify.payload[:200]}")
+        finally:
+            loop.remove_reader(conn.fileno())
+            cur.close()
+            conn.close()
+
+class MemoryEventSource:
+    '''Локальная замена PostgreSQL для разработки и тестов: события подаются через publish()'''
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.queue.put_nowait(event)
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            yield await self.queue.get()
+
+class Hub:
+    '''Раздаёт события очередям подключённых клиентов по user_id'''
+
+    def __init__(self):
+        self.subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        self.subscribers[user_id].discard(queue)
+        if not self.subscribers[user_id]:
+            del self.subscribers[user_id]
+
+    def client_count(self) -> int:
+        return sum(len(queues) for queues in self.subscribers.values())
+
+    def publish(self, event: Dict[str, Any]) -> int:
+        try:
+            user_id = int(event.get('user_id'))
+        except (TypeError, ValueError):
+            return 0
+
+        delivered = 0
+        for queue in list(self.subscribers.get(user_id, ())):
+            if queue.full():
+                # Медленный клиент: выбрасываем самое старое событие, счётчики всё равно придут свежие
+                queue.get_nowait()
+            queue.put_nowait(event)
+            delivered += 1
+        return delivered
+
+    async def run(self, source) -> None:
+        while True:
+            try:
+                async for event in source.events():
+                    self.publish(event)
+            except Exception as e:
+                print(f"Event source error: {e}, reconnecting in {RECONNECT_SECONDS}s")
+                await asyncio.sleep(RECONNECT_SECONDS)
+
+class Gateway:
+    def __init__(self, hub: Hub, source):
+        self.hub = hub
+        self.source = source
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode('latin-1').strip()
+            if not request_line:
+                return
+            method, target, _ = request_line.split(' ', 2)
+
+            headers: Dict[str, str] = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1')
+                if line in ('\r\n', '\n', ''):
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            url = urlsplit(target)
+
+            if method == 'OPTIONS':
+                await self.respond(writer, 200, '')
+            elif method == 'GET' and url.path == '/events':
+                await self.stream_events(writer, headers)
+            elif method == 'GET' and url.path == '/health':
+                await self.respond(writer, 200, json.dumps({'status': 'ok', 'clients': self.hub.client_count()}))
+            elif method == 'POST' and url.path == '/publish' and isinstance(self.source, MemoryEventSource):
+                length = int(headers.get('content-length', '0'))
+                event = json.loads((await reader.readexactly(length)).decode('utf-8') or '{}')
+                self.source.publish(event)
+                await self.respond(writer, 202, json.dumps({'status': 'queued'}))
+            else:
+                await self.respond(writer, 404, json.dumps({'error': 'Not found'}))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"Request error: {e}")
+        finally:
+            writer.close()
+
+    async def stream_events(self, writer: asyncio.StreamWriter, headers: Dict[str, str]) -> None:
+        user_id = self.parse_user_id(headers)
+        if user_id is None:
+            await self.respond(writer, 401, json.dumps({'error': 'X-User-Id required'}))
+            return
+
+        writer.write((
+            'HTTP/1.1 200 OK\r\n'
+            'Content-Type: text/event-stream\r\n'
+            'Cache-Control: no-cache\r\n'
+            'Connection: keep-alive\r\n'
+            'X-Accel-Buffering: no\r\n'
+            f'{CORS_HEADERS}'
+            '\r\n'
+            f'retry: {RECONNECT_SECONDS * 1000}\n\n'
+        ).encode('utf-8'))
+        await writer.drain()
+
+        queue = self.hub.subscribe(user_id)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Комментарий держит соединение открытым через прокси
+                    writer.write(b': ping\n\n')
+                else:
+                    writer.write(format_sse(event))
+                await writer.drain()
+        finally:
+            self.hub.unsubscribe(user_id, queue)
+
+    @staticmethod
+    def parse_user_id(headers: Dict[str, str]) -> Optional[int]:
+        '''Пользователь из заголовка X-User-Id (имена заголовков уже в нижнем регистре); None — нет или не число'''
+        try:
+            return int(headers.get('x-user-id', ''))
+        except ValueError:
+            return None
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, status: int, body: str) -> None:
+        payload = body.encode('utf-8')
+        reason = {200: 'OK', 202: 'Accepted', 401: 'Unauthorized', 404: 'Not Found'}.get(status, 'OK')
+        writer.write((
+            f'HTTP/1.1 {status} {reason}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(payload)}\r\n'
+            'Connection: close\r\n'
+            f'{CORS_HEADERS}'
+            '\r\n'
+        ).encode('utf-8') + payload)
+        await writer.drain()
+
+def format_sse(event: Dict[str, Any]) -> bytes:
+    name = event.get('event', 'message')
+    return f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8')
+
+def create_source():
+    if os.environ.get('PUSH_GATEWAY_SOURCE', 'postgres') == 'memory':
+        return MemoryEventSource()
+    return PostgresEventSource(os.environ['DATABASE_URL'])
+
+async def main() -> None:
+    port = int(os.environ.get('PUSH_GATEWAY_PORT', '8090'))
+    source = create_source()
+    hub = Hub()
+    gateway = Gateway(hub, source)
+
+    server = await asyncio.start_server(gateway.handle, host='0.0.0.0', port=port)
+    print(f"Push gateway listening on :{port} ({type(source).__name__})")
+
+    async with server:
+        await asyncio.gather(server.serve_forever(), hub.run(source))
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+'''
+Тесты push-шлюза на MemoryEventSource: поднимается настоящий сервер на свободном порту,
+клиенты подключаются к /events по TCP и читают SSE-кадры так же, как потоковый fetch в браузере.
+
+Запуск: python -m unittest discover push-gateway
+'''
+
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import gateway
+from gateway import Gateway, Hub, MemoryEventSource, format_sse
+
+READ_TIMEOUT = 2
+
+class MemoryEventSourceTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # Частый heartbeat: обработчик /events замечает закрытого клиента и отписывается сам
+        heartbeat = mock.patch.object(gateway, 'HEARTBEAT_SECONDS', 0.05)
+        heartbeat.start()
+        self.addCleanup(heartbeat.stop)
+        self.source = MemoryEventSource()
+        self.hub = Hub()
+        self.server = await asyncio.start_server(Gateway(self.hub, self.source).handle, host='127.0.0.1', port=0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.hub_task = asyncio.create_task(self.hub.run(self.source))
+        self.clients = []
+
+    async def asyncTearDown(self):
+        for writer in self.clients:
+            writer.close()
+        await asyncio.wait_for(self.wait_for_clients(0), READ_TIMEOUT)
+        self.hub_task.cancel()
+        await asyncio.gather(self.hub_task, return_exceptions=True)
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def subscribe(self, user_id: int) -> asyncio.StreamReader:
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        self.clients.append(writer)
+        writer.write(f'GET /events HTTP/1.1\r\nHost: localhost\r\nX-User-Id: {user_id}\r\n\r\n'.encode('latin-1'))
+        await writer.drain()
+
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), READ_TIMEOUT)
+        self.assertTrue(head.startswith(b'HTTP/1.1 200 OK'))
+        self.assertIn(b'Content-Type: text/event-stream', head)
+        retry = await asyncio.wait_for(reader.readuntil(b'\n\n'), READ_TIMEOUT)
+        self.assertTrue(retry.startswith(b'retry: '))
+        return reader
+
+    async def read_event(self, reader: asyncio.StreamReader, timeout: float = READ_TIMEOUT) -> bytes:
+        '''Следующий кадр события; комментарии-heartbeat (": ping") пропускаются, как в EventSource'''
+        async def next_event() -> bytes:
+            while True:
+                frame = await reader.readuntil(b'\n\n')
+                if not frame.startswith(b':'):
+                    return frame
+        return await asyncio.wait_for(next_event(), timeout)
+
+    async def wait_for_clients(self, count: int) -> None:
+        # Подписка в хабе появляется сразу после отправки заголовков ответа
+        while self.hub.client_count() != count:
+            await asyncio.sleep(0.01)
+
+    async def test_published_event_reaches_subscribed_user_only(self):
+        recipient = await self.subscribe(42)
+        other = await self.subscribe(7)
+        await asyncio.wait_for(self.wait_for_clients(2), READ_TIMEOUT)
+
+        event = {'user_id': 42, 'event': 'notification', 'title': 'Новый отчёт'}
+        self.source.publish(event)
+
+        frame = await self.read_event(recipient)
+        self.assertEqual(frame, format_sse(event))
+        self.assertEqual(frame.split(b'\n')[0], b'event: notification')
+        self.assertEqual(json.loads(frame.split(b'\n')[1][len(b'data: '):]), event)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.read_event(other, 0.2)
+
+    async def test_user_id_in_query_is_not_accepted(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(b'GET /events?user_id=42 HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), READ_TIMEOUT)
+        writer.close()
+        self.assertTrue(response.startswith(b'HTTP/1.1 401 Unauthorized'))
+        self.assertEqual(self.hub.client_count(), 0)
+
+    async def test_publish_endpoint_feeds_memory_source(self):
+        recipient = await self.subscribe(42)
+        await asyncio.wait_for(self.wait_for_clients(1), READ_TIMEOUT)
+
+        body = json.dumps({'user_id': 42, 'event': 'counters', 'unread': 3}).encode('utf-8')
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(
+            f'POST /publish HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body
+        )
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), READ_TIMEOUT)
+        writer.close()
+        self.assertTrue(response.startswith(b'HTTP/1.1 202 Accepted'))
+
+        frame = await self.read_event(recipient)
+        self.assertEqual(frame, format_sse({'user_id': 42, 'event': 'counters', 'unread': 3}))
+
+if __name__ == '__main__':
+    unittest.main()
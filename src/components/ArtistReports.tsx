@@ -47,7 +47,8 @@ export default function ArtistReports({ userId, userName }: ArtistReportsProps)
   const loadReports = async () => {
     try {
       const response = await fetch(
-        `${API_ENDPOINTS.UPLOAD_REPORTS}?artist_id=${userId}`
+        `${API_ENDPOINTS.UPLOAD_REPORTS}?artist_id=${userId}`,
+        { headers: { 'X-User-Id': String(userId) } }
       );
       const data = await response.json();
       setReports(data.reports || []);
@@ -1,55 +1,25 @@
-import { useState, useEffect } from 'react';
+import { useState } from 'react';
 import { Button } from '@/components/ui/button';
 import { Badge } from '@/components/ui/badge';
 import { Card } from '@/components/ui/card';
 import Icon from '@/components/ui/icon';
 import { useToast } from '@/hooks/use-toast';
 import { API_ENDPOINTS } from '@/config/api';
+import { useNotifications } from '@/contexts/NotificationContext';
 
 const NOTIFICATIONS_URL = API_ENDPOINTS.NOTIFICATIONS;
 
-interface Notification {
-  id: number;
-  title: string;
-  message: string;
-  type: string;
-  read: boolean;
-  created_at: string;
-  related_entity_type?: string;
-  related_entity_id?: number;
-}
-
 interface NotificationBellProps {
   userId: number;
 }
 
 export default function NotificationBell({ userId }: NotificationBellProps) {
-  const [notifications, setNotifications] = useState<Notification[]>([]);
-  const [unreadCount, setUnreadCount] = useState(0);
+  // Лента и счётчик приходят из общего опроса NotificationProvider (bootstrap), отдельного опроса нет
+  const { notifications, unreadNotifications: unreadCount, refreshCounts } = useNotifications();
   const [isOpen, setIsOpen] = useState(false);
   const [loading, setLoading] = useState(false);
   const { toast } = useToast();
 
-  useEffect(() => {
-    loadNotifications();
-    // Увеличил интервал до 60 секунд для снижения нагрузки
-    const interval = setInterval(loadNotifications, 60000);
-    return () => clearInterval(interval);
-  }, [userId]);
-
-  const loadNotifications = async () => {
-    try {
-      const response = await fetch(NOTIFICATIONS_URL, {
-        headers: { 'X-User-Id': userId.toString() }
-      });
-      const data = await response.json();
-      setNotifications(data.notifications || []);
-      setUnreadCount(data.unread_count || 0);
-    } catch (error) {
-      // Silently fail
-    }
-  };
-
   const markAsRead = async (notificationId?: number) => {
     setLoading(true);
     try {
@@ -65,7 +35,7 @@ export default function NotificationBell({ userId }: NotificationBellProps) {
             : { mark_all_read: true }
         )
       });
-      loadNotifications();
+      await refreshCounts(true);
     } catch (error) {
       toast({
         title: 'Ошибка',
@@ -26,6 +26,8 @@ interface ProcessReportsProps {
 export default function ProcessReports({ uploadedReportId, onClose }: ProcessReportsProps) {
   const [files, setFiles] = useState<ArtistFile[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedArtist, setSelectedArtist] = useState<string>('');
   const { toast } = useToast();
 
@@ -33,17 +35,20 @@ export default function ProcessReports({ uploadedReportId, onClose }: ProcessRep
     loadFiles();
   }, [uploadedReportId]);
 
-  const loadFiles = async () => {
+  const loadFiles = async (cursor?: string) => {
     try {
-      const url = uploadedReportId
-        ? `${API_ENDPOINTS.UPLOAD_REPORTS}?uploaded_report_id=${uploadedReportId}`
-        : API_ENDPOINTS.UPLOAD_REPORTS;
+      const params = new URLSearchParams();
+      if (uploadedReportId) params.set('uploaded_report_id', String(uploadedReportId));
+      if (cursor) params.set('cursor', cursor);
+      const query = params.toString();
+      const url = query ? `${API_ENDPOINTS.UPLOAD_REPORTS}?${query}` : API_ENDPOINTS.UPLOAD_REPORTS;
 
       const response = await fetch(url);
       const data = await response.json();
 
       if (data.files) {
-        setFiles(data.files);
+        setFiles(prev => (cursor ? [...prev, ...data.files] : data.files));
+        setNextCursor(data.next_cursor ?? null);
       }
     } catch (error) {
       toast({
@@ -53,9 +58,16 @@ export default function ProcessReports({ uploadedReportId, onClose }: ProcessRep
       });
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const loadMore = () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    loadFiles(nextCursor);
+  };
+
   const downloadCSV = async (file: ArtistFile) => {
     try {
       const performerName = file.artist_full_name;
@@ -182,6 +194,17 @@ export default function ProcessReports({ uploadedReportId, onClose }: ProcessRep
                   </Card>
                 ))}
               </div>
+              {nextCursor && (
+                <Button
+                  variant="ghost"
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="w-full text-yellow-400 hover:text-yellow-300"
+                >
+                  <Icon name={loadingMore ? 'Loader2' : 'ChevronDown'} size={16} className={loadingMore ? 'mr-2 animate-spin' : 'mr-2'} />
+                  Показать ещё
+                </Button>
+              )}
             </div>
           </div>
         )}
@@ -26,6 +26,7 @@ export const API_ENDPOINTS = {
   USERS: funcUrls['users'],
   TICKETS: funcUrls['tickets'],
   AUTH: funcUrls['auth'],
+  BOOTSTRAP: funcUrls['bootstrap'],
 } as const;
 
 // Оптимизированная функция для fetch с retry и timeout
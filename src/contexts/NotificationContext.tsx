@@ -8,12 +8,97 @@ interface UnreadCounts {
   submissions: number;
 }
 
+export interface PortalNotification {
+  id: number;
+  title: string;
+  message: string;
+  type: string;
+  read: boolean;
+  created_at: string;
+  related_entity_type?: string;
+  related_entity_id?: number;
+}
+
 interface NotificationContextValue {
   unreadCounts: UnreadCounts;
-  refreshCounts: () => Promise<void>;
+  notifications: PortalNotification[];
+  unreadNotifications: number;
+  refreshCounts: (force?: boolean) => Promise<void>;
   loading: boolean;
 }
 
+interface DashboardState {
+  counts: UnreadCounts;
+  notifications: PortalNotification[];
+  unreadNotifications: number;
+}
+
+// Части bootstrap, которые опрашивает дашборд; ETag каждой уходит в known=, неизменившиеся части не передаются
+const BOOTSTRAP_PARTS = ['counts', 'notifications'];
+
+async function loadFromBootstrap(
+  userId: string,
+  token: string,
+  etags: Record<string, string>,
+  previous: DashboardState
+): Promise<DashboardState | null> {
+  const known = Object.entries(etags).map(([part, etag]) => `${part}:${etag}`).join(',');
+  const params = new URLSearchParams({ parts: BOOTSTRAP_PARTS.join(',') });
+  if (known) {
+    params.set('known', known);
+  }
+
+  const response = await fetch(`${API_ENDPOINTS.BOOTSTRAP}?${params}`, {
+    headers: {
+      'X-User-Id': userId,
+      'X-Auth-Token': token
+    }
+  });
+  if (!response.ok) {
+    return null;
+  }
+
+  const data = await response.json();
+  Object.assign(etags, data.etags);
+  const notModified: string[] = data.not_modified || [];
+
+  const next = { ...previous };
+  if (!notModified.includes('counts') && data.counts) {
+    next.counts = data.counts as UnreadCounts;
+  }
+  if (!notModified.includes('notifications') && data.notifications) {
+    next.notifications = data.notifications.notifications || [];
+    next.unreadNotifications = data.notifications.unread_count || 0;
+  }
+  return next;
+}
+
+// Пока bootstrap не развёрнут (нет в func2url.json) — прежние два запроса
+async function loadFromEndpoints(userId: string, token: string, previous: DashboardState): Promise<DashboardState | null> {
+  const [countsResponse, notificationsResponse] = await Promise.all([
+    fetch(API_ENDPOINTS.UNREAD_COUNTS, {
+      headers: {
+        'X-User-Id': userId,
+        'X-Auth-Token': token
+      }
+    }),
+    fetch(API_ENDPOINTS.NOTIFICATIONS, {
+      headers: { 'X-User-Id': userId }
+    })
+  ]);
+  if (!countsResponse.ok) {
+    return null;
+  }
+
+  const next = { ...previous, counts: (await countsResponse.json()) as UnreadCounts };
+  if (notificationsResponse.ok) {
+    const data = await notificationsResponse.json();
+    next.notifications = data.notifications || [];
+    next.unreadNotifications = data.unread_count || 0;
+  }
+  return next;
+}
+
 const NotificationContext = createContext<NotificationContextValue | null>(null);
 
 let globalAudioContext: AudioContext | null = null;
@@ -53,14 +138,18 @@ export function NotificationProvider({ children }: { children: React.ReactNode }
     messages: 0,
     submissions: 0
   });
+  const [notifications, setNotifications] = useState<PortalNotification[]>([]);
+  const [unreadNotifications, setUnreadNotifications] = useState(0);
   const [loading, setLoading] = useState(false);
   const prevCountsRef = useRef<UnreadCounts>(unreadCounts);
+  const stateRef = useRef<DashboardState>({ counts: unreadCounts, notifications: [], unreadNotifications: 0 });
+  const etagsRef = useRef<Record<string, string>>({});
   const lastFetchRef = useRef<number>(0);
   const DEBOUNCE_TIME = 5000;
 
-  const fetchUnreadCounts = useCallback(async () => {
+  const fetchUnreadCounts = useCallback(async (force = false) => {
     const now = Date.now();
-    if (now - lastFetchRef.current < DEBOUNCE_TIME) {
+    if (!force && now - lastFetchRef.current < DEBOUNCE_TIME) {
       return;
     }
     
@@ -76,16 +165,17 @@ export function NotificationProvider({ children }: { children: React.ReactNode }
         return;
       }
 
-      const response = await fetch(API_ENDPOINTS.UNREAD_COUNTS, {
-        headers: {
-          'X-User-Id': userId,
-          'X-Auth-Token': token
-        }
-      });
+      // Один запрос bootstrap вместо unread-counts и notifications
+      const state = API_ENDPOINTS.BOOTSTRAP
+        ? await loadFromBootstrap(userId, token, etagsRef.current, stateRef.current)
+        : await loadFromEndpoints(userId, token, stateRef.current);
+
+      if (state) {
+        stateRef.current = state;
+        setNotifications(state.notifications);
+        setUnreadNotifications(state.unreadNotifications);
 
-      if (response.ok) {
-        const data = await response.json();
-        const newCounts = data as UnreadCounts;
+        const newCounts = state.counts;
         
         const prevCounts = prevCountsRef.current;
         const hasNewNotifications = 
@@ -136,6 +226,8 @@ export function NotificationProvider({ children }: { children: React.ReactNode }
 
   const value: NotificationContextValue = {
     unreadCounts,
+    notifications,
+    unreadNotifications,
     refreshCounts: fetchUnreadCounts,
     loading
   };
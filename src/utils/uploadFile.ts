@@ -1,3 +1,7 @@
+import { sha256File } from './sha256';
+
+const UPLOAD_DIRECT_URL = 'https://functions.poehali.dev/01922e7e-40ee-4482-9a75-1bf53b8812d9';
+
 export interface UploadFileResult {
   url: string;
   fileName: string;
@@ -27,7 +31,7 @@ export async function uploadFile(file: File): Promise<UploadFileResult> {
       formData.append('fileName', file.name);
       
       console.log('[Upload] Sending FormData request...');
-      const response = await fetch('https://functions.poehali.dev/01922e7e-40ee-4482-9a75-1bf53b8812d9', {
+      const response = await fetch(UPLOAD_DIRECT_URL, {
         method: 'POST',
         body: formData
       });
@@ -45,91 +49,86 @@ export async function uploadFile(file: File): Promise<UploadFileResult> {
       return result;
     }
     
-    // Большие файлы (>3MB) - разбиваем на chunks по 2MB
-    console.log('[Upload] 📦 Large file detected, using chunked upload');
-    
-    const chunkSize = 2 * 1024 * 1024; // 2MB chunks
-    const totalChunks = Math.ceil(file.size / chunkSize);
-    console.log(`[Upload] Splitting into ${totalChunks} chunks of ~2MB each`);
+    // Большие файлы (>3MB) - S3 multipart: части уходят прямо в хранилище по presigned URL
+    console.log('[Upload] 📦 Large file detected, using multipart upload');
     
     const contentType = file.type || 'application/octet-stream';
-    let s3Key = '';
+    // Хэш проверяется сервером после загрузки: совпавший с уже сохранённым файл не хранится второй раз
+    const sha256 = await sha256File(file);
+    const created = await postUploadAction({ action: 'multipart_create', fileName: file.name, contentType, sha256 });
+    
+    const { uploadId, s3Key, partSize } = created;
+    const totalParts = Math.ceil(file.size / partSize);
+    console.log(`[Upload] Splitting into ${totalParts} parts of ~${(partSize / 1024 / 1024).toFixed(0)}MB each`);
+    
     let finalUrl = '';
+    let finalKey = s3Key;
     
-    for (let i = 0; i < totalChunks; i++) {
-      const start = i * chunkSize;
-      const end = Math.min(start + chunkSize, file.size);
-      const chunk = file.slice(start, end);
-      
-      console.log(`[Upload] 📤 Chunk ${i + 1}/${totalChunks}: ${(chunk.size / 1024 / 1024).toFixed(2)}MB`);
-      
-      // Retry логика: 3 попытки на каждый чанк
-      let retries = 3;
-      let uploaded = false;
+    try {
+      const { urls } = await postUploadAction({
+        action: 'multipart_presign',
+        s3Key,
+        uploadId,
+        partNumbers: Array.from({ length: totalParts }, (_, i) => i + 1)
+      });
       
-      while (retries > 0 && !uploaded) {
-        try {
-          // Convert chunk to base64
-          const reader = new FileReader();
-          const chunkBase64 = await new Promise<string>((resolve, reject) => {
-            reader.onload = () => resolve(reader.result as string);
-            reader.onerror = reject;
-            reader.readAsDataURL(chunk);
-          });
-          
-          // Send chunk to backend с таймаутом 60 секунд
-          const controller = new AbortController();
-          const timeout = setTimeout(() => controller.abort(), 60000);
-          
-          const response = await fetch('https://functions.poehali.dev/01922e7e-40ee-4482-9a75-1bf53b8812d9', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-              file: chunkBase64,
-              fileName: file.name,
-              contentType,
-              chunkIndex: i,
-              totalChunks,
-              s3Key: i > 0 ? s3Key : undefined
-            }),
-            signal: controller.signal
-          });
-          
-          clearTimeout(timeout);
-          
-          if (!response.ok) {
-            throw new Error(`HTTP ${response.status}`);
-          }
-          
-          const result = await response.json();
-          
-          if (i === 0) {
-            s3Key = result.s3Key;
+      for (let i = 0; i < totalParts; i++) {
+        const start = i * partSize;
+        const end = Math.min(start + partSize, file.size);
+        const part = file.slice(start, end);
+        
+        console.log(`[Upload] 📤 Part ${i + 1}/${totalParts}: ${(part.size / 1024 / 1024).toFixed(2)}MB`);
+        
+        // Retry логика: 3 попытки на каждую часть
+        let retries = 3;
+        let uploaded = false;
+        
+        while (retries > 0 && !uploaded) {
+          try {
+            const controller = new AbortController();
+            const timeout = setTimeout(() => controller.abort(), 120000);
+            
+            const response = await fetch(urls[String(i + 1)], {
+              method: 'PUT',
+              body: part,
+              signal: controller.signal
+            });
+            
+            clearTimeout(timeout);
+            
+            if (!response.ok) {
+              throw new Error(`HTTP ${response.status}`);
+            }
+            
+            uploaded = true;
+          } catch (error) {
+            retries--;
+            console.warn(`[Upload] Part ${i + 1} failed, retries left: ${retries}`, error);
+            
+            if (retries === 0) {
+              throw new Error(`Часть ${i + 1}/${totalParts} не удалось загрузить после 3 попыток`);
+            }
+            
+            // Пауза перед повтором: 1 сек
+            await new Promise(resolve => setTimeout(resolve, 1000));
           }
-          
-          if (i === totalChunks - 1) {
-            finalUrl = result.url;
-            console.log('[Upload] ✅ All chunks uploaded successfully:', finalUrl);
-          }
-          
-          uploaded = true;
-        } catch (error) {
-          retries--;
-          console.warn(`[Upload] Chunk ${i + 1} failed, retries left: ${retries}`, error);
-          
-          if (retries === 0) {
-            throw new Error(`Чанк ${i + 1}/${totalChunks} не удалось загрузить после 3 попыток`);
-          }
-          
-          // Пауза перед повтором: 1 сек
-          await new Promise(resolve => setTimeout(resolve, 1000));
         }
       }
+      
+      // Список частей и их ETag сервер берёт из S3
+      const completed = await postUploadAction({ action: 'multipart_complete', s3Key, uploadId, fileName: file.name });
+      // Проверенный по sha256 файл переезжает в blobs/: ключ берётся из ответа
+      finalUrl = completed.url;
+      finalKey = completed.s3Key;
+      console.log('[Upload] ✅ All parts uploaded successfully:', finalUrl);
+    } catch (error) {
+      await postUploadAction({ action: 'multipart_abort', s3Key, uploadId }).catch(() => undefined);
+      throw error;
     }
     
     return {
       url: finalUrl,
-      s3Key,
+      s3Key: finalKey,
       fileName: file.name,
       fileSize: file.size
     };
@@ -138,4 +137,19 @@ export async function uploadFile(file: File): Promise<UploadFileResult> {
     console.error('[Upload] Fetch error:', error instanceof Error ? error.message : 'Unknown', 'for', file.name);
     throw error;
   }
+}
+
+async function postUploadAction(payload: Record<string, unknown>) {
+  const response = await fetch(UPLOAD_DIRECT_URL, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(payload)
+  });
+  
+  if (!response.ok) {
+    const errorText = await response.text().catch(() => 'Unknown error');
+    throw new Error(`Ошибка загрузки: ${response.status} - ${errorText}`);
+  }
+  
+  return response.json();
 }
\ No newline at end of file